@@ -23,5 +23,8 @@ setup(
         "rapidfuzz",
         "requests",
         "aiohttp",
+        "fastapi",
+        "uvicorn",
+        "httpx",
     ],
 )
@@ -0,0 +1,48 @@
+import os
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from src.agents import (
+    AsyncRecipeAgent,
+    ContextWindow,
+    SemanticResponseCache,
+    ToolRouter,
+)
+from src.embeddings import get_embedding_function
+from src.tools import TOOL_DESCRIPTIONS, ToolResultCache
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Max chat turns processed concurrently and max turns waiting for a slot
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "64"))
+QUEUE_SIZE = int(os.getenv("QUEUE_SIZE", "512"))
+
+
+def create_recipe_agent(client: AsyncOpenAI) -> AsyncRecipeAgent:
+    """
+    Create the AsyncRecipeAgent shared by all sessions, configured from the environment.
+
+    Args:
+        client (AsyncOpenAI): The client of the inference endpoint.
+
+    Returns:
+        AsyncRecipeAgent: The agent.
+    """
+    return AsyncRecipeAgent(
+        client,
+        TOOL_DESCRIPTIONS,
+        max_tool_workers=int(os.getenv("TOOL_WORKERS", "16")),
+        router=ToolRouter() if os.getenv("TOOL_ROUTER", "1") == "1" else None,
+        response_cache=(
+            SemanticResponseCache(
+                get_embedding_function(),
+                threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+            )
+            if os.getenv("RESPONSE_CACHE", "1") == "1"
+            else None
+        ),
+        tool_cache=ToolResultCache(),
+        context_window=ContextWindow(
+            max_prompt_tokens=int(os.getenv("MAX_PROMPT_TOKENS", "6000"))
+        ),
+    )
@@ -1,5 +1,18 @@
 # Importing modules to make them accessible from the package
+from src.agents.async_recipe_agent import AsyncRecipeAgent
+from src.agents.context_window import ContextWindow
 from src.agents.evaluation_agent import EvaluationAgent
+from src.agents.evaluation_classifier import EvaluationClassifier
 from src.agents.recipe_agent import RecipeAgent
+from src.agents.response_cache import SemanticResponseCache
+from src.agents.tool_router import ToolRouter
 
-__all__ = ["EvaluationAgent", "RecipeAgent"]
+__all__ = [
+    "AsyncRecipeAgent",
+    "ContextWindow",
+    "EvaluationAgent",
+    "EvaluationClassifier",
+    "RecipeAgent",
+    "SemanticResponseCache",
+    "ToolRouter",
+]
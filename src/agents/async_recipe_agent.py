@@ -0,0 +1,538 @@
+import asyncio
+import functools
+import time
+import weakref
+from typing import Any, AsyncIterator, Literal
+from openai import AsyncOpenAI
+from src.agents.context_window import ContextWindow
+from src.agents.recipe_agent import DEFAULT_SESSION, RecipeAgent
+from src.agents.response_cache import SemanticResponseCache
+from src.agents.tool_call_parser import ToolCallStreamParser
+from src.agents.tool_router import ToolRouter
+from src.instrumentation import instrumentation
+from src.tools.tool_cache import ToolResultCache
+from src.datatypes import (
+    AgentResponse,
+    ConversationState,
+    StreamingTextResponse,
+    TextResponse,
+    ToolDescription,
+    ToolResponse,
+)
+
+
+class AsyncRecipeAgent(RecipeAgent):
+    """
+    An asyncio variant of the RecipeAgent that generates completions with an AsyncOpenAI
+    client, so one event loop can serve many sessions without a thread per LLM call.
+    """
+
+    # Class attributes
+    client: AsyncOpenAI
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        tools: list[ToolDescription] = [],
+        max_internal_iteration: int = 5,
+        temperature: float = 0.1,
+        max_tool_workers: int = 4,
+        max_sessions: int = 1024,
+        early_tool_abort: bool = False,
+        eager_tool_execution: bool = False,
+        compact_tool_prompt: bool = False,
+        measure_prompt_tokens: bool = False,
+        router: ToolRouter | None = None,
+        response_cache: SemanticResponseCache | None = None,
+        tool_cache: ToolResultCache | None = None,
+        context_window: ContextWindow | None = None,
+        tool_call_mode: Literal["text", "function"] = "text",
+    ):
+        """
+        Initialize the AsyncRecipeAgent.
+
+        Args:
+            client (AsyncOpenAI): The async OpenAI client for generating completions.
+            tools (list[ToolDescription]): List of tools the agent can use.
+            max_internal_iteration (int): Max internal tool iterations per query.
+            temperature (float): Sampling temperature for completions.
+            max_tool_workers (int): Max tool calls executed concurrently across sessions.
+            max_sessions (int): Max conversations kept; the least recently used is dropped first.
+            early_tool_abort (bool): Stream completions and stop generating once the model
+                has finished writing its tool calls.
+            eager_tool_execution (bool): Start each tool as soon as its call is complete in
+                the stream, while the model is still writing.
+            compact_tool_prompt (bool): Describe tools in one line each with a single shared
+                example call, shortening the system prompt.
+            measure_prompt_tokens (bool): Record the prompt token usage reported for each
+                completion in prompt_token_log.
+            router (ToolRouter | None): Predicts tool calls from the query so they run
+                before the first completion instead of after a planning completion.
+            response_cache (SemanticResponseCache | None): Answers near-identical queries
+                with cached responses.
+            tool_cache (ToolResultCache | None): Memoizes tool results across turns and
+                sessions, following each tool's caching policy.
+            context_window (ContextWindow | None): Fits each prompt to a token budget,
+                trimming tool results and summarizing long previous answers.
+            tool_call_mode (Literal["text", "function"]): How the model calls tools. "text"
+                parses `Call function_name:` blocks from the completion; "function" passes
+                the tools' JSON schemas to the server's function calling, so arguments
+                are decoded as valid JSON instead of scraped from text.
+        """
+        super().__init__(
+            client,
+            tools=tools,
+            max_internal_iteration=max_internal_iteration,
+            temperature=temperature,
+            max_tool_workers=max_tool_workers,
+            max_sessions=max_sessions,
+            early_tool_abort=early_tool_abort,
+            eager_tool_execution=eager_tool_execution,
+            compact_tool_prompt=compact_tool_prompt,
+            measure_prompt_tokens=measure_prompt_tokens,
+            router=router,
+            response_cache=response_cache,
+            tool_cache=tool_cache,
+            context_window=context_window,
+            tool_call_mode=tool_call_mode,
+        )
+
+        # Locks serializing turns of the same session; dropped once no turn holds them
+        self._session_locks = weakref.WeakValueDictionary()
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        """
+        Get the lock serializing the turns of a session.
+
+        Args:
+            session_id (str): The session identifier.
+
+        Returns:
+            asyncio.Lock: The session's lock.
+        """
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    async def _chat_completion(
+        self, conversation: list[dict], with_tools: bool = True
+    ) -> str:
+        """
+        Generate a chat completion based on the conversation history.
+
+        Args:
+            conversation (list[dict]): The current conversation context.
+            with_tools (bool): Whether the model may call the agent's tools.
+
+        Returns:
+            str: The assistant's response, with any function calls written as
+                `Call function_name:` blocks.
+        """
+        with instrumentation.span("llm.chat_completion", messages=len(conversation)):
+            completion = await self.client.chat.completions.create(
+                messages=conversation,
+                model="meta-llama/Meta-Llama-3.1-8B-Instruct",
+                temperature=self.temperature,
+                **(self._tool_options() if with_tools else {}),
+            )
+        self._record_usage(completion.usage, conversation)
+        message = completion.choices[0].message
+        return (message.content or "") + self._render_tool_calls(
+            [
+                (call.function.name, call.function.arguments)
+                for call in getattr(message, "tool_calls", None) or []
+            ]
+        )
+
+    async def _chat_completion_stream(
+        self, conversation: list[dict]
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion based on the conversation history.
+
+        Args:
+            conversation (list[dict]): The current conversation context.
+
+        Yields:
+            str: The chunks of the assistant's response as they are generated.
+        """
+        started = time.perf_counter()
+        first_token = None
+        with instrumentation.span(
+            "llm.chat_completion_stream", messages=len(conversation)
+        ) as span:
+            stream = await self.client.chat.completions.create(
+                messages=conversation,
+                model="meta-llama/Meta-Llama-3.1-8B-Instruct",
+                temperature=self.temperature,
+                stream=True,
+                **self._stream_options(),
+                **self._tool_options(),
+            )
+            pending_calls = {}
+            try:
+                async for chunk in stream:
+                    self._record_usage(getattr(chunk, "usage", None), conversation)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            span.set(first_token_ms=1000 * first_token)
+                        yield delta.content
+                    calls = self._accumulate_tool_calls(
+                        pending_calls, getattr(delta, "tool_calls", None) or []
+                    )
+                    if calls:
+                        yield calls
+                if pending_calls:
+                    yield self._flush_tool_calls(pending_calls)
+            finally:
+                # Closing the response cancels generation when the caller stops early
+                await stream.close()
+
+    async def _generate(
+        self,
+        state: ConversationState,
+        stream: bool,
+        started_calls: dict[tuple[str, str], asyncio.Future],
+    ) -> AsyncIterator[StreamingTextResponse | TextResponse]:
+        """
+        Generate the next completion, optionally streaming drafts of it.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            stream (bool): Whether to stream drafts of the completion.
+            started_calls (dict[tuple[str, str], asyncio.Future]): Filled with the tool
+                calls started while the completion was generated.
+
+        Yields:
+            StreamingTextResponse | TextResponse: Drafts of the completion, followed by
+                the full completion.
+        """
+        # Fitting the prompt tokenizes the conversation, so it runs on a worker thread
+        prompt = await asyncio.to_thread(self._prompt, state)
+        if not (stream or self.early_tool_abort or self.eager_tool_execution):
+            yield TextResponse(text=await self._chat_completion(prompt))
+            return
+
+        parser = ToolCallStreamParser([tool.name for tool in self.tools])
+        draft = ""
+        deltas = self._chat_completion_stream(prompt)
+        async for delta in deltas:
+            if parser.feed(delta) != draft and stream:
+                draft = parser.draft
+                yield StreamingTextResponse(text=draft)
+
+            if self.eager_tool_execution:
+                self._start_completed_calls(state, parser, started_calls)
+            if self.early_tool_abort and parser.calls_finished:
+                await deltas.aclose()
+                break
+
+        if parser.close() != draft and stream:
+            yield StreamingTextResponse(text=parser.draft)
+        yield TextResponse(text=parser.text)
+
+    async def _settle_started_calls(
+        self, started_calls: dict[tuple[str, str], asyncio.Future]
+    ):
+        """
+        Settle the tool calls started while streaming a completion whose calls are not
+        run, as the turn reached its iteration limit. They are awaited up to their tools'
+        timeouts, then cancelled, so none outlive the turn.
+
+        Args:
+            started_calls (dict[tuple[str, str], asyncio.Future]): The started tool calls.
+        """
+        if started_calls:
+            _, pending = await asyncio.wait(
+                started_calls.values(),
+                timeout=self._started_calls_timeout(started_calls),
+            )
+            for future in pending:
+                future.cancel()
+
+    def _start_tool_call(
+        self, tool: ToolDescription, arguments: dict, session_id: str
+    ) -> asyncio.Future:
+        """
+        Start a tool call on the tool worker pool.
+
+        Args:
+            tool (ToolDescription): The tool to call.
+            arguments (dict): The arguments of the call.
+            session_id (str): The session the call is made for.
+
+        Returns:
+            asyncio.Future: The pending result of the call and its duration.
+        """
+        return asyncio.get_running_loop().run_in_executor(
+            self.tool_executor,
+            functools.partial(self._call_tool, tool, arguments, session_id),
+        )
+
+    async def _execute_tool_calls(
+        self,
+        state: ConversationState,
+        tool_calls: list[tuple[ToolDescription, dict]],
+        started_calls: dict[tuple[str, str], asyncio.Future] | None = None,
+    ) -> list[tuple[Any, float]]:
+        """
+        Execute independent tool calls concurrently, each bounded by its tool's timeout.
+
+        A call that times out is abandoned, not stopped: once running, it keeps its worker
+        thread until the tool returns, and its late result is discarded.
+
+        Args:
+            state (ConversationState): The conversation state of the calling session.
+            tool_calls (list[tuple[ToolDescription, dict]]): The tools to call with their arguments.
+            started_calls (dict[tuple[str, str], asyncio.Future] | None): Tool calls
+                already started while the completion was streamed, which are awaited
+                instead of run again.
+
+        Returns:
+            list[tuple[Any, float]]: The tool results with the seconds each call took, in
+                the same order as `tool_calls`.
+        """
+        started_calls = started_calls or {}
+        return list(
+            await asyncio.gather(
+                *(
+                    self._await_tool_call(
+                        tool,
+                        started_calls.get(self._call_key(tool.name, arguments))
+                        or self._start_tool_call(tool, arguments, state.session_id),
+                    )
+                    for tool, arguments in tool_calls
+                )
+            )
+        )
+
+    @staticmethod
+    async def _await_tool_call(
+        tool: ToolDescription, future: asyncio.Future
+    ) -> tuple[Any, float]:
+        """
+        Wait for a started tool call, up to the tool's timeout.
+
+        Args:
+            tool (ToolDescription): The called tool.
+            future (asyncio.Future): The pending result of the call and its duration.
+
+        Returns:
+            tuple[Any, float]: The tool's result, or an error if it timed out, and the
+                seconds the call took.
+        """
+        try:
+            return await asyncio.wait_for(future, timeout=tool.timeout)
+        except TimeoutError:
+            return (
+                {"error": f"{tool.name} timed out after {tool.timeout} seconds"},
+                tool.timeout,
+            )
+
+    async def call_tool(
+        self, name: str, arguments: dict, session_id: str = DEFAULT_SESSION
+    ) -> ToolResponse:
+        """
+        Call one of the agent's tools directly, outside of a chat turn, with the same
+        caching, session scoping and timeout as the tool calls of a turn.
+
+        Args:
+            name (str): The name of the tool.
+            arguments (dict): The arguments of the call.
+            session_id (str): The session the call is made for.
+
+        Returns:
+            ToolResponse: The tool's result and the seconds the call took.
+
+        Raises:
+            KeyError: If the agent has no tool with that name.
+        """
+        tool = next((tool for tool in self.tools if tool.name == name), None)
+        if tool is None:
+            raise KeyError(f"Unknown tool: {name}")
+
+        result, duration = await self._await_tool_call(
+            tool, self._start_tool_call(tool, arguments, session_id)
+        )
+        return ToolResponse(
+            tool_name=name, text=str(arguments), tool_result=result, duration=duration
+        )
+
+    async def _summarization(self, text: str) -> str:
+        """
+        Summarize user input into a concise query.
+
+        Args:
+            text (str): The user input text.
+
+        Returns:
+            str: The summarized query.
+        """
+        return await self._chat_completion(
+            self._summary_conversation(text), with_tools=False
+        )
+
+    async def _compact_history(self, state: ConversationState):
+        """
+        Replace a previous answer that exceeds the history budget with its summary.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+        """
+        previous = await asyncio.to_thread(self._history_to_summarize, state)
+        if previous is not None:
+            state.conversation[state.turn_start - 1] = {
+                "role": "assistant",
+                "content": await self._summarization(previous),
+            }
+
+    async def _run_turn(
+        self, user_message: str, add_to_memory: bool, session_id: str, stream: bool
+    ) -> AsyncIterator[AgentResponse]:
+        """
+        Process a user query, yielding each step as it happens.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
+            stream (bool): Whether to stream drafts of each completion.
+
+        Yields:
+            AgentResponse: Drafts of the response, tool steps and finally the response.
+        """
+        async with self._session_lock(session_id):
+            state = self._get_session(session_id)
+            self._begin_turn(state, user_message)
+            await self._compact_history(state)
+            # Routing may embed the query for its classifier
+            routed_calls = await asyncio.to_thread(self._route_tool_calls, user_message)
+
+            # Answer from the response cache when a similar query was already answered;
+            # the query is embedded on a worker thread to keep the event loop free
+            cached_steps = await asyncio.to_thread(
+                self._lookup_response_cache, state, user_message, routed_calls
+            )
+            if cached_steps is not None:
+                state.conversation.append(
+                    {"role": "assistant", "content": cached_steps[-1].text}
+                )
+                if add_to_memory:
+                    self._remember(session_id, cached_steps[-1].text)
+                for step in cached_steps:
+                    yield step
+                return
+
+            # Run the tools predicted by the router before the first completion
+            steps_taken = []
+            ran_calls = list(routed_calls)
+            if routed_calls:
+                results = await self._execute_tool_calls(state, routed_calls)
+                steps_taken.extend(
+                    self._record_tool_results(state, routed_calls, results)
+                )
+                for step in steps_taken:
+                    yield step
+
+            # Process tool calls iteratively
+            internal_iterations = 1 if routed_calls else 0
+            while True:
+                started_calls = {}
+                async for item in self._generate(state, stream, started_calls):
+                    if isinstance(item, TextResponse):
+                        completion = item.text
+                    else:
+                        yield item
+                state.conversation.append({"role": "assistant", "content": completion})
+
+                completion_tool_calls = self._detect_tool_calls(completion)
+                if (
+                    not completion_tool_calls
+                    or internal_iterations >= self.max_internal_iteration
+                ):
+                    await self._settle_started_calls(started_calls)
+                    break
+
+                planned_calls = self._plan_tool_calls(
+                    state, completion, completion_tool_calls
+                )
+                new_calls = [call for call in planned_calls if call[1] is not None]
+                results = await self._execute_tool_calls(
+                    state, new_calls, started_calls
+                )
+                ran_calls.extend(new_calls)
+                tool_steps = self._record_tool_results(state, planned_calls, results)
+                steps_taken.extend(tool_steps)
+                for step in tool_steps:
+                    yield step
+                internal_iterations += 1
+
+            response = TextResponse(text=completion)
+            steps_taken.append(response)
+            await asyncio.to_thread(
+                self._store_response_cache,
+                state,
+                user_message,
+                ran_calls,
+                steps_taken,
+            )
+
+            # Add response to memory if enabled
+            if add_to_memory:
+                self._remember(session_id, response.text)
+
+            yield response
+
+    async def say(
+        self,
+        user_message: str,
+        add_to_memory: bool = True,
+        session_id: str = DEFAULT_SESSION,
+    ) -> tuple[TextResponse, list[AgentResponse]]:
+        """
+        Process a user query and return the agent's response.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
+
+        Returns:
+            tuple: The final agent response and steps taken during processing.
+        """
+        steps_taken = [
+            step
+            async for step in self._run_turn(
+                user_message, add_to_memory, session_id, stream=False
+            )
+        ]
+        return steps_taken[-1], steps_taken
+
+    async def say_stream(
+        self,
+        user_message: str,
+        add_to_memory: bool = True,
+        session_id: str = DEFAULT_SESSION,
+    ) -> AsyncIterator[AgentResponse]:
+        """
+        Process a user query, streaming the agent's response as it is generated.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
+
+        Yields:
+            AgentResponse: StreamingTextResponse drafts of the response, ToolResponse
+                steps as tools finish, and finally the complete TextResponse.
+        """
+        async for step in self._run_turn(
+            user_message, add_to_memory, session_id, stream=True
+        ):
+            yield step
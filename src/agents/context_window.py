@@ -0,0 +1,193 @@
+import threading
+from typing import Any
+
+# Tokens added by the chat template around each message (role header and end of turn)
+MESSAGE_OVERHEAD_TOKENS = 5
+
+# Characters per token assumed when the tokenizer cannot be loaded
+CHARS_PER_TOKEN = 4
+
+# Prefix of the conversation messages that carry tool results
+TOOL_RESULT_PREFIX = "Assistant Call "
+
+TRUNCATION_MARKER = "\n...[truncated]"
+
+
+class ContextWindow:
+    """
+    Counts prompt tokens with the model's tokenizer and fits conversations to a token
+    budget, so prompt sizes stay predictable however large the tool results get.
+
+    By priority, the system prompt and the current query are always kept, tool results
+    are trimmed next, and earlier turns are dropped first.
+    """
+
+    # Class attributes
+    max_prompt_tokens: int
+    max_tool_result_tokens: int
+    max_history_tokens: int
+    min_tool_result_tokens: int
+    tokenizer_name: str
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 6000,
+        max_tool_result_tokens: int = 1024,
+        max_history_tokens: int = 512,
+        min_tool_result_tokens: int = 64,
+        tokenizer_name: str = "meta-llama/Meta-Llama-3.1-8B-Instruct",
+    ):
+        """
+        Initialize the ContextWindow.
+
+        Args:
+            max_prompt_tokens (int): Max tokens of a prompt sent to the model.
+            max_tool_result_tokens (int): Max tokens of a single tool result in the prompt.
+            max_history_tokens (int): Max tokens of the previous answer carried into a new
+                turn before it is summarized.
+            min_tool_result_tokens (int): Tokens of each tool result kept when trimming
+                to the prompt budget.
+            tokenizer_name (str): The Hugging Face tokenizer used to count tokens. Falls
+                back to an estimate of 4 characters per token if it cannot be loaded.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_tool_result_tokens = max_tool_result_tokens
+        self.max_history_tokens = max_history_tokens
+        self.min_tool_result_tokens = min_tool_result_tokens
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self) -> Any:
+        """
+        The tokenizer, loaded on first use.
+
+        Returns:
+            Any: The tokenizer, or None if it could not be loaded.
+        """
+        with self._lock:
+            if not self._tokenizer_loaded:
+                try:
+                    from transformers import AutoTokenizer
+
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                except Exception:
+                    # Gated or offline models fall back to the character estimate
+                    self._tokenizer = None
+                self._tokenizer_loaded = True
+        return self._tokenizer
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if self.tokenizer is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def count_messages(self, messages: list[dict]) -> int:
+        """
+        Count the tokens of a prompt.
+
+        Args:
+            messages (list[dict]): The messages of the prompt.
+
+        Returns:
+            int: The number of tokens, including the chat template's per-message overhead.
+        """
+        return sum(
+            self.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            for message in messages
+        )
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text down to a number of tokens.
+
+        Args:
+            text (str): The text to cut.
+            max_tokens (int): The max number of tokens kept.
+
+        Returns:
+            str: The text, marked as truncated if it was cut.
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        if self.tokenizer is None:
+            return text[: max_tokens * CHARS_PER_TOKEN] + TRUNCATION_MARKER
+
+        token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+        return self.tokenizer.decode(token_ids[:max_tokens]) + TRUNCATION_MARKER
+
+    def needs_summary(self, message: dict) -> bool:
+        """
+        Check whether a previous answer is too long to carry into a new turn as is.
+
+        Args:
+            message (dict): The previous answer.
+
+        Returns:
+            bool: True if the answer exceeds the history budget.
+        """
+        return self.count(message["content"]) > self.max_history_tokens
+
+    def fit(self, conversation: list[dict], turn_start: int) -> list[dict]:
+        """
+        Fit a conversation to the prompt budget.
+
+        Earlier turns are dropped oldest first, then this turn's tool results are trimmed,
+        largest first, down to `min_tool_result_tokens` each.
+
+        Args:
+            conversation (list[dict]): The conversation, starting with the system prompt.
+            turn_start (int): The index of the current turn's first message.
+
+        Returns:
+            list[dict]: The fitted conversation; the input is returned unchanged if it fits.
+        """
+        if self.count_messages(conversation) <= self.max_prompt_tokens:
+            return conversation
+
+        system, history, turn = (
+            conversation[:1],
+            conversation[1:turn_start],
+            list(conversation[turn_start:]),
+        )
+        while (
+            history
+            and self.count_messages(system + history + turn) > self.max_prompt_tokens
+        ):
+            history = history[1:]
+
+        excess = self.count_messages(system + history + turn) - self.max_prompt_tokens
+        tool_results = sorted(
+            (
+                (self.count(message["content"]), index)
+                for index, message in enumerate(turn)
+                if message["role"] == "user"
+                and message["content"].startswith(TOOL_RESULT_PREFIX)
+            ),
+            reverse=True,
+        )
+        marker_tokens = self.count(TRUNCATION_MARKER)
+        for tokens, index in tool_results:
+            if excess <= 0:
+                break
+            cut = min(excess + marker_tokens, tokens - self.min_tool_result_tokens)
+            if cut <= 0:
+                continue
+            turn[index] = {
+                **turn[index],
+                "content": self.truncate(turn[index]["content"], tokens - cut),
+            }
+            excess -= cut - marker_tokens
+
+        return system + history + turn
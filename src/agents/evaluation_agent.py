@@ -1,4 +1,16 @@
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 from openai import OpenAI
+from src.agents.evaluation_classifier import EvaluationClassifier
+from src.datatypes import EvaluationResult
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 
 
 class EvaluationAgent:
@@ -13,21 +25,36 @@ class EvaluationAgent:
         "nut-free (no tree nuts or peanuts), and kosher (must adhere to Jewish dietary laws, such as avoiding pork and shellfish, and separating meat and dairy)."
     )
 
-    def __init__(self, client: OpenAI, temperature: float = 0.0):
-        self.client = client
-        self.temperature = temperature
+    # Alternatives considered for the first token of the answer
+    TOP_LOGPROBS = 5
 
-    def _chat_completion(self, conversation: list[dict]) -> str:
-        completion = self.client.chat.completions.create(
-            messages=conversation,
-            model="meta-llama/Meta-Llama-3.1-8B-Instruct",
-            temperature=self.temperature,
-        )
+    def __init__(
+        self,
+        client: OpenAI,
+        temperature: float = 0.0,
+        max_tokens: int = 1,
+        max_workers: int = 8,
+        classifier: EvaluationClassifier | None = None,
+    ):
+        """
+        Initialize the EvaluationAgent.
 
-        return completion.choices[0].message.content
+        Args:
+            client (OpenAI): The OpenAI client for generating completions.
+            temperature (float): Sampling temperature for completions.
+            max_tokens (int): Max tokens generated per answer; "Yes" and "No" are one token.
+            max_workers (int): Max evaluations run concurrently by evaluate_batch.
+            classifier (EvaluationClassifier | None): Fitted local classifier answering the
+                confident cases of evaluate and evaluate_batch; the rest go to the LLM.
+        """
+        self.client = client
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+        self.classifier = classifier
 
-    def say(self, recipe: str, criteria: str) -> str:
-        conversation = [
+    def _conversation(self, recipe: str, criteria: str) -> list[dict]:
+        return [
             {"role": "system", "content": self.BASE_SYSTEM_PROMPT},
             {
                 "role": "user",
@@ -35,6 +62,193 @@ class EvaluationAgent:
             },
         ]
 
+    def _chat_completion(self, conversation: list[dict], **kwargs) -> Any:
+        return self.client.chat.completions.create(
+            messages=conversation,
+            model="meta-llama/Meta-Llama-3.1-8B-Instruct",
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **kwargs,
+        )
+
+    def say(self, recipe: str, criteria: str) -> str:
+        conversation = self._conversation(recipe, criteria)
+
         completion = self._chat_completion(conversation)
 
-        return completion
+        return (completion.choices[0].message.content or "").strip()
+
+    @staticmethod
+    def _yes_probability(choice: Any) -> float | None:
+        """
+        Compute the probability of "Yes" from the logprobs of the answer's first token.
+
+        Args:
+            choice (Any): The completion choice, requested with top logprobs.
+
+        Returns:
+            float | None: P(Yes) normalized over the Yes and No alternatives, or None if
+                the server returned no logprobs for them.
+        """
+        logprobs = getattr(choice, "logprobs", None)
+        if logprobs is None or not logprobs.content:
+            return None
+
+        probabilities = {"yes": 0.0, "no": 0.0}
+        for alternative in logprobs.content[0].top_logprobs:
+            token = alternative.token.strip().lower()
+            if token in probabilities:
+                probabilities[token] += math.exp(alternative.logprob)
+
+        total = probabilities["yes"] + probabilities["no"]
+        return probabilities["yes"] / total if total else None
+
+    def _classify(self, pairs: list[tuple[str, str]]) -> list[EvaluationResult | None]:
+        """
+        Answer the pairs the local classifier is confident about.
+
+        Args:
+            pairs (list[tuple[str, str]]): The recipes with the criteria they must meet.
+
+        Returns:
+            list[EvaluationResult | None]: The local verdicts, or None for the pairs that
+                must be escalated to the LLM.
+        """
+        if self.classifier is None or not pairs:
+            return [None] * len(pairs)
+
+        results = []
+        for probability in self.classifier.predict_proba(pairs).tolist():
+            if not self.classifier.is_confident(probability):
+                results.append(None)
+                continue
+            results.append(
+                EvaluationResult(
+                    answer="Yes" if probability >= 0.5 else "No",
+                    satisfied=probability >= 0.5,
+                    confidence=probability,
+                    source="local",
+                )
+            )
+        return results
+
+    def evaluate(self, recipe: str, criteria: str) -> EvaluationResult:
+        """
+        Evaluate whether a recipe meets the criteria, with the model's confidence.
+
+        Args:
+            recipe (str): The recipe to evaluate.
+            criteria (str): The dietary needs the recipe must meet.
+
+        Returns:
+            EvaluationResult: The verdict and the probability of "Yes".
+        """
+        local = self._classify([(recipe, criteria)])[0]
+        if local is not None:
+            return local
+        return self._evaluate_with_llm(recipe, criteria)
+
+    def _evaluate_with_llm(self, recipe: str, criteria: str) -> EvaluationResult:
+        completion = self._chat_completion(
+            self._conversation(recipe, criteria),
+            logprobs=True,
+            top_logprobs=self.TOP_LOGPROBS,
+        )
+        choice = completion.choices[0]
+        answer = (choice.message.content or "").strip()
+
+        confidence = self._yes_probability(choice)
+        if confidence is None:
+            # Without logprobs the sampled answer is all there is to go on
+            confidence = 1.0 if answer.lower().startswith("yes") else 0.0
+
+        return EvaluationResult(
+            answer=answer, satisfied=confidence >= 0.5, confidence=confidence
+        )
+
+    def evaluate_batch(self, pairs: list[tuple[str, str]]) -> list[EvaluationResult]:
+        """
+        Evaluate many recipe and criteria pairs concurrently.
+
+        Args:
+            pairs (list[tuple[str, str]]): The recipes with the criteria they must meet.
+
+        Returns:
+            list[EvaluationResult]: The verdicts, in the same order as `pairs`. A failed
+                evaluation is reported as unsatisfied with its error.
+        """
+
+        def evaluate_pair(pair: tuple[str, str]) -> EvaluationResult:
+            try:
+                return self._evaluate_with_llm(*pair)
+            except Exception as e:
+                return EvaluationResult(
+                    answer="", satisfied=False, confidence=None, error=str(e)
+                )
+
+        # The local classifier scores the whole batch at once; only the rest is escalated
+        results = self._classify(pairs)
+        escalated = [index for index, result in enumerate(results) if result is None]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for index, result in zip(
+                escalated, executor.map(evaluate_pair, [pairs[i] for i in escalated])
+            ):
+                results[index] = result
+        return results
+
+
+# Score the satisfactory recipes benchmark with batched evaluations
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(
+        description="Score the satisfactory recipes benchmark with the evaluation agent."
+    )
+    parser.add_argument(
+        "--benchmark",
+        default=os.path.join(
+            project_root, "benchmarks", "satisfactory_recipes_benchmark.json"
+        ),
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    load_dotenv()
+    with open(args.benchmark, "r") as f:
+        benchmark = json.load(f)
+
+    eval_agent = EvaluationAgent(
+        OpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY")),
+        max_workers=args.workers,
+    )
+    start = time.perf_counter()
+    results = eval_agent.evaluate_batch(
+        [(example["recipe"], example["request"]) for example in benchmark]
+    )
+    elapsed = time.perf_counter() - start
+
+    scored = [
+        (example, result)
+        for example, result in zip(benchmark, results)
+        if result.error is None
+    ]
+    correct = sum(
+        result.satisfied == (example["answer"] == "Yes") for example, result in scored
+    )
+    print(
+        json.dumps(
+            {
+                "cases": len(benchmark),
+                "errors": len(benchmark) - len(scored),
+                "accuracy": correct / len(scored) if scored else 0.0,
+                "mean_confidence": (
+                    sum(max(r.confidence, 1 - r.confidence) for _, r in scored)
+                    / len(scored)
+                    if scored
+                    else 0.0
+                ),
+                "elapsed_seconds": elapsed,
+            },
+            indent=4,
+        )
+    )
@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Callable
+import numpy as np
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Ingredients that violate common dietary restrictions, keyed by restriction word, used
+# to synthesize recipes that fail a request
+VIOLATING_INGREDIENTS = {
+    "dairy": ["milk", "butter", "cheese", "cream"],
+    "lactose": ["milk", "cream"],
+    "gluten": ["flour", "bread crumbs"],
+    "wheat": ["flour"],
+    "egg": ["eggs"],
+    "nut": ["walnuts", "almonds", "pecans"],
+    "peanut": ["peanuts", "peanut butter"],
+    "sugar": ["sugar", "brown sugar"],
+    "alcohol": ["wine", "rum", "beer"],
+    "soy": ["soy sauce", "tofu"],
+    "meat": ["chicken", "beef", "pork"],
+    "vegan": ["eggs", "milk", "butter", "honey", "chicken"],
+    "vegetarian": ["chicken", "beef", "pork", "bacon"],
+    "keto": ["flour", "sugar", "rice", "potatoes"],
+}
+
+# Diets that rule out their ingredients whenever they are mentioned; other restriction
+# words only count when negated ("no sugar", "dairy-free")
+DIETS = {"vegan", "vegetarian", "keto"}
+
+
+def synthesize_examples(examples: list[dict], seed: int = 0) -> list[dict]:
+    """
+    Generate labelled examples by adding ingredients a request rules out to recipes
+    that met it, so the classifier sees violations of every restriction.
+
+    Args:
+        examples (list[dict]): Examples with a "request", "recipe" and "answer".
+        seed (int): Seed for choosing the added ingredients.
+
+    Returns:
+        list[dict]: The synthetic examples, all answered "No".
+    """
+    rng = random.Random(seed)
+    synthetic = []
+    for example in examples:
+        if example["answer"] != "Yes":
+            continue
+
+        request = example["request"].lower()
+        for restriction, ingredients in VIOLATING_INGREDIENTS.items():
+            # Only requests ruling the ingredients out, not ones asking for them
+            if restriction in DIETS:
+                pattern = rf"\b{restriction}\b"
+            else:
+                pattern = (
+                    rf"\b{restriction}s?-free\b|\b(no|without|avoid) {restriction}"
+                )
+            if not re.search(pattern, request):
+                continue
+            ingredient = rng.choice(ingredients)
+            synthetic.append(
+                {
+                    "request": example["request"],
+                    "recipe": example["recipe"].replace(
+                        "Ingredients: ", f"Ingredients: 1 cup {ingredient}, ", 1
+                    ),
+                    "answer": "No",
+                }
+            )
+    return synthetic
+
+
+class EvaluationClassifier:
+    """
+    A local classifier predicting whether a recipe meets a request, used to answer the
+    confident cases of the EvaluationAgent without a call to the LLM.
+
+    Features are either the MiniLM embeddings of the request and recipe with their
+    elementwise product, or, without an embedding function, hashed pairs of request
+    and recipe words, which are cheaper to compute.
+    """
+
+    # Class attributes
+    embedding_function: Callable[[list[str]], list] | None
+    threshold: float
+    model: Any
+
+    def __init__(
+        self,
+        embedding_function: Callable[[list[str]], list] | None = None,
+        threshold: float = 0.9,
+        n_features: int = 2**18,
+    ):
+        """
+        Initialize the EvaluationClassifier.
+
+        Args:
+            embedding_function (Callable | None): Embeds texts, e.g. the MiniLM embedding
+                function of the recipes collection. None uses word-pair features.
+            threshold (float): Min probability of the predicted answer for the local
+                decision to be trusted.
+            n_features (int): Number of hashed word-pair features.
+        """
+        from sklearn.feature_extraction import FeatureHasher
+
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.model = None
+        self._hasher = FeatureHasher(n_features=n_features, input_type="string")
+
+    def _features(self, pairs: list[tuple[str, str]]) -> Any:
+        """
+        Build the features of recipe and criteria pairs.
+
+        Args:
+            pairs (list[tuple[str, str]]): The recipes with the criteria they must meet.
+
+        Returns:
+            Any: The feature matrix, dense for embeddings and sparse for word pairs.
+        """
+        if self.embedding_function is not None:
+            recipes = np.asarray(self.embedding_function([r for r, _ in pairs]))
+            criteria = np.asarray(self.embedding_function([c for _, c in pairs]))
+            return np.hstack([criteria, recipes, criteria * recipes])
+
+        return self._hasher.transform(
+            [
+                [
+                    f"{criteria_word}|{recipe_word}"
+                    for criteria_word in set(WORD_PATTERN.findall(criteria.lower()))
+                    for recipe_word in set(WORD_PATTERN.findall(str(recipe).lower()))
+                ]
+                for recipe, criteria in pairs
+            ]
+        )
+
+    def fit(self, examples: list[dict]) -> "EvaluationClassifier":
+        """
+        Fit the classifier on labelled examples.
+
+        Args:
+            examples (list[dict]): Examples with a "request", "recipe" and "answer".
+
+        Returns:
+            EvaluationClassifier: The classifier itself.
+        """
+        from sklearn.linear_model import LogisticRegression
+
+        self.model = LogisticRegression(max_iter=1000, C=10.0)
+        self.model.fit(
+            self._features([(e["recipe"], e["request"]) for e in examples]),
+            [e["answer"] == "Yes" for e in examples],
+        )
+        return self
+
+    def predict_proba(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """
+        Predict the probability that each recipe meets its criteria.
+
+        Args:
+            pairs (list[tuple[str, str]]): The recipes with the criteria they must meet.
+
+        Returns:
+            np.ndarray: The probability of "Yes" for each pair.
+        """
+        if self.model is None:
+            raise ValueError("The classifier must be fitted before predicting.")
+        return self.model.predict_proba(self._features(pairs))[:, 1]
+
+    def is_confident(self, probability: float) -> bool:
+        """
+        Check whether a prediction is confident enough to skip the LLM.
+
+        Args:
+            probability (float): The predicted probability of "Yes".
+
+        Returns:
+            bool: True if the predicted answer reaches the threshold.
+        """
+        return max(probability, 1 - probability) >= self.threshold
+
+
+def evaluate_classifier(
+    classifier: EvaluationClassifier,
+    benchmark: list[dict],
+    llm_answers: list[str] | None = None,
+) -> dict:
+    """
+    Measure how much evaluation traffic the classifier would answer locally, and how
+    often those local answers agree with the benchmark and the LLM.
+
+    Args:
+        classifier (EvaluationClassifier): The fitted classifier.
+        benchmark (list[dict]): Examples with a "request", "recipe" and "answer".
+        llm_answers (list[str] | None): The LLM's answers to the same examples, if known.
+
+    Returns:
+        dict: Coverage, accuracy and LLM agreement of the confident cases, and the mean
+            local latency per decision.
+    """
+    pairs = [(example["recipe"], example["request"]) for example in benchmark]
+    start = time.perf_counter()
+    probabilities = classifier.predict_proba(pairs)
+    elapsed = time.perf_counter() - start
+
+    confident = [
+        (index, probability >= 0.5)
+        for index, probability in enumerate(probabilities)
+        if classifier.is_confident(probability)
+    ]
+    report = {
+        "cases": len(benchmark),
+        "local_coverage": len(confident) / len(benchmark),
+        "local_accuracy": (
+            sum(
+                satisfied == (benchmark[index]["answer"] == "Yes")
+                for index, satisfied in confident
+            )
+            / len(confident)
+            if confident
+            else None
+        ),
+        "mean_local_latency_us": 1e6 * elapsed / len(benchmark),
+    }
+    if llm_answers is not None:
+        report["llm_agreement"] = (
+            sum(
+                satisfied == (llm_answers[index] == "Yes")
+                for index, satisfied in confident
+            )
+            / len(confident)
+            if confident
+            else None
+        )
+    return report
+
+
+# Report the classifier's cross-validated coverage and agreement on the benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the local evaluation classifier's coverage and agreement."
+    )
+    parser.add_argument(
+        "--benchmark",
+        default=os.path.join(
+            project_root, "benchmarks", "satisfactory_recipes_benchmark.json"
+        ),
+    )
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument(
+        "--embeddings",
+        action="store_true",
+        help="Use MiniLM embeddings instead of word-pair features.",
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Add synthetic restriction violations to the training folds.",
+    )
+    parser.add_argument(
+        "--llm",
+        action="store_true",
+        help="Also measure agreement with the LLM evaluation agent.",
+    )
+    args = parser.parse_args()
+
+    with open(args.benchmark, "r") as f:
+        satisfactory_recipes_benchmark = json.load(f)
+
+    embedding_function = None
+    if args.embeddings:
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        embedding_function = DefaultEmbeddingFunction()
+
+    llm_answers = None
+    if args.llm:
+        from dotenv import load_dotenv
+        from openai import OpenAI
+        from src.agents.evaluation_agent import EvaluationAgent
+
+        load_dotenv()
+        eval_agent = EvaluationAgent(
+            OpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY"))
+        )
+        llm_answers = [
+            "Yes" if result.satisfied else "No"
+            for result in eval_agent.evaluate_batch(
+                [(e["recipe"], e["request"]) for e in satisfactory_recipes_benchmark]
+            )
+        ]
+
+    # Cross-validate; synthetic examples are derived from the training folds only
+    folds = 5
+    reports = []
+    for fold in range(folds):
+        train = [
+            e for i, e in enumerate(satisfactory_recipes_benchmark) if i % folds != fold
+        ]
+        test_indices = [
+            i for i in range(len(satisfactory_recipes_benchmark)) if i % folds == fold
+        ]
+        classifier = EvaluationClassifier(
+            embedding_function=embedding_function, threshold=args.threshold
+        ).fit(train + (synthesize_examples(train) if args.synthetic else []))
+        reports.append(
+            evaluate_classifier(
+                classifier,
+                [satisfactory_recipes_benchmark[i] for i in test_indices],
+                [llm_answers[i] for i in test_indices] if llm_answers else None,
+            )
+        )
+
+    print(
+        json.dumps(
+            {
+                key: (
+                    sum(r[key] for r in reports if r[key] is not None)
+                    / max(1, sum(r[key] is not None for r in reports))
+                )
+                for key in reports[0]
+                if key != "cases"
+            },
+            indent=4,
+        )
+    )
@@ -1,17 +1,29 @@
-import hashlib
 import json
 import re
-from typing import Literal
-from src.datatypes import AgentResponse, TextResponse, ToolDescription, ToolResponse
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Iterator, Literal
+from src.agents.context_window import ContextWindow
+from src.agents.response_cache import SemanticResponseCache
+from src.agents.tool_call_parser import ToolCallStreamParser
+from src.agents.tool_router import ToolRouter
+from src.instrumentation import instrumentation
+from src.memory import DEFAULT_SESSION, MemoryStore, MemoryWriter, get_memory_store
+from src.tools.tool_cache import ToolResultCache
+from src.datatypes import (
+    AgentResponse,
+    ConversationState,
+    StreamingTextResponse,
+    TextResponse,
+    ToolDescription,
+    ToolResponse,
+)
 from openai import OpenAI
-import chromadb
-import os
 
-# Get the project root directory
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-
-# Initialize a persistent ChromaDB client to store agent memory
-database = chromadb.PersistentClient(path=f"{project_root}/chromadb")
+# Number of completions kept in the prompt token log
+PROMPT_TOKEN_LOG_SIZE = 1000
 
 
 class RecipeAgent:
@@ -21,11 +33,26 @@ class RecipeAgent:
     """
 
     # Class attributes
-    conversation: list[dict]
     client: OpenAI
     tools: list[ToolDescription]
     max_internal_iteration: int
     temperature: float
+    tool_executor: ThreadPoolExecutor
+    system_message: dict
+    sessions: OrderedDict[str, ConversationState]
+    max_sessions: int
+    early_tool_abort: bool
+    eager_tool_execution: bool
+    compact_tool_prompt: bool
+    measure_prompt_tokens: bool
+    prompt_token_log: deque[dict]
+    router: ToolRouter | None
+    response_cache: SemanticResponseCache | None
+    tool_cache: ToolResultCache | None
+    context_window: ContextWindow | None
+    tool_call_mode: Literal["text", "function"]
+    memory: MemoryStore
+    memory_writer: MemoryWriter
 
     BASE_SYSTEM_PROMPT = (
         "You are a highly accurate recipe-writing agent that assists users in creating recipes tailored to their dietary restrictions. "
@@ -45,12 +72,31 @@ class RecipeAgent:
         "Give your response in Markdown format."
     )
 
+    SUMMARY_SYSTEM_PROMPT = (
+        "You are an expert at distilling user queries into precise, concise strings for multi-turn agent interaction. "
+        "Using only the information explicitly provided in the user's query, summarize:\n"
+        "1. The core intent of the query.\n"
+        "2. Any key details or parameters required to fulfill the request.\n\n"
+        "Do not infer or assume additional context."
+    )
+
     def __init__(
         self,
         client: OpenAI,
         tools: list[ToolDescription] = [],
         max_internal_iteration: int = 5,
         temperature: float = 0.1,
+        max_tool_workers: int = 4,
+        max_sessions: int = 1024,
+        early_tool_abort: bool = False,
+        eager_tool_execution: bool = False,
+        compact_tool_prompt: bool = False,
+        measure_prompt_tokens: bool = False,
+        router: ToolRouter | None = None,
+        response_cache: SemanticResponseCache | None = None,
+        tool_cache: ToolResultCache | None = None,
+        context_window: ContextWindow | None = None,
+        tool_call_mode: Literal["text", "function"] = "text",
     ):
         """
         Initialize the RecipeAgent.
@@ -60,30 +106,112 @@ class RecipeAgent:
             tools (list[ToolDescription]): List of tools the agent can use.
             max_internal_iteration (int): Max internal tool iterations per query.
             temperature (float): Sampling temperature for completions.
+            max_tool_workers (int): Max tool calls executed concurrently.
+            max_sessions (int): Max conversations kept; the least recently used is dropped first.
+            early_tool_abort (bool): Stream completions and stop generating once the model
+                has finished writing its tool calls.
+            eager_tool_execution (bool): Start each tool as soon as its call is complete in
+                the stream, while the model is still writing.
+            compact_tool_prompt (bool): Describe tools in one line each with a single shared
+                example call, shortening the system prompt.
+            measure_prompt_tokens (bool): Record the prompt token usage reported for each
+                completion in prompt_token_log.
+            router (ToolRouter | None): Predicts tool calls from the query so they run
+                before the first completion instead of after a planning completion.
+            response_cache (SemanticResponseCache | None): Answers near-identical queries
+                with cached responses.
+            tool_cache (ToolResultCache | None): Memoizes tool results across turns and
+                sessions, following each tool's caching policy.
+            context_window (ContextWindow | None): Fits each prompt to a token budget,
+                trimming tool results and summarizing long previous answers.
+            tool_call_mode (Literal["text", "function"]): How the model calls tools. "text"
+                parses `Call function_name:` blocks from the completion; "function" passes
+                the tools' JSON schemas to the server's function calling, so arguments
+                are decoded as valid JSON instead of scraped from text.
         """
         self.client = client
         self.tools = tools
         self.temperature = temperature
         self.max_internal_iteration = max_internal_iteration
+        self.early_tool_abort = early_tool_abort
+        self.eager_tool_execution = eager_tool_execution
+        self.compact_tool_prompt = compact_tool_prompt
+        self.measure_prompt_tokens = measure_prompt_tokens
+        self.prompt_token_log = deque(maxlen=PROMPT_TOKEN_LOG_SIZE)
+        self.router = router
+        self.response_cache = response_cache
+        self.tool_cache = tool_cache
+        self.context_window = context_window
+        self.tool_call_mode = tool_call_mode
 
-        # Initialize conversation with the system prompt
-        self.conversation = [
-            {
-                "role": "system",
-                "content": (
-                    self.BASE_SYSTEM_PROMPT
-                    + f"You have access to {len(self.tools)} tools:\n\n{self._format_tool_description()}"
-                ),
-            },
-        ]
+        # Worker pool used to run independent tool calls of one completion concurrently.
+        # A call that times out cannot be interrupted and holds its worker until the tool
+        # returns, so tools must bound their own I/O (e.g. request timeouts) for the pool
+        # to recover.
+        self.tool_executor = ThreadPoolExecutor(
+            max_workers=max_tool_workers, thread_name_prefix="recipe-agent-tool"
+        )
+
+        # System prompt shared by the conversation of every session. It is built once and
+        # always sent first, so the server can reuse its cached prefix across calls.
+        self.system_message = {
+            "role": "system",
+            "content": (
+                self.BASE_SYSTEM_PROMPT
+                + f"You have access to {len(self.tools)} tools:\n\n{self._format_tool_description()}"
+            ),
+        }
+
+        # Conversation state of each session, in least recently used order, guarded by a
+        # lock as turns of different sessions run on different threads
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self._sessions_lock = threading.Lock()
+
+        # Memory persists across restarts; only the memories past retention are dropped.
+        # The store is shared with the access_memory tool
+        self.memory = get_memory_store()
+        self.memory.compact()
 
-        # Track tool usage results
-        self.conversation_tool_results = {tool.name: None for tool in self.tools}
+        # Responses are stored in memory in the background, batched across sessions
+        self.memory_writer = MemoryWriter(self.memory)
 
-        # Reset or initialize the memory collection
-        if "memory" in database.list_collections():
-            database.delete_collection("memory")
-        self.memory = database.get_or_create_collection(name="memory")
+    @property
+    def conversation(self) -> list[dict]:
+        """The conversation of the default session."""
+        return self._get_session(DEFAULT_SESSION).conversation
+
+    @conversation.setter
+    def conversation(self, conversation: list[dict]):
+        self._get_session(DEFAULT_SESSION).conversation = conversation
+
+    @property
+    def conversation_tool_results(self) -> dict[str, Any]:
+        """The tool results of the default session's latest turn."""
+        return self._get_session(DEFAULT_SESSION).tool_results
+
+    def _get_session(self, session_id: str) -> ConversationState:
+        """
+        Get the conversation state of a session, creating it if needed.
+
+        Args:
+            session_id (str): The session identifier.
+
+        Returns:
+            ConversationState: The session's conversation state.
+        """
+        with self._sessions_lock:
+            state = self.sessions.get(session_id)
+            if state is None:
+                state = ConversationState(
+                    conversation=[self.system_message], session_id=session_id
+                )
+                self.sessions[session_id] = state
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session_id)
+            return state
 
     def _format_tool_description(self) -> str:
         """
@@ -92,24 +220,371 @@ class RecipeAgent:
         Returns:
             str: A formatted string of all tool descriptions.
         """
+        if self.compact_tool_prompt and self.tools:
+            descriptions = "\n".join(
+                f"- {tool.get_prompt(compact=True)}" for tool in self.tools
+            )
+            return f"{descriptions}\nExample tool call:\n{self.tools[0].example_json}"
         return "\n-".join([tool.get_prompt() for tool in self.tools])
 
-    def _chat_completion(self, conversation: list[dict]) -> str:
+    def _record_usage(self, usage: Any, conversation: list[dict]):
+        """
+        Record the token usage of a completion when measuring prompt tokens, and count
+        it when instrumentation is enabled.
+
+        Args:
+            usage (Any): The usage reported by the server, if any.
+            conversation (list[dict]): The conversation sent as the prompt.
+        """
+        if usage is None:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        if instrumentation.enabled:
+            instrumentation.count("llm_prompt_tokens", usage.prompt_tokens)
+            instrumentation.count("llm_completion_tokens", usage.completion_tokens)
+            instrumentation.count(
+                "llm_cached_tokens", getattr(details, "cached_tokens", None) or 0
+            )
+        if not self.measure_prompt_tokens:
+            return
+
+        self.prompt_token_log.append(
+            {
+                "messages": len(conversation),
+                "estimated_prompt_tokens": (
+                    self.context_window.count_messages(conversation)
+                    if self.context_window is not None
+                    else None
+                ),
+                "prompt_tokens": usage.prompt_tokens,
+                "cached_tokens": getattr(details, "cached_tokens", None),
+                "completion_tokens": usage.completion_tokens,
+            }
+        )
+
+    def _chat_completion(
+        self, conversation: list[dict], with_tools: bool = True
+    ) -> str:
         """
         Generate a chat completion based on the conversation history.
 
         Args:
             conversation (list[dict]): The current conversation context.
+            with_tools (bool): Whether the model may call the agent's tools.
 
         Returns:
-            str: The assistant's response.
+            str: The assistant's response, with any function calls written as
+                `Call function_name:` blocks.
         """
-        completion = self.client.chat.completions.create(
-            messages=conversation,
-            model="meta-llama/Meta-Llama-3.1-8B-Instruct",
-            temperature=self.temperature,
+        with instrumentation.span("llm.chat_completion", messages=len(conversation)):
+            completion = self.client.chat.completions.create(
+                messages=conversation,
+                model="meta-llama/Meta-Llama-3.1-8B-Instruct",
+                temperature=self.temperature,
+                **(self._tool_options() if with_tools else {}),
+            )
+        self._record_usage(completion.usage, conversation)
+        message = completion.choices[0].message
+        return (message.content or "") + self._render_tool_calls(
+            [
+                (call.function.name, call.function.arguments)
+                for call in getattr(message, "tool_calls", None) or []
+            ]
         )
-        return completion.choices[0].message.content
+
+    def _tool_options(self) -> dict:
+        """
+        Build the extra arguments that enable function calling.
+
+        Returns:
+            dict: The tool definitions in function mode, otherwise nothing.
+        """
+        if self.tool_call_mode != "function" or not self.tools:
+            return {}
+        return {
+            "tools": [tool.json_schema() for tool in self.tools],
+            "tool_choice": "auto",
+        }
+
+    @staticmethod
+    def _render_tool_calls(tool_calls: list[tuple[str, str]]) -> str:
+        """
+        Write function calls as the `Call function_name:` blocks used in text mode, so
+        both modes share the same conversation format and parsing.
+
+        Args:
+            tool_calls (list[tuple[str, str]]): The function names with their JSON arguments.
+
+        Returns:
+            str: The rendered calls.
+        """
+        text = ""
+        for name, arguments in tool_calls:
+            try:
+                arguments = json.loads(arguments or "{}")
+            except json.JSONDecodeError:
+                continue
+            arguments_json = json.dumps(arguments, indent=4) if arguments else "{\n}"
+            text += f"\nCall {name}:\n```json\n{arguments_json}\n```\n"
+        return text
+
+    @classmethod
+    def _accumulate_tool_calls(
+        cls, pending: dict[int, list[str]], tool_call_deltas: list[Any]
+    ) -> str:
+        """
+        Collect the fragments of streamed function calls.
+
+        Args:
+            pending (dict[int, list[str]]): The name and arguments of the calls still being
+                streamed, by index; updated in place.
+            tool_call_deltas (list[Any]): The function call fragments of a chunk.
+
+        Returns:
+            str: The rendered calls that were completed by the chunk.
+        """
+        text = ""
+        for delta in tool_call_deltas:
+            if delta.index not in pending:
+                # Calls are streamed one after another, so a new call ends the previous
+                text += cls._flush_tool_calls(pending)
+                pending[delta.index] = ["", ""]
+            if delta.function is not None:
+                pending[delta.index][0] += delta.function.name or ""
+                pending[delta.index][1] += delta.function.arguments or ""
+        return text
+
+    @classmethod
+    def _flush_tool_calls(cls, pending: dict[int, list[str]]) -> str:
+        """
+        Render the streamed function calls collected so far.
+
+        Args:
+            pending (dict[int, list[str]]): The name and arguments of the calls still being
+                streamed, by index; emptied in place.
+
+        Returns:
+            str: The rendered calls.
+        """
+        text = cls._render_tool_calls([tuple(call) for call in pending.values()])
+        pending.clear()
+        return text
+
+    def _stream_options(self) -> dict:
+        """
+        Build the extra arguments for streamed completions.
+
+        Returns:
+            dict: Asks the server to report usage in the last chunk when measuring or
+                instrumenting.
+        """
+        if self.measure_prompt_tokens or instrumentation.enabled:
+            return {"stream_options": {"include_usage": True}}
+        return {}
+
+    def _chat_completion_stream(self, conversation: list[dict]) -> Iterator[str]:
+        """
+        Stream a chat completion based on the conversation history.
+
+        Args:
+            conversation (list[dict]): The current conversation context.
+
+        Yields:
+            str: The chunks of the assistant's response as they are generated.
+        """
+        started = time.perf_counter()
+        first_token = None
+        with instrumentation.span(
+            "llm.chat_completion_stream", messages=len(conversation)
+        ) as span:
+            stream = self.client.chat.completions.create(
+                messages=conversation,
+                model="meta-llama/Meta-Llama-3.1-8B-Instruct",
+                temperature=self.temperature,
+                stream=True,
+                **self._stream_options(),
+                **self._tool_options(),
+            )
+            pending_calls = {}
+            try:
+                for chunk in stream:
+                    self._record_usage(getattr(chunk, "usage", None), conversation)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            span.set(first_token_ms=1000 * first_token)
+                        yield delta.content
+                    calls = self._accumulate_tool_calls(
+                        pending_calls, getattr(delta, "tool_calls", None) or []
+                    )
+                    if calls:
+                        yield calls
+                if pending_calls:
+                    yield self._flush_tool_calls(pending_calls)
+            finally:
+                # Closing the response cancels generation when the caller stops early
+                stream.close()
+
+    def _generate(
+        self,
+        state: ConversationState,
+        stream: bool,
+        started_calls: dict[tuple[str, str], Future],
+    ) -> Iterator[StreamingTextResponse | TextResponse]:
+        """
+        Generate the next completion, optionally streaming drafts of it.
+
+        Drafts only include text that cannot be part of a tool call; an empty draft is
+        yielded when a tool call is detected after text was already shown. With
+        early_tool_abort, generation stops once the model has finished its tool calls,
+        and with eager_tool_execution each call is started as soon as it is complete.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            stream (bool): Whether to stream drafts of the completion.
+            started_calls (dict[tuple[str, str], Future]): Filled with the tool calls
+                started while the completion was generated.
+
+        Yields:
+            StreamingTextResponse | TextResponse: Drafts of the completion, followed by
+                the full completion.
+        """
+        if not (stream or self.early_tool_abort or self.eager_tool_execution):
+            yield TextResponse(text=self._chat_completion(self._prompt(state)))
+            return
+
+        parser = ToolCallStreamParser([tool.name for tool in self.tools])
+        draft = ""
+        deltas = self._chat_completion_stream(self._prompt(state))
+        for delta in deltas:
+            if parser.feed(delta) != draft and stream:
+                draft = parser.draft
+                yield StreamingTextResponse(text=draft)
+
+            if self.eager_tool_execution:
+                self._start_completed_calls(state, parser, started_calls)
+            if self.early_tool_abort and parser.calls_finished:
+                deltas.close()
+                break
+
+        if parser.close() != draft and stream:
+            yield StreamingTextResponse(text=parser.draft)
+        yield TextResponse(text=parser.text)
+
+    def _start_completed_calls(
+        self,
+        state: ConversationState,
+        parser: ToolCallStreamParser,
+        started_calls: dict[tuple[str, str], Future],
+    ):
+        """
+        Start the tool calls completed in a stream that have not been started yet.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            parser (ToolCallStreamParser): The parser of the streamed completion.
+            started_calls (dict[tuple[str, str], Future]): The tool calls already started.
+        """
+        tools = {tool.name: tool for tool in self.tools}
+        for name, arguments in parser.completed_calls:
+            key = self._call_key(name, arguments)
+            if key in started_calls or state.tool_results[name] is not None:
+                continue
+            started_calls[key] = self._start_tool_call(
+                tools[name], arguments, state.session_id
+            )
+
+    def _started_calls_timeout(
+        self, started_calls: dict[tuple[str, str], Any]
+    ) -> float | None:
+        """
+        Get how long to wait for started tool calls: the longest timeout of their tools.
+
+        Args:
+            started_calls (dict[tuple[str, str], Any]): The started tool calls.
+
+        Returns:
+            float | None: The seconds to wait, or None if a tool has no timeout.
+        """
+        tools = {tool.name: tool for tool in self.tools}
+        timeouts = [tools[name].timeout for name, _ in started_calls]
+        return None if None in timeouts else max(timeouts, default=0.0)
+
+    def _settle_started_calls(self, started_calls: dict[tuple[str, str], Future]):
+        """
+        Settle the tool calls started while streaming a completion whose calls are not
+        run, as the turn reached its iteration limit. Queued calls are cancelled and
+        running ones waited for, up to their tools' timeouts, so none outlive the turn.
+
+        Args:
+            started_calls (dict[tuple[str, str], Future]): The started tool calls.
+        """
+        running = [future for future in started_calls.values() if not future.cancel()]
+        if running:
+            wait(running, timeout=self._started_calls_timeout(started_calls))
+
+    @staticmethod
+    def _call_key(name: str, arguments: dict) -> tuple[str, str]:
+        """
+        Build a key identifying a tool call by its name and arguments.
+
+        Args:
+            name (str): The name of the tool.
+            arguments (dict): The arguments of the call.
+
+        Returns:
+            tuple[str, str]: The tool name and its canonical JSON arguments.
+        """
+        return name, json.dumps(arguments, sort_keys=True)
+
+    def _start_tool_call(
+        self, tool: ToolDescription, arguments: dict, session_id: str
+    ) -> Future:
+        """
+        Start a tool call on the tool worker pool.
+
+        Args:
+            tool (ToolDescription): The tool to call.
+            arguments (dict): The arguments of the call.
+            session_id (str): The session the call is made for.
+
+        Returns:
+            Future: The pending result of the call and its duration.
+        """
+        return self.tool_executor.submit(self._call_tool, tool, arguments, session_id)
+
+    def _call_tool(
+        self, tool: ToolDescription, arguments: dict, session_id: str
+    ) -> tuple[Any, float]:
+        """
+        Call a tool, reusing its memoized result when a tool cache is set.
+
+        Session-scoped tools always receive the caller's session, so the model cannot
+        make them read another session's data, and wait for the session's queued memory
+        writes so they see its latest responses.
+
+        Args:
+            tool (ToolDescription): The tool to call.
+            arguments (dict): The arguments of the call.
+            session_id (str): The session the call is made for.
+
+        Returns:
+            tuple[Any, float]: The tool's result and the seconds the call took.
+        """
+        start = time.perf_counter()
+        with instrumentation.span(f"tool.{tool.name}", session_id=session_id):
+            if tool.session_scoped:
+                arguments = {**arguments, "session_id": session_id}
+                self.memory_writer.flush(session_id)
+            if self.tool_cache is None:
+                result = tool.function(**arguments)
+            else:
+                result = self.tool_cache.call(tool, arguments)
+        return result, time.perf_counter() - start
 
     def _extract_json(
         self, text: str, name: str, match_num: int = 0
@@ -125,14 +600,82 @@ class RecipeAgent:
         Returns:
             dict | Literal["failed"]: The extracted JSON object or "failed" if parsing fails.
         """
-        pattern = rf"Call {name}:\s*```json\n\{{[\s\S]*?\n\}}\n```"
+        pattern = rf"Call {re.escape(name)}:\s*```json\n(\{{[\s\S]*?\n\}})\n```"
         matches = list(re.finditer(pattern, text))
         if match_num < len(matches):
-            match = matches[match_num]
-            json_object = match.group(0).strip(f"Call {name}:\n```json").strip("```")
-            return json.loads(json_object)
+            try:
+                return json.loads(matches[match_num].group(1))
+            except json.JSONDecodeError:
+                return "failed"
         return "failed"
 
+    def _execute_tool_calls(
+        self,
+        state: ConversationState,
+        tool_calls: list[tuple[ToolDescription, dict]],
+        started_calls: dict[tuple[str, str], Future] | None = None,
+    ) -> list[tuple[Any, float]]:
+        """
+        Execute independent tool calls concurrently, each bounded by its tool's timeout.
+
+        A call that times out is abandoned, not stopped: once running, it keeps its worker
+        thread until the tool returns, and its late result is discarded.
+
+        Args:
+            state (ConversationState): The conversation state of the calling session.
+            tool_calls (list[tuple[ToolDescription, dict]]): The tools to call with their arguments.
+            started_calls (dict[tuple[str, str], Future] | None): Tool calls already
+                started while the completion was streamed, which are awaited instead of
+                run again.
+
+        Returns:
+            list[tuple[Any, float]]: The tool results with the seconds each call took, in
+                the same order as `tool_calls`.
+        """
+        started_calls = started_calls or {}
+        started = time.monotonic()
+        futures = [
+            started_calls.get(self._call_key(tool.name, arguments))
+            or self._start_tool_call(tool, arguments, state.session_id)
+            for tool, arguments in tool_calls
+        ]
+
+        results = []
+        for (tool, _), future in zip(tool_calls, futures):
+            remaining = None
+            if tool.timeout is not None:
+                remaining = max(0.0, started + tool.timeout - time.monotonic())
+            try:
+                results.append(future.result(timeout=remaining))
+            except TimeoutError:
+                # Cancelling only drops a call still queued; a running call keeps its
+                # worker until the tool returns, and its late result is discarded
+                future.cancel()
+                results.append(
+                    (
+                        {
+                            "error": f"{tool.name} timed out after {tool.timeout} seconds"
+                        },
+                        time.monotonic() - started,
+                    )
+                )
+        return results
+
+    def _summary_conversation(self, text: str) -> list[dict]:
+        """
+        Build the conversation used to summarize user input.
+
+        Args:
+            text (str): The user input text.
+
+        Returns:
+            list[dict]: The summarization conversation.
+        """
+        return [
+            {"role": "system", "content": self.SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Text to summarize:\n{text}"},
+        ]
+
     def _summarization(self, text: str) -> str:
         """
         Summarize user input into a concise query.
@@ -143,98 +686,420 @@ class RecipeAgent:
         Returns:
             str: The summarized query.
         """
-        summary_prompt = (
-            "You are an expert at distilling user queries into precise, concise strings for multi-turn agent interaction. "
-            "Using only the information explicitly provided in the user's query, summarize:\n"
-            "1. The core intent of the query.\n"
-            "2. Any key details or parameters required to fulfill the request.\n\n"
-            "Do not infer or assume additional context."
+        return self._chat_completion(self._summary_conversation(text), with_tools=False)
+
+    def _prompt(self, state: ConversationState) -> list[dict]:
+        """
+        Build the prompt for the next completion, fitted to the context window if set.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+
+        Returns:
+            list[dict]: The messages to send to the model.
+        """
+        if self.context_window is None:
+            return state.conversation
+        return self.context_window.fit(state.conversation, state.turn_start)
+
+    def _history_to_summarize(self, state: ConversationState) -> str | None:
+        """
+        Find the previous answer that is too long to carry into the current turn.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+
+        Returns:
+            str | None: The previous answer, cut to fit a summarization prompt, or None
+                if it fits the history budget.
+        """
+        if self.context_window is None or state.turn_start < 2:
+            return None
+
+        previous = state.conversation[state.turn_start - 1]
+        if previous["role"] != "assistant" or not self.context_window.needs_summary(
+            previous
+        ):
+            return None
+        return self.context_window.truncate(
+            previous["content"], self.context_window.max_prompt_tokens // 2
         )
-        summary_convo = [
-            {"role": "system", "content": summary_prompt},
-            {"role": "user", "content": f"Text to summarize:\n{text}"},
+
+    def _compact_history(self, state: ConversationState):
+        """
+        Replace a previous answer that exceeds the history budget with its summary.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+        """
+        previous = self._history_to_summarize(state)
+        if previous is not None:
+            state.conversation[state.turn_start - 1] = {
+                "role": "assistant",
+                "content": self._summarization(previous),
+            }
+
+    def _format_tool_result(self, result: Any) -> str:
+        """
+        Render a tool result for the conversation, trimmed to the tool result budget.
+
+        Args:
+            result (Any): The tool's result.
+
+        Returns:
+            str: The result text.
+        """
+        if self.context_window is None:
+            return str(result)
+        return self.context_window.truncate(
+            str(result), self.context_window.max_tool_result_tokens
+        )
+
+    def _begin_turn(self, state: ConversationState, user_message: str):
+        """
+        Reset per-turn tool results and add the user query to the conversation.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            user_message (str): The user's query.
+        """
+        state.tool_results = {tool.name: None for tool in self.tools}
+
+        # Keep only the system prompt and last response in conversation
+        if len(state.conversation) > 1:
+            state.conversation = [state.conversation[0], state.conversation[-1]]
+
+        state.turn_start = len(state.conversation)
+        state.conversation.append({"role": "user", "content": user_message})
+
+    def _route_tool_calls(
+        self, user_message: str
+    ) -> list[tuple[ToolDescription, dict]]:
+        """
+        Predict the tool calls for a user query with the router, if one is set.
+
+        Args:
+            user_message (str): The user's query.
+
+        Returns:
+            list[tuple[ToolDescription, dict]]: The predicted tools with their arguments.
+        """
+        if self.router is None:
+            return []
+
+        tools = {tool.name: tool for tool in self.tools}
+        return [
+            (tools[name], arguments)
+            for name, arguments in self.router.route(user_message)
+            if name in tools
         ]
-        return self._chat_completion(summary_convo)
 
-    def say(
-        self, user_message: str, add_to_memory: bool = True
-    ) -> tuple[TextResponse, list[AgentResponse]]:
+    @staticmethod
+    def _previous_answer(state: ConversationState) -> str | None:
         """
-        Process a user query and return the agent's response.
+        Get the previous answer carried into the current turn's prompt.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+
+        Returns:
+            str | None: The previous answer, or None on the first turn of the session.
+        """
+        if state.turn_start < 2:
+            return None
+        previous = state.conversation[state.turn_start - 1]
+        return previous["content"] if previous["role"] == "assistant" else None
+
+    def _lookup_response_cache(
+        self,
+        state: ConversationState,
+        user_message: str,
+        routed_calls: list[tuple[ToolDescription, dict]],
+    ) -> list[AgentResponse] | None:
+        """
+        Look up a cached answer to a query, if a response cache and a router are set.
+        Only answers given after the same previous answer match, as it is part of the
+        prompt. Without a router every query predicts no tool calls, so queries that
+        differ only in a tool argument would share an answer.
 
         Args:
+            state (ConversationState): The session's conversation state.
             user_message (str): The user's query.
-            add_to_memory (bool): Whether to store the response in memory.
+            routed_calls (list[tuple[ToolDescription, dict]]): The tool calls predicted by the router.
 
         Returns:
-            tuple: The final agent response and steps taken during processing.
+            list[AgentResponse] | None: The cached steps ending with the response, or None.
         """
-        steps_taken = []
-        self.conversation_tool_results = {tool.name: None for tool in self.tools}
+        if self.response_cache is None or self.router is None:
+            return None
 
-        # Keep only the system prompt and last response in conversation
-        if len(self.conversation) > 1:
-            self.conversation = [self.conversation[0], self.conversation[-1]]
+        cached = self.response_cache.lookup(
+            user_message,
+            [(tool.name, arguments) for tool, arguments in routed_calls],
+            self._previous_answer(state),
+        )
+        instrumentation.count(
+            "cache_lookups",
+            cache="response",
+            result="miss" if cached is None else "hit",
+        )
+        return None if cached is None else cached[1]
 
-        # Add user query to conversation
-        self.conversation.append({"role": "user", "content": user_message})
-        completion = self._chat_completion(self.conversation)
-        self.conversation.append({"role": "assistant", "content": completion})
+    def _store_response_cache(
+        self,
+        state: ConversationState,
+        user_message: str,
+        ran_calls: list[tuple[ToolDescription, dict]],
+        steps_taken: list[AgentResponse],
+    ):
+        """
+        Cache the answer to a query, if a response cache and a router are set. The
+        answer is keyed on the tool calls that ran, so a lookup only matches it when
+        the router predicts all of them.
 
-        # Process tool calls iteratively
-        completion_tool_calls = [
-            tool for tool in self.tools if f"Call {tool.name}" in completion
+        Args:
+            state (ConversationState): The session's conversation state.
+            user_message (str): The user's query.
+            ran_calls (list[tuple[ToolDescription, dict]]): The tool calls run for the query.
+            steps_taken (list[AgentResponse]): The steps taken, ending with the response.
+        """
+        if self.response_cache is None or self.router is None:
+            return
+
+        self.response_cache.store(
+            user_message,
+            [(tool.name, arguments) for tool, arguments in ran_calls],
+            steps_taken[-1],
+            steps_taken,
+            self._previous_answer(state),
+        )
+
+    def _detect_tool_calls(self, completion: str) -> list[ToolDescription]:
+        """
+        Find the tools called in a completion.
+
+        Args:
+            completion (str): The assistant's response.
+
+        Returns:
+            list[ToolDescription]: The called tools, in declaration order.
+        """
+        return [tool for tool in self.tools if f"Call {tool.name}" in completion]
+
+    def _plan_tool_calls(
+        self,
+        state: ConversationState,
+        completion: str,
+        completion_tool_calls: list[ToolDescription],
+    ) -> list[tuple[ToolDescription, dict | None]]:
+        """
+        Resolve the arguments of the tool calls in a completion so they can run together.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            completion (str): The assistant's response containing the tool calls.
+            completion_tool_calls (list[ToolDescription]): The tools called in the completion.
+
+        Returns:
+            list[tuple[ToolDescription, dict | None]]: Each called tool with its arguments,
+                or None if the tool was already executed this turn.
+        """
+        # Drop this turn's tool-calling completions; earlier messages are kept as they
+        # are so every call of the turn shares the same prompt prefix
+        state.conversation = state.conversation[: state.turn_start] + [
+            msg
+            for msg in state.conversation[state.turn_start :]
+            if msg["role"] != "assistant"
         ]
-        internal_iterations = 0
-        while (
-            completion_tool_calls and internal_iterations < self.max_internal_iteration
-        ):
-            self.conversation = [
-                msg for msg in self.conversation if msg["role"] != "assistant"
-            ]
-            for tool in completion_tool_calls:
-                if self.conversation_tool_results[tool.name] is not None:
-                    self.conversation.append(
-                        {
-                            "role": "user",
-                            "content": f"Already executed {tool.name}. Do not use again.",
-                        }
-                    )
-                    continue
 
-                arguments = self._extract_json(completion, name=tool.name)
-                if arguments == "failed":
-                    continue
+        planned_calls = []
+        for tool in completion_tool_calls:
+            if state.tool_results[tool.name] is not None:
+                planned_calls.append((tool, None))
+                continue
 
-                result = tool.function(**arguments)
-                self.conversation_tool_results[tool.name] = result
-                self.conversation.append(
+            arguments = self._extract_json(completion, name=tool.name)
+            if arguments == "failed":
+                continue
+            planned_calls.append((tool, arguments))
+        return planned_calls
+
+    def _record_tool_results(
+        self,
+        state: ConversationState,
+        planned_calls: list[tuple[ToolDescription, dict | None]],
+        results: list[tuple[Any, float]],
+    ) -> list[ToolResponse]:
+        """
+        Append tool results to the conversation in the order the tools were declared.
+
+        Args:
+            state (ConversationState): The session's conversation state.
+            planned_calls (list[tuple[ToolDescription, dict | None]]): The planned tool calls.
+            results (list[tuple[Any, float]]): The results of the executed calls with the
+                seconds each took, in order.
+
+        Returns:
+            list[ToolResponse]: The steps for the executed tool calls.
+        """
+        steps = []
+        results = iter(results)
+        for tool, arguments in planned_calls:
+            if arguments is None:
+                state.conversation.append(
                     {
                         "role": "user",
-                        "content": f"Assistant Call {tool.name}:\n{arguments}\nreturned:\n{result}",
+                        "content": f"Already executed {tool.name}. Do not use again.",
                     }
                 )
-                steps_taken.append(
-                    ToolResponse(
-                        tool_name=tool.name, text=str(arguments), tool_result=result
-                    )
+                continue
+
+            result, duration = next(results)
+            state.tool_results[tool.name] = result
+            result_text = self._format_tool_result(result)
+            state.conversation.append(
+                {
+                    "role": "user",
+                    "content": f"Assistant Call {tool.name}:\n{arguments}\nreturned:\n{result_text}",
+                }
+            )
+            steps.append(
+                ToolResponse(
+                    tool_name=tool.name,
+                    text=str(arguments),
+                    tool_result=result,
+                    duration=duration,
                 )
+            )
+        return steps
 
-            completion = self._chat_completion(self.conversation)
-            self.conversation.append({"role": "assistant", "content": completion})
-            completion_tool_calls = [
-                tool for tool in self.tools if f"Call {tool.name}" in completion
-            ]
+    def _remember(self, session_id: str, text: str):
+        """
+        Queue a response to be stored in a session's memory without waiting for the write.
+
+        Args:
+            session_id (str): The session the response belongs to.
+            text (str): The response text.
+        """
+        self.memory_writer.put(session_id, text)
+
+    def _run_turn(
+        self, user_message: str, add_to_memory: bool, session_id: str, stream: bool
+    ) -> Iterator[AgentResponse]:
+        """
+        Process a user query, yielding each step as it happens.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
+            stream (bool): Whether to stream drafts of each completion.
+
+        Yields:
+            AgentResponse: Drafts of the response, tool steps and finally the response.
+        """
+        state = self._get_session(session_id)
+        self._begin_turn(state, user_message)
+        self._compact_history(state)
+        routed_calls = self._route_tool_calls(user_message)
+
+        # Answer from the response cache when a similar query was already answered
+        cached_steps = self._lookup_response_cache(state, user_message, routed_calls)
+        if cached_steps is not None:
+            state.conversation.append(
+                {"role": "assistant", "content": cached_steps[-1].text}
+            )
+            if add_to_memory:
+                self._remember(session_id, cached_steps[-1].text)
+            yield from cached_steps
+            return
+
+        # Run the tools predicted by the router before the first completion
+        steps_taken = []
+        ran_calls = list(routed_calls)
+        if routed_calls:
+            results = self._execute_tool_calls(state, routed_calls)
+            steps_taken.extend(self._record_tool_results(state, routed_calls, results))
+            yield from steps_taken
+
+        # Process tool calls iteratively
+        internal_iterations = 1 if routed_calls else 0
+        while True:
+            started_calls = {}
+            for item in self._generate(state, stream, started_calls):
+                if isinstance(item, TextResponse):
+                    completion = item.text
+                else:
+                    yield item
+            state.conversation.append({"role": "assistant", "content": completion})
+
+            completion_tool_calls = self._detect_tool_calls(completion)
+            if (
+                not completion_tool_calls
+                or internal_iterations >= self.max_internal_iteration
+            ):
+                self._settle_started_calls(started_calls)
+                break
+
+            planned_calls = self._plan_tool_calls(
+                state, completion, completion_tool_calls
+            )
+            new_calls = [call for call in planned_calls if call[1] is not None]
+            results = self._execute_tool_calls(state, new_calls, started_calls)
+            ran_calls.extend(new_calls)
+            tool_steps = self._record_tool_results(state, planned_calls, results)
+            steps_taken.extend(tool_steps)
+            yield from tool_steps
             internal_iterations += 1
 
         response = TextResponse(text=completion)
         steps_taken.append(response)
+        self._store_response_cache(state, user_message, ran_calls, steps_taken)
 
         # Add response to memory if enabled
         if add_to_memory:
-            self.memory.add(
-                documents=[response.text],
-                ids=[hashlib.sha256(response.text.encode("utf-8")).hexdigest()],
-            )
+            self._remember(session_id, response.text)
+
+        yield response
+
+    def say(
+        self,
+        user_message: str,
+        add_to_memory: bool = True,
+        session_id: str = DEFAULT_SESSION,
+    ) -> tuple[TextResponse, list[AgentResponse]]:
+        """
+        Process a user query and return the agent's response.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
 
-        return response, steps_taken
+        Returns:
+            tuple: The final agent response and steps taken during processing.
+        """
+        steps_taken = list(
+            self._run_turn(user_message, add_to_memory, session_id, stream=False)
+        )
+        return steps_taken[-1], steps_taken
+
+    def say_stream(
+        self,
+        user_message: str,
+        add_to_memory: bool = True,
+        session_id: str = DEFAULT_SESSION,
+    ) -> Iterator[AgentResponse]:
+        """
+        Process a user query, streaming the agent's response as it is generated.
+
+        Args:
+            user_message (str): The user's query.
+            add_to_memory (bool): Whether to store the response in memory.
+            session_id (str): The session whose conversation the query continues.
+
+        Yields:
+            AgentResponse: StreamingTextResponse drafts of the response, ToolResponse
+                steps as tools finish, and finally the complete TextResponse.
+        """
+        yield from self._run_turn(user_message, add_to_memory, session_id, stream=True)
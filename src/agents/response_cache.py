@@ -0,0 +1,309 @@
+import copy
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Callable
+import numpy as np
+from src.cache import TTLCache
+from src.datatypes import AgentResponse, TextResponse
+from src.tools.tool_cache import ingest_version
+
+
+@dataclass
+class CachedResponse:
+    """
+    Represents an agent response stored in the semantic response cache.
+
+    Attributes:
+        embedding (np.ndarray): The unit-normalized embedding of the user query.
+        response (TextResponse): The agent's final response.
+        steps (list[AgentResponse]): The steps taken to produce the response.
+    """
+
+    embedding: np.ndarray
+    response: TextResponse
+    steps: list[AgentResponse]
+
+
+class SemanticResponseCache:
+    """
+    Caches agent responses by query embedding, so near-identical queries with the same
+    tool inputs are answered without running the agent.
+
+    Entries are keyed on the tool calls that ran for them, and a lookup only compares
+    queries whose predicted tool calls match, so queries that differ in an argument
+    ("without eggs" / "without milk") never share a response. The agent's prompt
+    carries its previous answer into the next turn, so a follow-up such as "make it
+    vegan" only matches entries that followed the same answer. Ingesting recipes
+    clears the cache, as cached answers may cite recipes that changed.
+    """
+
+    # Class attributes
+    embedding_function: Callable[[list[str]], list]
+    threshold: float
+    uncacheable_tools: set[str]
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        embedding_function: Callable[[list[str]], list],
+        threshold: float = 0.95,
+        ttl: float | None = 3600.0,
+        max_size: int = 1024,
+        uncacheable_tools: set[str] = {"access_memory"},
+    ):
+        """
+        Initialize the SemanticResponseCache.
+
+        Args:
+            embedding_function (Callable): Embeds a list of texts into vectors.
+            threshold (float): Min cosine similarity for a cached query to match.
+            ttl (float | None): Seconds a response stays cached, or None to never expire.
+            max_size (int): Max number of cached responses; the least recently used is evicted first.
+            uncacheable_tools (set[str]): Tools whose results depend on the session, so
+                responses using them are never cached.
+        """
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.uncacheable_tools = uncacheable_tools
+        self.hits = 0
+        self.misses = 0
+        self._entries = TTLCache(max_size=max_size, ttl=ttl)
+        self._buckets = {}
+        self._matrices = {}
+        self._ingest_version = ingest_version()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """
+        Normalize a query so that case and spacing differences share an entry.
+
+        Args:
+            text (str): The user query.
+
+        Returns:
+            str: The normalized query.
+        """
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def tool_inputs_key(tool_calls: list[tuple[str, dict]]) -> str:
+        """
+        Build the canonical form of the tool inputs of a turn.
+
+        Free-text "query" arguments are left out, since the query embedding already
+        compares them, and the calls are sorted so their order does not matter.
+
+        Args:
+            tool_calls (list[tuple[str, dict]]): The tool names with their arguments.
+
+        Returns:
+            str: The canonical JSON of the tool inputs.
+        """
+        calls = [
+            json.dumps(
+                [name, {k: v for k, v in arguments.items() if k != "query"}],
+                sort_keys=True,
+            )
+            for name, arguments in tool_calls
+        ]
+        return json.dumps(sorted(calls))
+
+    @staticmethod
+    def context_key(previous_response: str | None) -> str:
+        """
+        Build the key of the conversation a query continues.
+
+        Args:
+            previous_response (str | None): The previous answer kept in the prompt, or
+                None for the first turn of a session.
+
+        Returns:
+            str: The hex SHA-256 of the previous answer, or "" without one.
+        """
+        if previous_response is None:
+            return ""
+        return hashlib.sha256(previous_response.encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> np.ndarray:
+        """
+        Embed a normalized query into a unit vector.
+
+        Args:
+            text (str): The normalized query.
+
+        Returns:
+            np.ndarray: The unit-normalized embedding.
+        """
+        embedding = np.asarray(self.embedding_function([text])[0], dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+
+    def _check_ingest(self):
+        """
+        Clear the cache if recipes were ingested since it was filled. Call with the
+        lock held.
+        """
+        version = ingest_version()
+        if version != self._ingest_version:
+            self._entries.clear()
+            self._buckets.clear()
+            self._matrices.clear()
+            self._ingest_version = version
+
+    def _prune(self, bucket: tuple[str, str]) -> dict[str, np.ndarray]:
+        """
+        Drop the queries of a bucket whose entries expired or were evicted. Call with
+        the lock held.
+
+        Args:
+            bucket (tuple[str, str]): The context and tool inputs keys.
+
+        Returns:
+            dict[str, np.ndarray]: The embeddings of the bucket's cached queries.
+        """
+        embeddings = self._buckets.get(bucket, {})
+        for query in [q for q in embeddings if (bucket, q) not in self._entries]:
+            del embeddings[query]
+        if not embeddings:
+            self._buckets.pop(bucket, None)
+        return embeddings
+
+    def _bucket_matrix(self, bucket: tuple[str, str]) -> tuple[list[str], np.ndarray]:
+        """
+        Get the queries cached under a bucket with their stacked embeddings, rebuilt
+        only after the bucket changed. Call with the lock held.
+
+        Args:
+            bucket (tuple[str, str]): The context and tool inputs keys.
+
+        Returns:
+            tuple[list[str], np.ndarray]: The normalized queries and their embeddings.
+        """
+        if bucket not in self._matrices:
+            embeddings = self._prune(bucket)
+            if not embeddings:
+                return [], np.empty((0, 0), dtype=np.float32)
+            self._matrices[bucket] = (
+                list(embeddings),
+                np.stack(list(embeddings.values())),
+            )
+        return self._matrices[bucket]
+
+    def lookup(
+        self,
+        user_message: str,
+        tool_calls: list[tuple[str, dict]],
+        previous_response: str | None = None,
+    ) -> tuple[TextResponse, list[AgentResponse]] | None:
+        """
+        Find a cached response for a query.
+
+        Args:
+            user_message (str): The user query.
+            tool_calls (list[tuple[str, dict]]): The tool calls predicted for the query.
+            previous_response (str | None): The previous answer kept in the prompt.
+
+        Returns:
+            tuple | None: Copies of the cached response and steps, or None on a miss.
+        """
+        if any(name in self.uncacheable_tools for name, _ in tool_calls):
+            return None
+
+        normalized = self._normalize(user_message)
+        bucket = (self.context_key(previous_response), self.tool_inputs_key(tool_calls))
+        with self._lock:
+            self._check_ingest()
+            queries, embeddings = self._bucket_matrix(bucket)
+
+        if normalized in queries:
+            candidates = [normalized]
+        elif queries:
+            similarities = embeddings @ self._embed(normalized)
+            candidates = [
+                queries[i]
+                for i in np.argsort(-similarities)
+                if similarities[i] >= self.threshold
+            ]
+        else:
+            candidates = []
+
+        with self._lock:
+            for query in candidates:
+                entry = self._entries.get((bucket, query))
+                if entry is not None:
+                    self.hits += 1
+                    break
+            else:
+                self.misses += 1
+                return None
+
+        steps = copy.deepcopy(entry.steps)
+        return steps[-1], steps
+
+    def store(
+        self,
+        user_message: str,
+        tool_calls: list[tuple[str, dict]],
+        response: TextResponse,
+        steps: list[AgentResponse],
+        previous_response: str | None = None,
+    ):
+        """
+        Cache the response to a query unless it used a session-dependent tool.
+
+        Args:
+            user_message (str): The user query.
+            tool_calls (list[tuple[str, dict]]): The tool calls that ran for the query.
+            response (TextResponse): The agent's final response.
+            steps (list[AgentResponse]): The steps taken, ending with the response.
+            previous_response (str | None): The previous answer kept in the prompt.
+        """
+        used_tools = {name for name, _ in tool_calls} | {
+            getattr(step, "tool_name", None) for step in steps
+        }
+        if used_tools & self.uncacheable_tools:
+            return
+
+        normalized = self._normalize(user_message)
+        bucket = (self.context_key(previous_response), self.tool_inputs_key(tool_calls))
+        embedding = self._embed(normalized)
+        with self._lock:
+            self._check_ingest()
+            self._entries.set(
+                (bucket, normalized),
+                CachedResponse(
+                    embedding=embedding,
+                    response=response,
+                    steps=copy.deepcopy(steps),
+                ),
+            )
+            self._buckets.setdefault(bucket, {})[normalized] = embedding
+            self._matrices.pop(bucket, None)
+
+            # Evicted entries stay indexed until their bucket is rebuilt, so prune
+            # every bucket once the index outgrows the cache
+            if sum(map(len, self._buckets.values())) > 2 * self._entries.max_size:
+                self._matrices.clear()
+                for indexed in list(self._buckets):
+                    self._prune(indexed)
+
+    def stats(self) -> dict:
+        """
+        Report the cache's size and hit rate.
+
+        Returns:
+            dict: The number of cached responses, hits, misses, evictions and the hit rate.
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "size": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "evictions": self._entries.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,136 @@
+import json
+import re
+
+
+class ToolCallStreamParser:
+    """
+    Incrementally scans a streamed completion for tool calls, separating the text that is
+    safe to show the user from text that may belong to a `Call function_name:` block, and
+    parsing each call as soon as its fenced JSON arguments are complete.
+    """
+
+    # A Markdown heading starts the answer, which the model may write instead of waiting
+    # for the tool results; text between calls is not enough to end them
+    ANSWER_PATTERN = re.compile(r"^#", re.MULTILINE)
+
+    # Class attributes
+    tool_names: list[str]
+    markers: list[str]
+    text: str
+    tool_call_detected: bool
+    completed_calls: list[tuple[str, dict]]
+
+    def __init__(self, tool_names: list[str]):
+        """
+        Initialize the ToolCallStreamParser.
+
+        Args:
+            tool_names (list[str]): The names of the tools the model may call.
+        """
+        self.tool_names = tool_names
+        self.markers = [f"Call {name}" for name in tool_names]
+        self.text = ""
+        self.tool_call_detected = False
+        self._max_marker_length = max(
+            (len(marker) for marker in self.markers), default=0
+        )
+        self._held_back = 0
+
+        # Same block format as RecipeAgent._extract_json expects
+        self.completed_calls = []
+        self._call_pattern = re.compile(
+            rf"Call ({'|'.join(re.escape(name) for name in tool_names)}):\s*```json\n(\{{[\s\S]*?\n\}})\n```"
+        )
+        self._calls_end = 0
+
+    @property
+    def draft(self) -> str:
+        """
+        The part of the completion that can be shown to the user so far.
+
+        Returns:
+            str: The visible text, or an empty string once a tool call was detected.
+        """
+        if self.tool_call_detected:
+            return ""
+        return self.text[: len(self.text) - self._held_back]
+
+    def feed(self, delta: str) -> str:
+        """
+        Add a streamed chunk of the completion.
+
+        Args:
+            delta (str): The newly generated text.
+
+        Returns:
+            str: The updated draft.
+        """
+        # Only the tail that could contain a marker split across chunks is rescanned
+        scan_start = max(0, len(self.text) - self._max_marker_length)
+        self.text += delta
+
+        if not self.tool_call_detected:
+            tail = self.text[scan_start:]
+            self.tool_call_detected = any(marker in tail for marker in self.markers)
+            self._held_back = self._partial_marker_length()
+
+        if self.tool_call_detected:
+            self._parse_completed_calls()
+
+        return self.draft
+
+    @property
+    def calls_finished(self) -> bool:
+        """
+        Whether the model has moved on from writing tool calls, so the rest of the
+        completion can be discarded.
+
+        Returns:
+            bool: True once at least one call is complete and either every tool has been
+                called, as each tool is called at most once, or the answer has started
+                after the last complete call without another call in progress.
+        """
+        if not self.completed_calls:
+            return False
+        if {name for name, _ in self.completed_calls} >= set(self.tool_names):
+            return True
+
+        remainder = self.text[self._calls_end :]
+        if any(marker in remainder for marker in self.markers):
+            return False
+        return self.ANSWER_PATTERN.search(remainder) is not None
+
+    def close(self) -> str:
+        """
+        Mark the completion as finished, releasing any held-back text.
+
+        Returns:
+            str: The final draft.
+        """
+        self._held_back = 0
+        return self.draft
+
+    def _parse_completed_calls(self):
+        """
+        Parse the tool calls whose fenced JSON arguments were completed by the latest chunk.
+        """
+        for match in self._call_pattern.finditer(self.text, self._calls_end):
+            self._calls_end = match.end()
+            try:
+                arguments = json.loads(match.group(2))
+            except json.JSONDecodeError:
+                continue
+            self.completed_calls.append((match.group(1), arguments))
+
+    def _partial_marker_length(self) -> int:
+        """
+        Find the length of the longest suffix of the text that could start a tool call.
+
+        Returns:
+            int: The number of trailing characters to hold back.
+        """
+        for length in range(min(self._max_marker_length, len(self.text)), 0, -1):
+            suffix = self.text[-length:]
+            if any(marker.startswith(suffix) for marker in self.markers):
+                return length
+        return 0
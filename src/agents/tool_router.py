@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import re
+import time
+from typing import Any, Callable
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+# Ingredients to substitute for common dietary restrictions, keyed by restriction word
+RESTRICTION_INGREDIENTS = {
+    "dairy": ["milk", "butter", "cheese", "cream"],
+    "lactose": ["milk", "cream"],
+    "gluten": ["flour", "bread crumbs"],
+    "wheat": ["flour"],
+    "grain": ["flour", "oats"],
+    "egg": ["eggs"],
+    "nut": ["nuts"],
+    "peanut": ["peanut butter"],
+    "sugar": ["sugar"],
+    "alcohol": ["wine", "rum", "liqueur"],
+    "soy": ["soy sauce"],
+    "corn": ["cornstarch", "corn syrup"],
+    "yeast": ["yeast"],
+    "coconut": ["coconut milk"],
+    "nightshade": ["tomatoes", "peppers", "potatoes"],
+    "vegan": ["eggs", "milk", "butter", "honey"],
+    "keto": ["flour", "sugar"],
+    "carb": ["flour", "sugar"],
+}
+
+# Diets that rule out their ingredients whenever they are named; other restriction words
+# only count when negated or reduced ("no sugar", "low-carb"), as "more sugar" asks for
+# the ingredient
+DIET_RESTRICTIONS = {"vegan", "keto"}
+
+
+class ToolRouter:
+    """
+    Predicts the tool calls for a user query without an LLM round trip, so the agent
+    can run the tools upfront and answer with a single generation call.
+
+    Rules extract the tool arguments. When a classifier has been fitted, it decides
+    which tools to call instead of the rules.
+    """
+
+    URL_PATTERN = re.compile(r"https?://[^\s,;]+")
+    MEMORY_PATTERN = re.compile(
+        r"\b((that|those)( [\w-]+){0,3} (recipe|recipes|dish|one)|previous|earlier|from before"
+        r"|you provided|you gave|last (message|recipe))\b",
+        re.IGNORECASE,
+    )
+    MODIFY_PATTERN = re.compile(
+        r"\b(convert|make|change|adapt|without|avoid|less|more)\b|-free\b",
+        re.IGNORECASE,
+    )
+    WITHOUT_PATTERN = re.compile(
+        r"\bwithout ([a-z ]+?)(?:$|[.,!?:]| but | please)", re.IGNORECASE
+    )
+    FREE_PATTERN = re.compile(r"\b([a-z]+)-free\b", re.IGNORECASE)
+    SUBSTITUTE_PATTERN = re.compile(
+        r"\bsubstitut(?:e|es|ion|ions) for ([a-z ]+?)(?:$|[.,!?])", re.IGNORECASE
+    )
+    RECIPE_PATTERN = re.compile(
+        r"\b(recipe|recipes|dish|meal|dessert|breakfast|lunch|dinner|pasta|soup|bread|sauce|cook|bake)\b",
+        re.IGNORECASE,
+    )
+
+    # Class attributes
+    tool_names: list[str]
+    classifier: Any
+    embedding_function: Callable[[list[str]], list] | None
+
+    def __init__(
+        self,
+        tool_names: list[str] = [
+            "query_vectordb",
+            "substitution_filter",
+            "scrape_web_recipe",
+            "access_memory",
+        ],
+        embedding_function: Callable[[list[str]], list] | None = None,
+    ):
+        """
+        Initialize the ToolRouter.
+
+        Args:
+            tool_names (list[str]): The tools the router may call.
+            embedding_function (Callable | None): Embeds texts for the optional classifier.
+        """
+        self.tool_names = tool_names
+        self.embedding_function = embedding_function
+        self.classifier = None
+        self._label_binarizer = None
+
+    def fit(self, prompts: list[str], expected_tools: list[list[str]]) -> "ToolRouter":
+        """
+        Fit the embedding classifier used to choose tools.
+
+        Args:
+            prompts (list[str]): Example user queries.
+            expected_tools (list[list[str]]): The tools expected for each query.
+
+        Returns:
+            ToolRouter: The router itself.
+        """
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.multiclass import OneVsRestClassifier
+        from sklearn.preprocessing import MultiLabelBinarizer
+
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to fit the classifier.")
+
+        self._label_binarizer = MultiLabelBinarizer(classes=self.tool_names)
+        labels = self._label_binarizer.fit_transform(expected_tools)
+        self.classifier = OneVsRestClassifier(LogisticRegression(max_iter=1000))
+        self.classifier.fit(self.embedding_function(prompts), labels)
+        return self
+
+    def route(self, user_message: str) -> list[tuple[str, dict]]:
+        """
+        Predict the tool calls for a user query.
+
+        Args:
+            user_message (str): The user's query.
+
+        Returns:
+            list[tuple[str, dict]]: The tool names with their JSON arguments, in the order
+                of tool_names. An empty list means no tool is needed.
+        """
+        candidates = self._rule_candidates(user_message)
+
+        if self.classifier is None:
+            selected = [name for name, arguments in candidates.items() if arguments]
+        else:
+            predicted = self.classifier.predict(self.embedding_function([user_message]))
+            selected = list(self._label_binarizer.inverse_transform(predicted)[0])
+
+        return [
+            (name, candidates[name])
+            for name in self.tool_names
+            if name in selected and candidates.get(name)
+        ]
+
+    def _rule_candidates(self, user_message: str) -> dict[str, dict | None]:
+        """
+        Apply the routing rules to a user query.
+
+        Args:
+            user_message (str): The user's query.
+
+        Returns:
+            dict[str, dict | None]: The arguments each tool would be called with, or None
+                for tools the rules would not call. Arguments are filled in whenever they
+                can be extracted, so a classifier can still select the tool.
+        """
+        url = self.URL_PATTERN.search(user_message)
+        query = self.URL_PATTERN.sub("", user_message).strip(" -:")
+        refers_to_memory = url is None and bool(
+            self.MEMORY_PATTERN.search(user_message)
+        )
+        modifies_recipe = bool(self.MODIFY_PATTERN.search(user_message))
+        to_replace = self._ingredients_to_replace(user_message)
+        explicit_substitution = bool(self.SUBSTITUTE_PATTERN.search(user_message))
+
+        candidates = {
+            "scrape_web_recipe": {"link": url.group(0)} if url else None,
+            "access_memory": {"query": query},
+            "query_vectordb": {"query": query},
+            "substitution_filter": {"to_replace": to_replace} if to_replace else None,
+        }
+
+        # Only keep the arguments as rule decisions where the rules apply
+        rules = {
+            "scrape_web_recipe": url is not None,
+            "access_memory": refers_to_memory,
+            "query_vectordb": url is None
+            and not refers_to_memory
+            and not explicit_substitution
+            and bool(self.RECIPE_PATTERN.search(user_message)),
+            "substitution_filter": explicit_substitution
+            or ((url is not None or refers_to_memory) and modifies_recipe),
+        }
+        if self.classifier is not None:
+            return candidates
+        return {
+            name: arguments if rules[name] else None
+            for name, arguments in candidates.items()
+        }
+
+    def _ingredients_to_replace(self, user_message: str) -> list[str]:
+        """
+        Extract the ingredients a user wants substituted.
+
+        Args:
+            user_message (str): The user's query.
+
+        Returns:
+            list[str]: The ingredients to replace, without duplicates.
+        """
+        ingredients = []
+        for match in self.SUBSTITUTE_PATTERN.finditer(user_message):
+            ingredients.append(match.group(1).strip())
+        for match in self.WITHOUT_PATTERN.finditer(user_message):
+            ingredients.extend(
+                part.strip()
+                for part in re.split(r",| and | or ", match.group(1))
+                if part.strip()
+            )
+        for match in self.FREE_PATTERN.finditer(user_message):
+            restriction = match.group(1).lower().rstrip("s")
+            ingredients.extend(RESTRICTION_INGREDIENTS.get(restriction, [restriction]))
+
+        lowered = user_message.lower()
+        for restriction, substitutes in RESTRICTION_INGREDIENTS.items():
+            if f"{restriction}-free" in lowered:
+                continue
+            if restriction in DIET_RESTRICTIONS:
+                pattern = rf"\b{restriction}\b"
+            else:
+                pattern = rf"\b(no|without|avoid|low|less)[ -]{restriction}s?\b"
+            if re.search(pattern, lowered):
+                ingredients.extend(substitutes)
+
+        return list(dict.fromkeys(ingredients))
+
+
+def evaluate_router(router: ToolRouter, benchmark: list[dict]) -> dict:
+    """
+    Measure how often the router agrees with the expected tools of a benchmark.
+
+    Args:
+        router (ToolRouter): The router to evaluate.
+        benchmark (list[dict]): Cases with a "prompt" and its "expected_tools".
+
+    Returns:
+        dict: Exact-match accuracy, mean tool recall, mean routing latency and the cases
+            where the router disagreed with the benchmark.
+    """
+    exact_matches = 0
+    recalls = []
+    disagreements = []
+    start = time.perf_counter()
+
+    for case in benchmark:
+        predicted = {name for name, _ in router.route(case["prompt"])}
+        expected = set(case["expected_tools"])
+
+        exact_matches += predicted == expected
+        recalls.append(len(predicted & expected) / len(expected) if expected else 1.0)
+        if predicted != expected:
+            disagreements.append(
+                {
+                    "prompt": case["prompt"],
+                    "expected_tools": sorted(expected),
+                    "predicted_tools": sorted(predicted),
+                }
+            )
+
+    elapsed = time.perf_counter() - start
+    return {
+        "cases": len(benchmark),
+        "exact_match": exact_matches / len(benchmark),
+        "mean_recall": sum(recalls) / len(recalls),
+        "mean_latency_ms": 1000 * elapsed / len(benchmark),
+        "disagreements": disagreements,
+    }
+
+
+# Report the router's agreement with the tools benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the tool router's agreement with the tools benchmark."
+    )
+    parser.add_argument(
+        "--benchmark",
+        default=os.path.join(project_root, "benchmarks", "tools_benchmark.json"),
+    )
+    parser.add_argument(
+        "--classifier",
+        action="store_true",
+        help="Also report a 5-fold cross-validated embedding classifier.",
+    )
+    args = parser.parse_args()
+
+    with open(args.benchmark, "r") as f:
+        tools_benchmark = json.load(f)
+
+    print(json.dumps(evaluate_router(ToolRouter(), tools_benchmark), indent=4))
+
+    if args.classifier:
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        embedding_function = DefaultEmbeddingFunction()
+        folds = 5
+        reports = []
+        for fold in range(folds):
+            train = [c for i, c in enumerate(tools_benchmark) if i % folds != fold]
+            test = [c for i, c in enumerate(tools_benchmark) if i % folds == fold]
+            router = ToolRouter(embedding_function=embedding_function).fit(
+                [c["prompt"] for c in train], [c["expected_tools"] for c in train]
+            )
+            reports.append(evaluate_router(router, test))
+
+        print(
+            json.dumps(
+                {
+                    "classifier_exact_match": sum(r["exact_match"] for r in reports)
+                    / folds,
+                    "classifier_mean_recall": sum(r["mean_recall"] for r in reports)
+                    / folds,
+                },
+                indent=4,
+            )
+        )
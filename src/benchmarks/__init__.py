@@ -0,0 +1,7 @@
+# Importing modules to make them accessible from the package
+from src.benchmarks.mock_server import MockLLMServer, ScriptedModel
+
+__all__ = [
+    "MockLLMServer",
+    "ScriptedModel",
+]
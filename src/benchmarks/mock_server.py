@@ -0,0 +1,352 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.agents.tool_router import ToolRouter
+
+# Content of the final answer returned by the scripted model
+SCRIPTED_RECIPE = (
+    "# Scripted Recipe\n\n"
+    "## Ingredients\n- 2 cups flour\n- 1 cup sugar\n- 2 eggs\n\n"
+    "## Instructions\n1. Mix the ingredients.\n2. Bake at 350°F for 30 minutes."
+)
+
+# Prefixes of the messages the agent adds to the conversation after running tools
+TOOL_MESSAGE_PREFIXES = ("Assistant Call ", "Already executed ")
+
+
+def request_key(messages: list[dict]) -> str:
+    """
+    Build the key identifying a chat completion request in a replay file.
+
+    Args:
+        messages (list[dict]): The messages of the request.
+
+    Returns:
+        str: The SHA-256 hash of the canonical JSON of the messages.
+    """
+    return hashlib.sha256(
+        json.dumps(messages, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class ScriptedModel:
+    """
+    Deterministic stand-in for the LLM. Recorded responses are replayed when available;
+    otherwise the recipe agent's tool calls are predicted with the ToolRouter and every
+    other prompt gets a canned answer.
+    """
+
+    # Class attributes
+    replay: dict[str, str]
+    router: ToolRouter
+
+    def __init__(self, replay: dict[str, str] = {}, router: ToolRouter | None = None):
+        """
+        Initialize the ScriptedModel.
+
+        Args:
+            replay (dict[str, str]): Recorded response contents, by request key.
+            router (ToolRouter | None): Predicts the tool calls of recipe queries.
+        """
+        self.replay = replay
+        self.router = router or ToolRouter()
+
+    def respond(self, messages: list[dict]) -> str:
+        """
+        Generate the response to a chat completion request.
+
+        Args:
+            messages (list[dict]): The messages of the request.
+
+        Returns:
+            str: The response content.
+        """
+        key = request_key(messages)
+        if key in self.replay:
+            return self.replay[key]
+
+        system_prompt = messages[0]["content"] if messages else ""
+        if system_prompt.startswith("You are an evaluating agent"):
+            return "Yes"
+        if system_prompt.startswith("You are an expert at distilling"):
+            return messages[-1]["content"].split("\n", 1)[-1][:200]
+
+        # Plan tool calls for a new query, then answer once tool results came back
+        query_index = max(
+            (
+                index
+                for index, message in enumerate(messages)
+                if message["role"] == "user"
+                and not message["content"].startswith(TOOL_MESSAGE_PREFIXES)
+            ),
+            default=None,
+        )
+        if query_index is None or any(
+            message["content"].startswith(TOOL_MESSAGE_PREFIXES)
+            for message in messages[query_index + 1 :]
+        ):
+            return SCRIPTED_RECIPE
+
+        calls = self.router.route(messages[query_index]["content"])
+        if not calls:
+            return SCRIPTED_RECIPE
+        return "\n".join(
+            f"Call {name}:\n```json\n{json.dumps(arguments, indent=4)}\n```"
+            for name, arguments in calls
+        )
+
+
+class MockLLMServer:
+    """
+    A local OpenAI-compatible chat completions server backed by a ScriptedModel, so
+    benchmarks run reproducibly without the inference endpoint.
+    """
+
+    # Class attributes
+    model: ScriptedModel
+    latency: float
+    host: str
+    port: int
+
+    def __init__(
+        self,
+        model: ScriptedModel | None = None,
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Initialize the MockLLMServer.
+
+        Args:
+            model (ScriptedModel | None): Generates the responses.
+            latency (float): Seconds added to every request to simulate generation time.
+            host (str): The host to listen on.
+            port (int): The port to listen on; 0 picks a free port.
+        """
+        self.model = model or ScriptedModel()
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """The base URL to pass to the OpenAI client."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """
+        Start serving on a background thread.
+
+        Returns:
+            MockLLMServer: The server itself.
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-llm-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def completion(self, request: dict) -> dict:
+        """
+        Build a chat completion response.
+
+        Args:
+            request (dict): The chat completion request body.
+
+        Returns:
+            dict: The response body.
+        """
+        content = self.model.respond(request["messages"])
+        choice = {
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }
+        if request.get("logprobs"):
+            logprob = -0.05
+            alternative = "No" if content == "Yes" else "Yes"
+            choice["logprobs"] = {
+                "content": [
+                    {
+                        "token": content,
+                        "logprob": logprob,
+                        "bytes": None,
+                        "top_logprobs": [
+                            {"token": content, "logprob": logprob, "bytes": None},
+                            {"token": alternative, "logprob": -3.0, "bytes": None},
+                        ],
+                    }
+                ]
+            }
+
+        return {
+            "id": f"chatcmpl-{request_key(request['messages'])[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [choice],
+            "usage": self._usage(request, content),
+        }
+
+    def completion_chunks(self, request: dict) -> list[dict]:
+        """
+        Build the chunks of a streamed chat completion response.
+
+        Args:
+            request (dict): The chat completion request body.
+
+        Returns:
+            list[dict]: The chunks, one per word of the response.
+        """
+        content = self.model.respond(request["messages"])
+        base = {
+            "id": f"chatcmpl-{request_key(request['messages'])[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        words = content.split(" ")
+        chunks = [
+            {
+                **base,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {
+                            "content": word if i == 0 else f" {word}",
+                            **({"role": "assistant"} if i == 0 else {}),
+                        },
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            for i, word in enumerate(words)
+        ]
+        chunks.append(
+            {
+                **base,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+        )
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunks.append(
+                {**base, "choices": [], "usage": self._usage(request, content)}
+            )
+        return chunks
+
+    @staticmethod
+    def _usage(request: dict, content: str) -> dict:
+        """
+        Estimate the token usage of a request at 4 characters per token.
+
+        Args:
+            request (dict): The chat completion request body.
+            content (str): The response content.
+
+        Returns:
+            dict: The usage, in the OpenAI format.
+        """
+        prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        """
+        Build the request handler class bound to this server.
+
+        Returns:
+            type[BaseHTTPRequestHandler]: The handler class.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if not request.get("stream"):
+                    body = json.dumps(server.completion(request)).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                for chunk in server.completion_chunks(request):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                # Keep benchmark output clean
+                pass
+
+        return Handler
+
+
+# Serve the scripted model until interrupted
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve a scripted OpenAI-compatible chat completions endpoint."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--replay", help="JSON file of recorded responses.")
+    args = parser.parse_args()
+
+    replay = {}
+    if args.replay:
+        with open(args.replay, "r") as f:
+            replay = json.load(f)
+
+    mock_server = MockLLMServer(
+        ScriptedModel(replay=replay),
+        latency=args.latency,
+        host=args.host,
+        port=args.port,
+    ).start()
+    print(f"Serving scripted completions at {mock_server.base_url}")
+    try:
+        mock_server._thread.join()
+    except KeyboardInterrupt:
+        mock_server.stop()
@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import re
+import string
+import time
+from typing import Callable
+from src.benchmarks.retrieval import load_corpus
+from src.scraping.preprocessing import preprocess_texts, recipe_text
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+
+def reference_preprocess_text(text: str) -> str:
+    """
+    The regex preprocessing create_db used before the batch preprocessing, kept as the
+    baseline and the expected output.
+
+    Args:
+        text (str): The input text.
+
+    Returns:
+        str: The preprocessed text.
+    """
+    text = text.lower()
+    text = re.sub(f"[{string.punctuation}]", "", text)
+    return " ".join(text.split())
+
+
+def reference_recipe_text(recipe: dict) -> str:
+    """
+    The concatenation of recipe fields create_db used before recipe_text.
+
+    Args:
+        recipe (dict): The recipe.
+
+    Returns:
+        str: The concatenated fields.
+    """
+    return " ".join(
+        [
+            str(recipe.get("title", "")),
+            str(recipe.get("description", "")),
+            " ".join(recipe.get("ingredients", [])),
+            " ".join(recipe.get("instructions", [])),
+            str(recipe.get("cuisine", "")),
+            " ".join(recipe.get("category", [])),
+        ]
+    )
+
+
+def time_best(function: Callable[[], list[str]], repeat: int) -> float:
+    """
+    Time a function, keeping the fastest run to leave out interference.
+
+    Args:
+        function (Callable[[], list[str]]): The function.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The seconds of the fastest run.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_preprocessing(recipes: list[dict], repeat: int = 5) -> dict:
+    """
+    Compare the batch preprocessing of recipe texts with the regex baseline, checking
+    that both produce the same texts.
+
+    Args:
+        recipes (list[dict]): The recipes.
+        repeat (int): The number of runs of each implementation.
+
+    Returns:
+        dict: The input size, whether the outputs are identical and the number of texts
+            that differ, and the time, throughput and speedup of each implementation.
+    """
+
+    def reference() -> list[str]:
+        return [reference_preprocess_text(reference_recipe_text(r)) for r in recipes]
+
+    def batch() -> list[str]:
+        return preprocess_texts([recipe_text(recipe) for recipe in recipes])
+
+    expected, actual = reference(), batch()
+    mismatches = sum(a != b for a, b in zip(expected, actual))
+    megabytes = (
+        sum(len(reference_recipe_text(r).encode("utf-8")) for r in recipes) / 1e6
+    )
+
+    report = {
+        "texts": len(recipes),
+        "megabytes": megabytes,
+        "identical": mismatches == 0 and len(expected) == len(actual),
+        "mismatches": mismatches,
+    }
+    for name, function in [("reference", reference), ("batch", batch)]:
+        seconds = time_best(function, repeat)
+        report[name] = {"seconds": seconds, "mb_per_s": megabytes / seconds}
+    report["speedup"] = report["reference"]["seconds"] / report["batch"]["seconds"]
+    return report
+
+
+# Benchmark the ingest text preprocessing and write the results as JSON
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingest text preprocessing."
+    )
+    parser.add_argument(
+        "--corpus",
+        default=os.path.join(project_root, "data", "scraped_json"),
+        help="Directory of scraped recipe JSON files, or a recipe store.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file for the results; printed if unset.")
+    args = parser.parse_args()
+
+    output = json.dumps(
+        {
+            "config": vars(args),
+            **benchmark_preprocessing(load_corpus(args.corpus), args.repeat),
+        },
+        indent=4,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,423 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import numpy as np
+from src.benchmarks.runner import summarize_latencies
+from src.recipe_store import RecipeStore
+from src.scraping.dedup import canonicalize_url
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+# Retrieves the URLs of the top k recipes for each query in a batch
+Retriever = Callable[[list[str], int], list[list[str]]]
+
+# Dietary restrictions recognized in recipe titles, descriptions and categories
+RESTRICTIONS = [
+    "vegan",
+    "vegetarian",
+    "gluten-free",
+    "dairy-free",
+    "paleo",
+    "keto",
+    "whole30",
+    "low-carb",
+]
+
+TITLE_TEMPLATES = [
+    "how do I make {title}",
+    "{title} recipe",
+    "easy homemade {title}",
+    "I want to cook {title} tonight",
+]
+
+QUANTITY_PATTERN = re.compile(
+    r"^[\d\s/½¼¾⅓⅔⅛.,+-]*(\b(cups?|tablespoons?|teaspoons?|tbsp|tsp|pounds?|lbs?|ounces?"
+    r"|oz|grams?|g|ml|cans?|cloves?|pinch|large|small|medium|whole)\b\.?\s*)*",
+    re.IGNORECASE,
+)
+
+
+def load_corpus(directory: str) -> list[dict]:
+    """
+    Load the scraped recipes that can be retrieved by URL.
+
+    Args:
+        directory (str): The directory of scraped recipe JSON files, or a recipe store.
+
+    Returns:
+        list[dict]: The recipes without scraping errors, deduplicated by canonical URL.
+    """
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        scraped = [RecipeStore(directory).read()]
+    else:
+        scraped = []
+        for filename in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, filename), "r") as f:
+                scraped.append(json.load(f))
+
+    recipes = {}
+    for file_recipes in scraped:
+        for recipe in file_recipes:
+            if "error" not in recipe and recipe.get("url") and recipe.get("title"):
+                recipes.setdefault(canonicalize_url(recipe["url"]), recipe)
+    return list(recipes.values())
+
+
+def ingredient_name(ingredient: str) -> str:
+    """
+    Strip the quantity, unit and preparation notes from an ingredient line.
+
+    Args:
+        ingredient (str): The ingredient line, e.g. "1 pound shrimp, peeled".
+
+    Returns:
+        str: The ingredient name, e.g. "shrimp".
+    """
+    name = re.sub(r"\(.*?\)", "", ingredient).split(",")[0]
+    return QUANTITY_PATTERN.sub("", name).strip().lower()
+
+
+def recipe_restrictions(recipe: dict) -> list[str]:
+    """
+    Find the dietary restrictions a recipe advertises.
+
+    Args:
+        recipe (dict): The scraped recipe.
+
+    Returns:
+        list[str]: The restrictions mentioned in its title, description or categories.
+    """
+    text = " ".join(
+        [
+            str(recipe.get("title", "")),
+            str(recipe.get("description", "")),
+            " ".join(recipe.get("category") or []),
+        ]
+    ).lower()
+    return [
+        restriction
+        for restriction in RESTRICTIONS
+        if re.search(rf"\b{restriction.replace('-', '[- ]')}\b", text)
+    ]
+
+
+def generate_queries(
+    recipes: list[dict], queries_per_kind: int = 200, seed: int = 0
+) -> list[dict]:
+    """
+    Generate retrieval queries with known relevant recipes.
+
+    Three kinds of queries are generated: paraphrases of a title, lists of a recipe's
+    main ingredients, and a cuisine with a restriction and category. The last kind
+    matches every recipe sharing those attributes.
+
+    Args:
+        recipes (list[dict]): The corpus.
+        queries_per_kind (int): Max number of queries of each kind.
+        seed (int): Seed for sampling recipes and templates.
+
+    Returns:
+        list[dict]: Queries with their "kind" and the "relevant_urls" to retrieve.
+    """
+    rng = random.Random(seed)
+    sample = rng.sample(recipes, min(queries_per_kind, len(recipes)))
+    queries = []
+
+    for recipe in sample:
+        queries.append(
+            {
+                "kind": "title",
+                "query": rng.choice(TITLE_TEMPLATES).format(
+                    title=recipe["title"].lower()
+                ),
+                "relevant_urls": [recipe["url"]],
+            }
+        )
+
+    for recipe in sample:
+        names = [
+            name
+            for name in map(ingredient_name, recipe.get("ingredients") or [])
+            if name
+        ]
+        if len(names) < 3:
+            continue
+        queries.append(
+            {
+                "kind": "ingredients",
+                "query": "recipe with " + ", ".join(rng.sample(names[:6], 3)),
+                "relevant_urls": [recipe["url"]],
+            }
+        )
+
+    # Cuisine, restriction and category combinations, with every recipe matching them
+    groups = {}
+    for recipe in recipes:
+        cuisine = str(recipe.get("cuisine") or "").strip().lower()
+        categories = [c.strip().lower() for c in recipe.get("category") or []]
+        if not cuisine or not categories:
+            continue
+        for restriction in recipe_restrictions(recipe):
+            key = (restriction, cuisine, categories[0])
+            groups.setdefault(key, []).append(recipe["url"])
+    for restriction, cuisine, category in rng.sample(
+        sorted(groups), min(queries_per_kind, len(groups))
+    ):
+        queries.append(
+            {
+                "kind": "cuisine_restriction",
+                "query": f"{restriction} {cuisine} {category}",
+                "relevant_urls": groups[(restriction, cuisine, category)],
+            }
+        )
+
+    return queries
+
+
+def evaluate_retrieval(
+    retriever: Retriever, queries: list[dict], ks: list[int] = [1, 5, 10]
+) -> dict:
+    """
+    Score a retriever by recall@k and MRR, overall and per query kind.
+
+    Recall@k is the share of queries with a relevant recipe in the top k results. URLs
+    are compared in canonical form, as the index may hold a recipe under another URL.
+
+    Args:
+        retriever (Retriever): The retriever to score.
+        queries (list[dict]): Queries with their "kind" and "relevant_urls".
+        ks (list[int]): The cutoffs to report recall at.
+
+    Returns:
+        dict: The recall@k and MRR of all queries and of each kind.
+    """
+    results = retriever([query["query"] for query in queries], max(ks))
+
+    ranks = []
+    for query, urls in zip(queries, results):
+        relevant = {canonicalize_url(url) for url in query["relevant_urls"]}
+        ranks.append(
+            next(
+                (
+                    rank
+                    for rank, url in enumerate(urls, 1)
+                    if canonicalize_url(url) in relevant
+                ),
+                None,
+            )
+        )
+
+    def score(indices: list[int]) -> dict:
+        return {
+            "queries": len(indices),
+            **{
+                f"recall@{k}": sum(
+                    ranks[i] is not None and ranks[i] <= k for i in indices
+                )
+                / len(indices)
+                for k in ks
+            },
+            "mrr": sum(1 / ranks[i] for i in indices if ranks[i] is not None)
+            / len(indices),
+        }
+
+    kinds = sorted({query["kind"] for query in queries})
+    return {
+        "all": score(list(range(len(queries)))),
+        **{
+            kind: score([i for i, q in enumerate(queries) if q["kind"] == kind])
+            for kind in kinds
+        },
+    }
+
+
+def measure_throughput(
+    retriever: Retriever,
+    queries: list[str],
+    concurrency_levels: list[int] = [1, 4, 16],
+    k: int = 10,
+) -> dict:
+    """
+    Measure single-query latency and throughput at several concurrency levels.
+
+    Args:
+        retriever (Retriever): The retriever to measure.
+        queries (list[str]): The queries, each sent as its own request.
+        concurrency_levels (list[int]): The numbers of concurrent clients.
+        k (int): The number of results per query.
+
+    Returns:
+        dict: The QPS and latency percentiles at each concurrency level.
+    """
+
+    def timed_query(query: str) -> float:
+        start = time.perf_counter()
+        retriever([query], k)
+        return time.perf_counter() - start
+
+    # Warm up caches and lazily loaded models before timing
+    retriever(queries[:1], k)
+
+    report = {}
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_query, queries))
+        elapsed = time.perf_counter() - start
+
+        values = 1000 * np.asarray(latencies)
+        report[str(concurrency)] = {
+            "qps": len(queries) / elapsed,
+            **summarize_latencies(latencies),
+            "p99_ms": float(np.percentile(values, 99)),
+        }
+    return report
+
+
+def chroma_retriever(collection_name: str = "recipes", database=None) -> Retriever:
+    """
+    Build a retriever over a ChromaDB collection, querying it like query_vectordb.
+
+    Args:
+        collection_name (str): The collection holding the recipes; the chunks of the
+            recipe_chunks collection are aggregated to recipes like query_vectordb does.
+        database (Any): The ChromaDB client; defaults to the project's persistent client.
+
+    Returns:
+        Retriever: The retriever.
+    """
+    from src.tools.query_vectordb import CHUNK_OVERFETCH, aggregate_chunks, get_recipes
+
+    if database is None:
+        from src.tools.query_vectordb import database
+
+    collection = database.get_collection(name=collection_name)
+    recipes = database.get_collection(name="recipes")
+
+    def retrieve(queries: list[str], k: int) -> list[list[str]]:
+        if collection_name == "recipe_chunks":
+            results = collection.query(
+                query_texts=queries,
+                n_results=k * CHUNK_OVERFETCH,
+                include=["metadatas", "distances"],
+            )
+            return [
+                [
+                    m["url"]
+                    for m in get_recipes(
+                        recipes, aggregate_chunks(metadatas, distances, k)
+                    )
+                ]
+                for metadatas, distances in zip(
+                    results["metadatas"], results["distances"]
+                )
+            ]
+
+        results = collection.query(
+            query_texts=queries, n_results=k, include=["metadatas"]
+        )
+        return [[m["url"] for m in metadatas] for metadatas in results["metadatas"]]
+
+    return retrieve
+
+
+def embedding_retriever(
+    recipes: list[dict], embedding_function: Callable[[list[str]], list]
+) -> Retriever:
+    """
+    Build an exact in-memory retriever, for comparing embedding models without an index.
+
+    Recipes are embedded from their title, description and ingredients.
+
+    Args:
+        recipes (list[dict]): The corpus.
+        embedding_function (Callable): Embeds a list of texts.
+
+    Returns:
+        Retriever: The retriever, ranking recipes by cosine similarity.
+    """
+    urls = [recipe["url"] for recipe in recipes]
+    documents = [
+        " ".join(
+            [
+                str(recipe.get("title", "")),
+                str(recipe.get("description", "")),
+                " ".join(recipe.get("ingredients") or []),
+            ]
+        )
+        for recipe in recipes
+    ]
+
+    def normalize(vectors: list) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+
+    embeddings = normalize(embedding_function(documents))
+
+    def retrieve(queries: list[str], k: int) -> list[list[str]]:
+        scores = normalize(embedding_function(queries)) @ embeddings.T
+        top = np.argsort(-scores, axis=1)[:, :k]
+        return [[urls[i] for i in row] for row in top]
+
+    return retrieve
+
+
+# Score the recipes retriever and write the results as JSON
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark recipe retrieval quality and latency."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["chroma", "embedding"],
+        default="chroma",
+        help="The ChromaDB recipes collection, or exact search over an embedding model.",
+    )
+    parser.add_argument(
+        "--collection", default="recipes", help="ChromaDB collection to query."
+    )
+    parser.add_argument(
+        "--corpus", default=os.path.join(project_root, "data", "scraped_json")
+    )
+    parser.add_argument("--queries-per-kind", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file for the results; printed if unset.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    benchmark_queries = generate_queries(corpus, args.queries_per_kind, args.seed)
+
+    if args.backend == "chroma":
+        retriever = chroma_retriever(args.collection)
+    else:
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        retriever = embedding_retriever(corpus, DefaultEmbeddingFunction())
+
+    output = json.dumps(
+        {
+            "config": vars(args),
+            "corpus_size": len(corpus),
+            "quality": evaluate_retrieval(retriever, benchmark_queries),
+            "throughput": measure_throughput(
+                retriever,
+                [query["query"] for query in benchmark_queries],
+                args.concurrency,
+            ),
+        },
+        indent=4,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
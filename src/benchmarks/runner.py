@@ -0,0 +1,425 @@
+import argparse
+import dataclasses
+import functools
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable
+import numpy as np
+from openai import OpenAI
+from src.agents import EvaluationAgent, RecipeAgent, ToolRouter
+from src.benchmarks.mock_server import MockLLMServer, ScriptedModel, request_key
+from src.datatypes import ToolDescription, ToolResponse
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+# Results returned by the stub tools, so tool latency does not depend on the network
+STUB_RESULTS = {
+    "query_vectordb": [
+        [{"title": "Stub Recipe", "ingredients": ["flour", "sugar"], "url": "stub"}]
+    ],
+    "substitution_filter": [{"ingredient": "eggs", "substitutions": ["applesauce"]}],
+    "scrape_web_recipe": {"title": "Stub Recipe", "ingredients": ["flour"]},
+    "access_memory": [["# Stub Recipe"]],
+}
+
+
+class PhaseTimer:
+    """
+    Collects the latencies of the phases of a benchmark, thread-safely.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float):
+        """
+        Record the latency of one occurrence of a phase.
+
+        Args:
+            phase (str): The phase name.
+            seconds (float): The latency in seconds.
+        """
+        with self._lock:
+            self.latencies[phase].append(seconds)
+
+    def timed(self, phase: str, function: Callable) -> Callable:
+        """
+        Wrap a function so each call is recorded under a phase.
+
+        Args:
+            phase (str): The phase name.
+            function (Callable): The function to time; its signature is preserved.
+
+        Returns:
+            Callable: The timed function.
+        """
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(phase, time.perf_counter() - start)
+
+        return wrapper
+
+    def count(self, phase: str) -> int:
+        """
+        Count the recorded occurrences of a phase.
+
+        Args:
+            phase (str): The phase name.
+
+        Returns:
+            int: The number of occurrences.
+        """
+        with self._lock:
+            return len(self.latencies[phase])
+
+    def summary(self) -> dict:
+        """
+        Summarize the latencies of every phase.
+
+        Returns:
+            dict: The count, total, mean and percentiles of each phase, in milliseconds.
+        """
+        with self._lock:
+            return {
+                phase: summarize_latencies(latencies)
+                for phase, latencies in sorted(self.latencies.items())
+            }
+
+
+def summarize_latencies(latencies: list[float]) -> dict:
+    """
+    Summarize a list of latencies.
+
+    Args:
+        latencies (list[float]): The latencies in seconds.
+
+    Returns:
+        dict: The count, total, mean, p50, p95 and max, in milliseconds.
+    """
+    if not latencies:
+        return {"count": 0}
+    values = 1000 * np.asarray(latencies)
+    return {
+        "count": len(latencies),
+        "total_ms": float(values.sum()),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max()),
+    }
+
+
+class InstrumentedClient:
+    """
+    Wraps an OpenAI client to time and count its chat completions, optionally recording
+    the responses for later replay by the mock server.
+    """
+
+    def __init__(self, client: OpenAI, timer: PhaseTimer, record: bool = False):
+        """
+        Initialize the InstrumentedClient.
+
+        Args:
+            client (OpenAI): The client to wrap.
+            timer (PhaseTimer): Collects the latency of each completion under "llm".
+            record (bool): Whether to record the responses of non-streamed completions.
+        """
+        self.client = client
+        self.timer = timer
+        self.recorded = {}
+        self.record = record
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs) -> Any:
+        """
+        Create a chat completion, timing it under "llm".
+
+        Returns:
+            Any: The wrapped client's response.
+        """
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(**kwargs)
+        self.timer.record("llm", time.perf_counter() - start)
+        if self.record and not kwargs.get("stream"):
+            content = response.choices[0].message.content
+            self.recorded[request_key(kwargs["messages"])] = content
+        return response
+
+
+def instrument_tools(
+    tools: list[ToolDescription], timer: PhaseTimer, stub: bool
+) -> list[ToolDescription]:
+    """
+    Time each tool under its own phase, optionally replacing it with a stub.
+
+    Args:
+        tools (list[ToolDescription]): The tools to instrument.
+        timer (PhaseTimer): Collects the tool latencies under "tool:<name>".
+        stub (bool): Whether to return canned results instead of calling the tools.
+
+    Returns:
+        list[ToolDescription]: The instrumented tools.
+    """
+    instrumented = []
+    for tool in tools:
+        function = tool.function
+        if stub:
+            result = STUB_RESULTS.get(tool.name)
+            function = functools.wraps(tool.function)(
+                lambda *args, result=result, **kwargs: result
+            )
+        instrumented.append(
+            dataclasses.replace(
+                tool, function=timer.timed(f"tool:{tool.name}", function)
+            )
+        )
+    return instrumented
+
+
+def run_tools_benchmark(
+    client: Any,
+    tools: list[ToolDescription],
+    benchmark: list[dict],
+    timer: PhaseTimer,
+    router: ToolRouter | None = None,
+    add_to_memory: bool = True,
+) -> dict:
+    """
+    Drive the RecipeAgent through every case of the tools benchmark.
+
+    Args:
+        client (Any): The (instrumented) OpenAI client.
+        tools (list[ToolDescription]): The (instrumented) tools.
+        benchmark (list[dict]): Cases with a "prompt" and its "expected_tools".
+        timer (PhaseTimer): Collects the phase latencies.
+        router (ToolRouter | None): Router passed to the agent, if any.
+        add_to_memory (bool): Whether responses are written to memory.
+
+    Returns:
+        dict: Tool-selection accuracy, LLM calls per turn, turn latency and the cases
+            where the agent's tool calls disagreed with the benchmark.
+    """
+    recipe_agent = RecipeAgent(client, tools, router=router)
+    recipe_agent.memory.add_batch = timer.timed(
+        "memory_write", recipe_agent.memory.add_batch
+    )
+
+    exact_matches = 0
+    recalls = []
+    llm_calls = []
+    errors = 0
+    disagreements = []
+    for index, case in enumerate(benchmark):
+        calls_before = timer.count("llm")
+        start = time.perf_counter()
+        try:
+            _, steps = recipe_agent.say(
+                case["prompt"],
+                add_to_memory=add_to_memory,
+                session_id=f"benchmark-{index}",
+            )
+        except Exception:
+            errors += 1
+            steps = []
+        timer.record("turn", time.perf_counter() - start)
+        llm_calls.append(timer.count("llm") - calls_before)
+
+        predicted = {step.tool_name for step in steps if isinstance(step, ToolResponse)}
+        expected = set(case["expected_tools"])
+        exact_matches += predicted == expected
+        recalls.append(len(predicted & expected) / len(expected) if expected else 1.0)
+        if predicted != expected:
+            disagreements.append(
+                {
+                    "prompt": case["prompt"],
+                    "expected_tools": sorted(expected),
+                    "predicted_tools": sorted(predicted),
+                }
+            )
+
+    # Memory is written in the background; wait for it so its latency is included
+    recipe_agent.memory_writer.flush()
+    return {
+        "cases": len(benchmark),
+        "errors": errors,
+        "tool_exact_match": exact_matches / len(benchmark),
+        "tool_mean_recall": sum(recalls) / len(recalls),
+        "llm_calls_per_turn": sum(llm_calls) / len(llm_calls),
+        "memory_write_failures": recipe_agent.memory_writer.failed,
+        "disagreements": disagreements,
+    }
+
+
+def run_evaluation_benchmark(
+    client: Any, benchmark: list[dict], timer: PhaseTimer, max_workers: int = 8
+) -> dict:
+    """
+    Score every case of the satisfactory recipes benchmark with the EvaluationAgent.
+
+    Args:
+        client (Any): The (instrumented) OpenAI client.
+        benchmark (list[dict]): Cases with a "request", "recipe" and expected "answer".
+        timer (PhaseTimer): Collects the phase latencies.
+        max_workers (int): Max evaluations run concurrently.
+
+    Returns:
+        dict: The accuracy, errors and wall time of the batch.
+    """
+    eval_agent = EvaluationAgent(client, max_workers=max_workers)
+    start = time.perf_counter()
+    results = eval_agent.evaluate_batch(
+        [(example["recipe"], example["request"]) for example in benchmark]
+    )
+    timer.record("evaluation_batch", time.perf_counter() - start)
+
+    scored = [
+        (example, result)
+        for example, result in zip(benchmark, results)
+        if result.error is None
+    ]
+    return {
+        "cases": len(benchmark),
+        "errors": len(benchmark) - len(scored),
+        "accuracy": (
+            sum(r.satisfied == (e["answer"] == "Yes") for e, r in scored) / len(scored)
+            if scored
+            else 0.0
+        ),
+    }
+
+
+def git_revision() -> str | None:
+    """
+    Get the git revision of the code being benchmarked.
+
+    Returns:
+        str | None: The commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=project_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Run the benchmarks and write the results as JSON
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the tools and satisfactory recipes benchmarks."
+    )
+    parser.add_argument(
+        "--suite", choices=["tools", "evaluation", "all"], default="all"
+    )
+    parser.add_argument(
+        "--endpoint",
+        default="mock",
+        help='"mock" for the bundled scripted server, or the base URL of a real endpoint.',
+    )
+    parser.add_argument("--replay", help="Recorded responses for the mock server.")
+    parser.add_argument(
+        "--record", help="Write the real endpoint's responses to this file."
+    )
+    parser.add_argument(
+        "--mock-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the mock server waits before each response.",
+    )
+    parser.add_argument(
+        "--stub-tools",
+        action="store_true",
+        help="Replace the tools with canned results.",
+    )
+    parser.add_argument("--router", action="store_true", help="Use the ToolRouter.")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Do not write responses to memory."
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", help="JSON file for the results; printed if unset.")
+    args = parser.parse_args()
+
+    mock_server = None
+    if args.endpoint == "mock":
+        replay = {}
+        if args.replay:
+            with open(args.replay, "r") as f:
+                replay = json.load(f)
+        mock_server = MockLLMServer(
+            ScriptedModel(replay=replay), latency=args.mock_latency
+        ).start()
+        openai_client = OpenAI(base_url=mock_server.base_url, api_key="mock")
+    else:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        openai_client = OpenAI(base_url=args.endpoint, api_key=os.getenv("KEY"))
+
+    timer = PhaseTimer()
+    client = InstrumentedClient(openai_client, timer, record=bool(args.record))
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+    }
+
+    try:
+        if args.suite in ("tools", "all"):
+            from src.tools import TOOL_DESCRIPTIONS
+
+            with open(
+                os.path.join(project_root, "benchmarks", "tools_benchmark.json")
+            ) as f:
+                tools_benchmark = json.load(f)
+            results["tools"] = run_tools_benchmark(
+                client,
+                instrument_tools(TOOL_DESCRIPTIONS, timer, stub=args.stub_tools),
+                tools_benchmark,
+                timer,
+                router=ToolRouter() if args.router else None,
+                add_to_memory=not args.no_memory,
+            )
+
+        if args.suite in ("evaluation", "all"):
+            with open(
+                os.path.join(
+                    project_root, "benchmarks", "satisfactory_recipes_benchmark.json"
+                )
+            ) as f:
+                satisfactory_recipes_benchmark = json.load(f)
+            results["evaluation"] = run_evaluation_benchmark(
+                client, satisfactory_recipes_benchmark, timer, max_workers=args.workers
+            )
+    finally:
+        if mock_server is not None:
+            mock_server.stop()
+
+    results["latency"] = timer.summary()
+
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump(client.recorded, f, indent=4)
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
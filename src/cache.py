@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator
+
+# Sentinel for entries that use the cache's default time to live
+_DEFAULT_TTL = object()
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a time to live.
+    """
+
+    # Class attributes
+    max_size: int
+    ttl: float | None
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, max_size: int = 1024, ttl: float | None = None):
+        """
+        Initialize the TTLCache.
+
+        Args:
+            max_size (int): Max number of entries; the least recently used is evicted first.
+            ttl (float | None): Default seconds an entry stays valid, or None to never expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value, counting the lookup as a hit or a miss.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): The value returned when the key is missing or expired.
+
+        Returns:
+            Any: The cached value or the default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Any = _DEFAULT_TTL):
+        """
+        Cache a value, evicting the least recently used entry when full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to cache.
+            ttl (float | None): Seconds the entry stays valid, overriding the default.
+        """
+        ttl = self.ttl if ttl is _DEFAULT_TTL else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, key: Hashable):
+        """
+        Mark an entry as recently used without counting a lookup.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        """
+        Iterate over a snapshot of the unexpired entries without counting lookups.
+
+        Yields:
+            tuple[Hashable, Any]: Each key with its cached value.
+        """
+        with self._lock:
+            snapshot = list(self._entries.items())
+
+        for key, entry in snapshot:
+            if not self._expired(entry):
+                yield key, entry[1]
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Report the cache's size and hit rate.
+
+        Returns:
+            dict: The number of entries, hits, misses, evictions and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _expired(entry: tuple[float | None, Any]) -> bool:
+        """
+        Check whether an entry's time to live has passed.
+
+        Args:
+            entry (tuple[float | None, Any]): The expiry time and value of the entry.
+
+        Returns:
+            bool: True if the entry has expired.
+        """
+        return entry[0] is not None and entry[0] <= time.monotonic()
@@ -0,0 +1,28 @@
+import functools
+import os
+import chromadb
+from chromadb.api import ClientAPI
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+
+
+@functools.cache
+def get_database() -> ClientAPI:
+    """
+    Get the ChromaDB client shared by the process.
+
+    When CHROMA_HOST is set, the client connects to that ChromaDB server (on CHROMA_PORT,
+    8000 by default), so any number of agent, API and ingest processes share one vector
+    store, e.g. one started with `chroma run --path chromadb`. Otherwise the database is
+    opened in-process from the project's chromadb directory.
+
+    Returns:
+        ClientAPI: The ChromaDB client.
+    """
+    host = os.getenv("CHROMA_HOST")
+    if host:
+        return chromadb.HttpClient(
+            host=host, port=int(os.getenv("CHROMA_PORT", "8000"))
+        )
+    return chromadb.PersistentClient(path=f"{project_root}/chromadb")
@@ -1,6 +1,45 @@
-from dataclasses import dataclass
+import inspect
+import types
+import typing
+from dataclasses import dataclass, field
 from typing import Any, Callable
 
+# JSON schema types of the Python types used in tool signatures
+JSON_SCHEMA_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+
+def json_schema_type(annotation: Any) -> dict:
+    """
+    Convert a type annotation to a JSON schema.
+
+    Args:
+        annotation (Any): The annotation of a function parameter.
+
+    Returns:
+        dict: The JSON schema of the type; empty if the type is unknown.
+    """
+    origin = typing.get_origin(annotation)
+    arguments = typing.get_args(annotation)
+
+    if origin in (typing.Union, types.UnionType):
+        # Optional parameters are described by their non-None type
+        options = [option for option in arguments if option is not type(None)]
+        return json_schema_type(options[0]) if len(options) == 1 else {}
+    if origin is list and arguments:
+        return {"type": "array", "items": json_schema_type(arguments[0])}
+    if origin is not None:
+        annotation = origin
+    if annotation in JSON_SCHEMA_TYPES:
+        return {"type": JSON_SCHEMA_TYPES[annotation]}
+    return {}
+
 
 @dataclass
 class ToolDescription:
@@ -13,6 +52,10 @@ class ToolDescription:
         description (str): A brief explanation of what the tool does.
         example_json (str): An example JSON string showing how to call the tool.
         function (Callable): The callable function associated with the tool.
+        timeout (float | None): Seconds to wait for the tool before giving up, or None to wait indefinitely.
+        cache_ttl (float | None): Seconds a result is memoized for identical arguments, or None to never memoize.
+        invalidate_on_ingest (bool): Whether memoized results are discarded when new recipes are ingested.
+        session_scoped (bool): Whether the tool reads session data, so it is called with the caller's `session_id`.
     """
 
     name: str
@@ -20,16 +63,61 @@ class ToolDescription:
     description: str
     example_json: str
     function: Callable
+    timeout: float | None = 30.0
+    cache_ttl: float | None = None
+    invalidate_on_ingest: bool = False
+    session_scoped: bool = False
 
-    def get_prompt(self) -> str:
+    def get_prompt(self, compact: bool = False) -> str:
         """
         Constructs a detailed prompt describing the tool.
 
+        Args:
+            compact (bool): Whether to leave out the example call.
+
         Returns:
             str: A string combining the tool's signature, description, and an example call.
         """
+        if compact:
+            return f"{self.signature} - {self.description}"
         return f"{self.signature} - {self.description}. Example tool call: \n{self.example_json}"
 
+    def json_schema(self) -> dict:
+        """
+        Build the OpenAI function-calling definition of the tool from its function signature.
+
+        The session ID of session-scoped tools is supplied by the agent, so it is left out.
+
+        Returns:
+            dict: The tool definition, with a JSON schema of the function's parameters.
+        """
+        properties = {}
+        required = []
+        for name, parameter in inspect.signature(self.function).parameters.items():
+            if self.session_scoped and name == "session_id":
+                continue
+            if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+                continue
+
+            properties[name] = json_schema_type(parameter.annotation)
+            if parameter.default is parameter.empty:
+                required.append(name)
+            else:
+                properties[name]["default"] = parameter.default
+
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": required,
+                },
+            },
+        }
+
 
 @dataclass
 class AgentResponse:
@@ -52,10 +140,12 @@ class ToolResponse(AgentResponse):
         text (str): The textual content of the agent's response.
         tool_name (str): The name of the tool that was used.
         tool_result (Any): The result or output produced by the tool.
+        duration (float | None): Seconds the tool call took, or None if it was not timed.
     """
 
     tool_name: str
     tool_result: Any
+    duration: float | None = None
 
 
 @dataclass
@@ -65,3 +155,51 @@ class TextResponse(AgentResponse):
     """
 
     pass
+
+
+@dataclass
+class StreamingTextResponse(AgentResponse):
+    """
+    Represents the partial text of a response that is still being generated.
+    """
+
+    pass
+
+
+@dataclass
+class ConversationState:
+    """
+    Represents the conversation of a single session with an agent.
+
+    Attributes:
+        conversation (list[dict]): The messages sent to the model, starting with the system prompt.
+        tool_results (dict[str, Any]): The results of the tools executed in the latest turn.
+        turn_start (int): The index of the latest turn's first message in the conversation.
+        session_id (str | None): The session the conversation belongs to.
+    """
+
+    conversation: list[dict]
+    tool_results: dict[str, Any] = field(default_factory=dict)
+    turn_start: int = 0
+    session_id: str | None = None
+
+
+@dataclass
+class EvaluationResult:
+    """
+    Represents the verdict of an evaluation agent on whether a recipe meets the criteria.
+
+    Attributes:
+        answer (str): The model's answer, "Yes" or "No".
+        satisfied (bool): Whether the recipe meets the criteria.
+        confidence (float | None): The probability the model gives to "Yes", or None if
+            the evaluation failed.
+        error (str | None): The error raised while evaluating, if any.
+        source (str): What decided the verdict, "llm" or the "local" classifier.
+    """
+
+    answer: str
+    satisfied: bool
+    confidence: float | None
+    error: str | None = None
+    source: str = "llm"
@@ -0,0 +1,378 @@
+import contextlib
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Callable, Iterator
+import numpy as np
+from src.cache import TTLCache
+from src.instrumentation import instrumentation
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+
+# Directory of the disk tier of the shared embedding cache; empty disables it
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(project_root, "data", "embedding_cache")
+)
+
+# Max embeddings kept in memory by the shared embedding cache
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+
+def embedding_key(model_id: str, text: str) -> bytes:
+    """
+    Get the content address of an embedding.
+
+    Whitespace is collapsed first, as the tokenizers of the embedding models split on it,
+    so texts differing only in spacing share an embedding.
+
+    Args:
+        model_id (str): The embedding model.
+        text (str): The embedded text.
+
+    Returns:
+        bytes: The SHA-256 digest of the model ID and normalized text.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_id}\n{normalized}".encode("utf-8")).digest()
+
+
+class DiskEmbeddingStore:
+    """
+    An append-only, memory-mapped file of embeddings of one model, indexed by content
+    address, which survives restarts and re-ingests and is shared by processes.
+
+    Vectors are appended to vectors.f32 as float32 rows, and their keys to keys.bin in
+    the same order, so a key is only visible once its vector is written, and a write
+    interrupted between the two only loses its own entries. Writers hold an exclusive
+    lock on the store's lock file and place their rows by the size of the files, so the
+    appends of several processes never interleave. Entries appended by other processes
+    are picked up by re-reading the tail of keys.bin on a miss.
+    """
+
+    # Class attributes
+    path: str
+    dimension: int | None
+
+    def __init__(self, path: str):
+        """
+        Open a store, creating its directory if needed.
+
+        Args:
+            path (str): The store directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = None
+        self._index = {}
+        self._rows = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        with self._file_lock():
+            self._read_meta()
+            self._repair()
+        self._refresh()
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.path, "keys.bin")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """
+        Hold the exclusive lock serializing the writers of the store across processes.
+        """
+        with open(os.path.join(self.path, "lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        """
+        Read the embedding dimension, once a writer has recorded it.
+        """
+        if self.dimension is None and os.path.exists(self._meta_path):
+            with open(self._meta_path, "r") as f:
+                self.dimension = json.load(f)["dimension"]
+
+    def _stored_rows(self) -> int:
+        """
+        Count the entries whose key and vector are both fully written.
+
+        Returns:
+            int: The number of complete rows.
+        """
+        if self.dimension is None:
+            return 0
+        sizes = [
+            os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            for file_path in [self._keys_path, self._vectors_path]
+        ]
+        return min(sizes[0] // 32, sizes[1] // (4 * self.dimension))
+
+    def _repair(self) -> int:
+        """
+        Drop the tail of a write interrupted between the two files, so the rows appended
+        next line up again. Must be called with the file lock held.
+
+        Returns:
+            int: The number of complete rows.
+        """
+        rows = self._stored_rows()
+        if self.dimension is not None:
+            for file_path, size in [
+                (self._keys_path, 32 * rows),
+                (self._vectors_path, 4 * self.dimension * rows),
+            ]:
+                if os.path.exists(file_path):
+                    os.truncate(file_path, size)
+        return rows
+
+    def _refresh(self):
+        """
+        Index the entries appended since the keys were last read, by this process or
+        others.
+        """
+        self._read_meta()
+        rows = self._stored_rows()
+        if rows <= self._rows:
+            return
+
+        with open(self._keys_path, "rb") as f:
+            f.seek(32 * self._rows)
+            keys = f.read(32 * (rows - self._rows))
+        for row in range(rows - self._rows):
+            self._index.setdefault(keys[32 * row : 32 * (row + 1)], self._rows + row)
+        self._rows = rows
+
+    def get(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """
+        Read the stored embeddings of some keys.
+
+        Args:
+            keys (list[bytes]): The content addresses.
+
+        Returns:
+            dict[bytes, np.ndarray]: The embedding of each stored key.
+        """
+        with self._lock:
+            # Another process may have stored the missing keys since the last read
+            if any(key not in self._index for key in keys):
+                self._refresh()
+
+            rows = {key: self._index[key] for key in keys if key in self._index}
+            if not rows:
+                return {}
+
+            # Remap once the file has grown past the current mapping
+            if self._vectors is None or len(self._vectors) < self._rows:
+                self._vectors = np.memmap(
+                    self._vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self._rows, self.dimension),
+                )
+            return {key: np.array(self._vectors[row]) for key, row in rows.items()}
+
+    def put(self, keys: list[bytes], vectors: np.ndarray):
+        """
+        Append embeddings.
+
+        Args:
+            keys (list[bytes]): The content addresses.
+            vectors (np.ndarray): The embedding of each key, one per row.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if all(key in self._index for key in keys):
+                return
+
+            with self._file_lock():
+                self._read_meta()
+                if self.dimension is None:
+                    # Written whole, as readers load it without the lock
+                    self.dimension = vectors.shape[1]
+                    temporary_path = f"{self._meta_path}.{os.getpid()}"
+                    with open(temporary_path, "w") as f:
+                        json.dump({"dimension": self.dimension}, f)
+                    os.replace(temporary_path, self._meta_path)
+
+                # Skip the keys other processes stored meanwhile, and append after the
+                # rows they wrote
+                self._repair()
+                self._refresh()
+                new = [i for i, key in enumerate(keys) if key not in self._index]
+                if not new:
+                    return
+
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors[new].tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(keys[i] for i in new))
+
+                for row, i in enumerate(new, self._rows):
+                    self._index[keys[i]] = row
+                self._rows += len(new)
+
+
+class CachedEmbeddingFunction:
+    """
+    Wraps an embedding function with a content-addressed cache, so the same text is
+    embedded once: an in-memory LRU tier over an optional disk tier shared by restarts.
+
+    Only the texts missed by both tiers are embedded, in a single call.
+    """
+
+    # Class attributes
+    embedding_function: Callable[[list[str]], list]
+    model_id: str
+    memory: TTLCache
+    disk: DiskEmbeddingStore | None
+    disk_hits: int
+    misses: int
+
+    def __init__(
+        self,
+        embedding_function: Callable[[list[str]], list],
+        model_id: str,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        path: str | None = None,
+    ):
+        """
+        Initialize the CachedEmbeddingFunction.
+
+        Args:
+            embedding_function (Callable): Embeds a list of texts into vectors.
+            model_id (str): Identifies the model and its settings; embeddings are only
+                shared between functions with the same ID.
+            max_size (int): Max embeddings kept in memory.
+            path (str | None): Directory of the disk tier, or None for memory only. Each
+                model gets its own store within it.
+        """
+        self.embedding_function = embedding_function
+        self.model_id = model_id
+        self.memory = TTLCache(max_size=max_size)
+        self.disk = (
+            None
+            if path is None
+            else DiskEmbeddingStore(
+                os.path.join(path, re.sub(r"[^\w.-]", "_", model_id))
+            )
+        )
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: list[str]) -> list[np.ndarray]:
+        """
+        Embed texts, reusing cached embeddings.
+
+        Args:
+            texts (list[str]): The texts.
+
+        Returns:
+            list[np.ndarray]: The embedding of each text.
+        """
+        keys = [embedding_key(self.model_id, text) for text in texts]
+        found = {}
+        for key in dict.fromkeys(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.disk is not None:
+            stored = self.disk.get(missing)
+            for key, vector in stored.items():
+                self.memory.set(key, vector)
+            found.update(stored)
+            with self._lock:
+                self.disk_hits += len(stored)
+            missing = [key for key in missing if key not in stored]
+
+        if missing:
+            # Embed each missing text once, even if the batch repeats it
+            first = {}
+            for key, text in zip(keys, texts):
+                first.setdefault(key, text)
+            vectors = np.asarray(
+                self.embedding_function([first[key] for key in missing]),
+                dtype=np.float32,
+            )
+            for key, vector in zip(missing, vectors):
+                self.memory.set(key, vector)
+                found[key] = vector
+            if self.disk is not None:
+                self.disk.put(missing, vectors)
+            with self._lock:
+                self.misses += len(missing)
+
+        if instrumentation.enabled:
+            instrumentation.count(
+                "cache_lookups",
+                len(found) - len(missing),
+                cache="embedding",
+                result="hit",
+            )
+            instrumentation.count(
+                "cache_lookups", len(missing), cache="embedding", result="miss"
+            )
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        """
+        Report the cache's size and hit rate.
+
+        Returns:
+            dict: The number of embeddings in memory and on disk, the hits of each tier,
+                the misses, the memory evictions and the hit rate. Lookups count each
+                distinct text of a call once.
+        """
+        # Memory misses are either disk hits or misses
+        memory_hits = self.memory.hits
+        lookups = memory_hits + self.memory.misses
+        return {
+            "size": len(self.memory),
+            "disk_size": 0 if self.disk is None else len(self.disk),
+            "memory_hits": memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+            "hit_rate": (memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+@functools.cache
+def get_embedding_function() -> CachedEmbeddingFunction:
+    """
+    Get the cached embedding function shared by the process, embedding queries and
+    memories with ChromaDB's default model, all-MiniLM-L6-v2.
+
+    Returns:
+        CachedEmbeddingFunction: The embedding function.
+    """
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+    return CachedEmbeddingFunction(
+        DefaultEmbeddingFunction(),
+        model_id="chroma-default-all-MiniLM-L6-v2",
+        path=EMBEDDING_CACHE_PATH or None,
+    )
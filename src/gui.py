@@ -1,84 +1,96 @@
+import json
 import os
+from typing import AsyncIterator
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 import gradio as gr
-from src.agents import RecipeAgent
-from src.datatypes import ToolDescription, TextResponse
-from src.tools import (
-    query_vectordb,
-    substitution_filter,
-    scrape_web_recipe,
-    access_memory,
-)
+from src.datatypes import StreamingTextResponse, TextResponse
+from src.agent_factory import CONCURRENCY_LIMIT, QUEUE_SIZE, create_recipe_agent
 
 # Load environment variables from a .env file
 load_dotenv()
 
-# Initialize the OpenAI client with the base URL and API key from environment variables
-client = OpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY"))
-
-# Define the tools available for the RecipeAgent
-tools = [
-    ToolDescription(
-        name="query_vectordb",
-        signature="query_vectordb(query: str, n_results=1)",
-        description="This function searches a vector database for recipes similar to the query argument.",
-        example_json='Call query_vectordb:\n```json\n{\n"query": "banana bread recipe"\n}\n```',
-        function=query_vectordb,
-    ),
-    ToolDescription(
-        name="substitution_filter",
-        signature="substitution_filter(to_replace: list[str])",
-        description=(
-            "This function searches for ingredient alternatives based on a list of ingredients to be substituted."
-            " Only the ingredients to substitute should be provided as arguments."
-        ),
-        example_json='Call substitution_filter:\n```json\n{\n"to_replace": ["eggs", "flour"]\n}\n```',
-        function=substitution_filter,
-    ),
-    ToolDescription(
-        name="scrape_web_recipe",
-        signature="scrape_web_recipe(link: str)",
-        description="This function scrapes the recipe at the provided link. Use when a user provides a recipe link.",
-        example_json='Call scrape_web_recipe:\n```json\n{\n"link": "https://www.allrecipes.com/lemon-garlic-butter"\n}\n```',
-        function=scrape_web_recipe,
-    ),
-    ToolDescription(
-        name="access_memory",
-        signature="access_memory(query: str, n_results=1)",
-        description="This function retrieves the most similar previous agent-user conversation for context.",
-        example_json='Call access_memory:\n```json\n{\n"query": "eggless banana bread recipe"\n}\n```',
-        function=access_memory,
-    ),
-]
-
-# Create the RecipeAgent instance with the initialized client and tools
-recipe_agent = RecipeAgent(client, tools)
-
-
-def chat(user_input: str, history):
+# URL of a shared agent backend (src/server.py); unset runs the agent in this process
+AGENT_BACKEND_URL = os.getenv("AGENT_BACKEND_URL")
+
+if AGENT_BACKEND_URL:
+    # Forward chat turns to the backend, so many GUI workers share one agent
+    backend = httpx.AsyncClient(base_url=AGENT_BACKEND_URL, timeout=None)
+    recipe_agent = None
+else:
+    # Initialize the async OpenAI client with the base URL and API key from environment variables
+    client = AsyncOpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY"))
+
+    # Create the AsyncRecipeAgent instance shared by all sessions
+    recipe_agent = create_recipe_agent(client)
+
+
+async def backend_chat(user_input: str, session_id: str) -> AsyncIterator[str]:
+    """
+    Stream the answer to a user message from the shared agent backend.
+
+    Parameters:
+    - user_input (str): The input message from the user.
+    - session_id (str): The session whose conversation the message continues.
+
+    Yields:
+    - str: Drafts of the response, then the response, or a notice if the backend is overloaded.
+    """
+    async with backend.stream(
+        "POST", "/chat/stream", json={"message": user_input, "session_id": session_id}
+    ) as response:
+        if response.status_code == 503:
+            yield "MealMatch is busy right now. Please try again in a moment."
+            return
+        response.raise_for_status()
+
+        draft = ""
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: ") :])
+                if event == "delta":
+                    draft += data["text"]
+                    yield draft
+                elif event in ("draft", "response"):
+                    draft = data["text"]
+                    yield draft
+                elif event == "error":
+                    yield f"Something went wrong: {data['detail']}"
+
+
+async def chat(user_input: str, history, request: gr.Request):
     """
     Handles the chat interaction, using the RecipeAgent to generate a response based on user input.
-    Appends the user input and agent response to the conversation history.
+    Streams the agent response into the conversation history as it is generated.
 
     Parameters:
     - user_input (str): The input message from the user.
     - history (list): The chat history to be updated.
+    - request (gr.Request): The Gradio request, whose session hash keys the agent conversation.
 
-    Returns:
+    Yields:
     - Tuple of an empty string (for clearing input) and the updated history.
     """
-    # Generate a response from the agent and get the steps taken (if needed)
-    agent_response, _ = recipe_agent.say(user_input)
-    message = ""
+    history.append((user_input, ""))
+    yield "", history
 
-    # Check if the response is a text response and extract the text
-    if isinstance(agent_response, TextResponse):
-        message = agent_response.text
+    if recipe_agent is None:
+        async for text in backend_chat(user_input, request.session_hash):
+            history[-1] = (user_input, text)
+            yield "", history
+        return
 
-    # Append the user input and response to the conversation history
-    history.append((user_input, message))
-    return "", history
+    # Stream drafts of the response, skipping tool steps
+    async for step in recipe_agent.say_stream(
+        user_input, session_id=request.session_hash
+    ):
+        if isinstance(step, (StreamingTextResponse, TextResponse)):
+            history[-1] = (user_input, step.text)
+            yield "", history
 
 
 # Define the style for the chatbot interface
@@ -105,8 +117,12 @@ with gr.Blocks() as demo:
 
     # Bind the chat function to the user input
     user_input_box.submit(
-        chat, inputs=[user_input_box, chatbot], outputs=[user_input_box, chatbot]
+        chat,
+        inputs=[user_input_box, chatbot],
+        outputs=[user_input_box, chatbot],
+        concurrency_limit=CONCURRENCY_LIMIT,
     )
 
-# Launch the Gradio interface
+# Launch the Gradio interface with a bounded request queue
+demo.queue(max_size=QUEUE_SIZE)
 demo.launch()
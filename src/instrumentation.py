@@ -0,0 +1,470 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, TextIO
+
+# Upper bounds in seconds of the span duration histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Prefix of the exported Prometheus metric names
+METRIC_PREFIX = "mealmatch"
+
+
+class Span:
+    """
+    Times one occurrence of an operation, such as an LLM call or a tool call, and
+    exports it when the block it wraps exits.
+    """
+
+    __slots__ = ("name", "attributes", "timestamp", "duration", "_start", "_owner")
+
+    def __init__(self, owner: "Instrumentation", name: str, attributes: dict):
+        """
+        Initialize the Span.
+
+        Args:
+            owner (Instrumentation): Exports the span once it ends.
+            name (str): The operation name, e.g. "llm.chat_completion".
+            attributes (dict): Details of the operation, e.g. the tool arguments.
+        """
+        self.name = name
+        self.attributes = attributes
+        self.timestamp = None
+        self.duration = None
+        self._start = None
+        self._owner = owner
+
+    def set(self, **attributes):
+        """
+        Add attributes learned while the operation runs, e.g. its token counts.
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.timestamp = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.attributes["error"] = exc_type.__name__
+        self._owner._export_span(self)
+
+
+class _NoopSpan:
+    """
+    The span returned while instrumentation is disabled, which records nothing.
+    """
+
+    __slots__ = ()
+
+    duration = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Exporter:
+    """
+    Base class of the destinations of spans and counters.
+    """
+
+    def export_span(self, span: Span):
+        """
+        Export a finished span.
+
+        Args:
+            span (Span): The span.
+        """
+        pass
+
+    def export_count(self, name: str, value: float, labels: dict):
+        """
+        Export an increment of a counter.
+
+        Args:
+            name (str): The counter name, e.g. "llm_prompt_tokens".
+            value (float): The increment.
+            labels (dict): The labels of the counter, e.g. {"cache": "tool"}.
+        """
+        pass
+
+
+class HistogramExporter(Exporter):
+    """
+    Aggregates span durations into in-process histograms and sums counters, and renders
+    them in the Prometheus text format.
+    """
+
+    # Class attributes
+    buckets: tuple[float, ...]
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the HistogramExporter.
+
+        Args:
+            buckets (tuple[float, ...]): Upper bounds in seconds of the histogram buckets.
+        """
+        self.buckets = buckets
+        self._histograms = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums = defaultdict(float)
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def export_span(self, span: Span):
+        index = bisect_left(self.buckets, span.duration)
+        with self._lock:
+            self._histograms[span.name][index] += 1
+            self._sums[span.name] += span.duration
+
+    def export_count(self, name: str, value: float, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def summary(self) -> dict:
+        """
+        Summarize the recorded spans and counters.
+
+        Returns:
+            dict: The count, mean and bucket-estimated percentiles of each span in
+                milliseconds, and the total of each counter.
+        """
+        with self._lock:
+            histograms = {
+                name: list(counts) for name, counts in self._histograms.items()
+            }
+            sums = dict(self._sums)
+            counters = dict(self._counters)
+
+        totals = {}
+        for (name, labels), value in sorted(counters.items()):
+            if labels:
+                name += "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+            totals[name] = value
+
+        spans = {}
+        for name, counts in sorted(histograms.items()):
+            total = sum(counts)
+            spans[name] = {
+                "count": total,
+                "mean_ms": 1000 * sums[name] / total,
+                **{
+                    f"p{q}_ms": 1000 * self._quantile(counts, q / 100)
+                    for q in (50, 95, 99)
+                },
+            }
+        return {
+            "spans": spans,
+            "counters": totals,
+        }
+
+    def render(self) -> str:
+        """
+        Render the histograms and counters in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        with self._lock:
+            histograms = {
+                name: list(counts) for name, counts in self._histograms.items()
+            }
+            sums = dict(self._sums)
+            counters = dict(self._counters)
+
+        metric = f"{METRIC_PREFIX}_span_duration_seconds"
+        lines = [f"# TYPE {metric} histogram"]
+        for name, counts in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{span="{_escape(name)}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{metric}_sum{{span="{_escape(name)}"}} {sums[name]}')
+            lines.append(f'{metric}_count{{span="{_escape(name)}"}} {cumulative}')
+
+        names = sorted({name for name, _ in counters})
+        for name in names:
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter != name:
+                    continue
+                rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+                lines.append(
+                    f"{METRIC_PREFIX}_{name}_total"
+                    + (f"{{{rendered}}}" if rendered else "")
+                    + f" {value}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def _quantile(self, counts: list[int], q: float) -> float:
+        """
+        Estimate a quantile of a histogram by interpolating within its bucket.
+
+        Args:
+            counts (list[int]): The count of each bucket.
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimated quantile in seconds.
+        """
+        rank = q * sum(counts)
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (
+                    (rank - cumulative) / count
+                )
+            cumulative += count
+        return 0.0
+
+
+class PrometheusExporter(HistogramExporter):
+    """
+    A HistogramExporter that serves its metrics over HTTP for Prometheus to scrape.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the PrometheusExporter.
+
+        Args:
+            buckets (tuple[float, ...]): Upper bounds in seconds of the histogram buckets.
+        """
+        super().__init__(buckets)
+        self._server = None
+
+    def serve(self, port: int = 9464, host: str = "0.0.0.0") -> "PrometheusExporter":
+        """
+        Serve the metrics at /metrics on a background thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str): The host to listen on.
+
+        Returns:
+            PrometheusExporter: The exporter itself.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving the metrics.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class JSONLogExporter(Exporter):
+    """
+    Writes every span and counter increment as a line of JSON.
+    """
+
+    # Class attributes
+    stream: TextIO
+
+    def __init__(self, stream: TextIO | None = None):
+        """
+        Initialize the JSONLogExporter.
+
+        Args:
+            stream (TextIO | None): The stream to write to; defaults to standard error.
+        """
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export_span(self, span: Span):
+        self._write(
+            {
+                "type": "span",
+                "name": span.name,
+                "timestamp": span.timestamp,
+                "duration_ms": 1000 * span.duration,
+                "thread": threading.current_thread().name,
+                **span.attributes,
+            }
+        )
+
+    def export_count(self, name: str, value: float, labels: dict):
+        self._write(
+            {
+                "type": "count",
+                "name": name,
+                "timestamp": time.time(),
+                "value": value,
+                **labels,
+            }
+        )
+
+    def _write(self, record: dict):
+        """
+        Write a record as a line of JSON.
+
+        Args:
+            record (dict): The record.
+        """
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class Instrumentation:
+    """
+    Records spans and counters on the hot paths of the agents, tools and vector store,
+    and hands them to the configured exporters. Without exporters, spans are a shared
+    no-op object, so instrumented code costs a single attribute check.
+    """
+
+    # Class attributes
+    exporters: list[Exporter]
+
+    def __init__(self, exporters: list[Exporter] = []):
+        """
+        Initialize the Instrumentation.
+
+        Args:
+            exporters (list[Exporter]): The destinations of spans and counters; none
+                disables instrumentation.
+        """
+        self.exporters = list(exporters)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any exporter is configured."""
+        return bool(self.exporters)
+
+    def configure(self, exporters: list[Exporter]):
+        """
+        Replace the exporters.
+
+        Args:
+            exporters (list[Exporter]): The destinations of spans and counters; none
+                disables instrumentation.
+        """
+        self.exporters = list(exporters)
+
+    def span(self, name: str, **attributes: Any) -> Span | _NoopSpan:
+        """
+        Time a block of code.
+
+        Args:
+            name (str): The operation name, e.g. "tool.query_vectordb".
+            **attributes (Any): Details of the operation.
+
+        Returns:
+            Span | _NoopSpan: A context manager timing the block.
+        """
+        if not self.exporters:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: float = 1, **labels: Any):
+        """
+        Increment a counter, e.g. tokens used or cache hits.
+
+        Args:
+            name (str): The counter name.
+            value (float): The increment.
+            **labels (Any): The labels of the counter.
+        """
+        for exporter in self.exporters:
+            exporter.export_count(name, value, labels)
+
+    def _export_span(self, span: Span):
+        """
+        Hand a finished span to the exporters.
+
+        Args:
+            span (Span): The span.
+        """
+        for exporter in self.exporters:
+            exporter.export_span(span)
+
+
+def _escape(value: str) -> str:
+    """
+    Escape a Prometheus label value.
+
+    Args:
+        value (str): The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exporters_from_env() -> list[Exporter]:
+    """
+    Build the exporters selected by the MEALMATCH_INSTRUMENTATION environment variable,
+    a comma-separated list of "histogram", "prometheus" and "json". The Prometheus
+    endpoint listens on MEALMATCH_METRICS_PORT.
+
+    Returns:
+        list[Exporter]: The exporters; empty if the variable is unset.
+    """
+    exporters = []
+    for name in os.getenv("MEALMATCH_INSTRUMENTATION", "").split(","):
+        name = name.strip().lower()
+        if name == "histogram":
+            exporters.append(HistogramExporter())
+        elif name == "prometheus":
+            exporters.append(
+                PrometheusExporter().serve(
+                    port=int(os.getenv("MEALMATCH_METRICS_PORT", "9464"))
+                )
+            )
+        elif name == "json":
+            exporters.append(JSONLogExporter())
+        elif name:
+            raise ValueError(f"Unknown instrumentation exporter: {name}")
+    return exporters
+
+
+# The instrumentation shared by the whole process, disabled unless configured
+instrumentation = Instrumentation(exporters_from_env())
@@ -0,0 +1,393 @@
+import atexit
+import functools
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from src.database import get_database
+from src.embeddings import get_embedding_function
+from src.instrumentation import instrumentation
+
+# The ChromaDB client, local or shared through a ChromaDB server
+database = get_database()
+
+# Embeds memories and queries, reusing the embeddings of repeated texts
+embedding_function = get_embedding_function()
+
+# Session used when the caller does not provide one
+DEFAULT_SESSION = "default"
+
+# Sentinel queued to stop the memory writer thread
+_STOP = object()
+
+# Sentinel queued to write the current batch without waiting for it to fill
+_FLUSH = object()
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_text(text: str, chunk_size: int) -> list[str]:
+    """
+    Split text into chunks of at most `chunk_size` characters at paragraph boundaries.
+
+    Paragraph separators stay attached to the chunks, so joining the chunks gives back
+    the original text.
+
+    Parameters:
+    text (str): The text to split.
+    chunk_size (int): The max number of characters per chunk.
+
+    Returns:
+    list[str]: The chunks of the text.
+    """
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        # Hard-split paragraphs that are longer than a chunk on their own
+        pieces = [
+            paragraph[i : i + chunk_size] for i in range(0, len(paragraph), chunk_size)
+        ]
+        for piece in pieces:
+            if current and len(current) + len(piece) > chunk_size:
+                chunks.append(current)
+                current = ""
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class MemoryStore:
+    """
+    Persistent conversational memory, scoped by session, backed by the 'memory'
+    ChromaDB collection.
+
+    Long responses are stored as several chunks so each one fits the embedding model,
+    and are reassembled when retrieved. A retention policy bounds the collection by
+    age and by the number of chunks kept per session.
+    """
+
+    # Class attributes
+    chunk_size: int
+    max_age: float | None
+    max_chunks_per_session: int | None
+
+    def __init__(
+        self,
+        collection_name: str = "memory",
+        chunk_size: int = 1000,
+        max_age: float | None = 30 * 24 * 60 * 60,
+        max_chunks_per_session: int | None = 200,
+    ):
+        """
+        Initialize the MemoryStore.
+
+        Args:
+            collection_name (str): The ChromaDB collection holding the memory.
+            chunk_size (int): The max number of characters per stored chunk.
+            max_age (float | None): Seconds a memory is retained, or None to keep it forever.
+            max_chunks_per_session (int | None): Max chunks kept per session; the oldest
+                are dropped first. None keeps all of them.
+        """
+        self.collection = database.get_or_create_collection(name=collection_name)
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+        self.max_chunks_per_session = max_chunks_per_session
+
+    def add(self, session_id: str, text: str) -> list[str]:
+        """
+        Store a response in a session's memory.
+
+        Args:
+            session_id (str): The session the response belongs to.
+            text (str): The response text.
+
+        Returns:
+            list[str]: The IDs of the stored chunks.
+        """
+        return self.add_batch([(session_id, text)])
+
+    def add_batch(self, memories: list[tuple[str, str]]) -> list[str]:
+        """
+        Store several responses, possibly from different sessions, in one write.
+
+        Args:
+            memories (list[tuple[str, str]]): The session ID and text of each response.
+
+        Returns:
+            list[str]: The IDs of the stored chunks.
+        """
+        ids, documents, metadatas = [], [], []
+        created_at = time.time()
+
+        for session_id, text in memories:
+            response_id = hashlib.sha256(
+                f"{session_id}\n{text}".encode("utf-8")
+            ).hexdigest()
+            for index, chunk in enumerate(chunk_text(text, self.chunk_size)):
+                ids.append(f"{response_id}-{index}")
+                documents.append(chunk)
+                metadatas.append(
+                    {
+                        "session_id": session_id,
+                        "response_id": response_id,
+                        "chunk": index,
+                        "created_at": created_at,
+                    }
+                )
+
+        if ids:
+            with instrumentation.span(
+                "memory.write", responses=len(memories), chunks=len(ids)
+            ):
+                self.collection.upsert(
+                    ids=ids,
+                    documents=documents,
+                    metadatas=metadatas,
+                    embeddings=embedding_function(documents),
+                )
+                for session_id in {session_id for session_id, _ in memories}:
+                    self._trim_session(session_id)
+        return ids
+
+    def query(self, session_id: str, query: str, n_results: int = 1) -> list[list[str]]:
+        """
+        Retrieve the responses of a session most similar to a query.
+
+        Args:
+            session_id (str): The session to search.
+            query (str): The query string.
+            n_results (int): The max number of responses to return.
+
+        Returns:
+            list[list[str]]: The full text of the matching responses, most similar first.
+        """
+        with instrumentation.span("vectordb.query", collection=self.collection.name):
+            results = self.collection.query(
+                query_embeddings=embedding_function([query]),
+                # Several chunks of one response may match, so over-fetch before grouping
+                n_results=n_results * 3,
+                where={"session_id": session_id},
+                include=["metadatas"],
+            )
+
+        response_ids = list(
+            dict.fromkeys(
+                metadata["response_id"] for metadata in results["metadatas"][0]
+            )
+        )[:n_results]
+        if not response_ids:
+            return [[]]
+
+        chunks = self.collection.get(
+            where={"response_id": {"$in": response_ids}},
+            include=["documents", "metadatas"],
+        )
+        parts = {response_id: [] for response_id in response_ids}
+        for document, metadata in zip(chunks["documents"], chunks["metadatas"]):
+            parts[metadata["response_id"]].append((metadata["chunk"], document))
+
+        return [
+            [
+                "".join(document for _, document in sorted(parts[response_id]))
+                for response_id in response_ids
+            ]
+        ]
+
+    def compact(self):
+        """
+        Delete the memories older than the retention period.
+        """
+        if self.max_age is not None:
+            self.collection.delete(
+                where={"created_at": {"$lt": time.time() - self.max_age}}
+            )
+
+    def _trim_session(self, session_id: str):
+        """
+        Delete a session's oldest responses until it is within the per-session chunk limit.
+
+        Args:
+            session_id (str): The session to trim.
+        """
+        if self.max_chunks_per_session is None:
+            return
+
+        chunks = self.collection.get(
+            where={"session_id": session_id}, include=["metadatas"]
+        )
+        excess = len(chunks["ids"]) - self.max_chunks_per_session
+        if excess <= 0:
+            return
+
+        # Whole responses are dropped so no partial response is ever retrieved
+        responses = {}
+        for chunk_id, metadata in zip(chunks["ids"], chunks["metadatas"]):
+            responses.setdefault(metadata["response_id"], (metadata["created_at"], []))[
+                1
+            ].append(chunk_id)
+
+        expired = []
+        for _, chunk_ids in sorted(
+            responses.values(), key=lambda response: response[0]
+        ):
+            if len(expired) >= excess:
+                break
+            expired.extend(chunk_ids)
+        self.collection.delete(ids=expired)
+
+
+@functools.cache
+def get_memory_store() -> MemoryStore:
+    """
+    Get the memory store shared by the process, so the agent and the access_memory
+    tool read and write the same memory.
+
+    Returns:
+        MemoryStore: The store backed by the 'memory' collection.
+    """
+    return MemoryStore()
+
+
+class MemoryWriter:
+    """
+    Writes memories on a background thread so persisting them stays off the response path.
+
+    Memories from all sessions are queued and written in batches, so each batch is
+    embedded in a single forward pass. A batch is written once it reaches `batch_size`
+    memories, `flush_interval` seconds after its first memory was queued or as soon as
+    `flush` is called, and any pending memories are written when the writer is closed
+    or the process exits.
+    """
+
+    # Class attributes
+    store: MemoryStore
+    batch_size: int
+    flush_interval: float
+    written: int
+    failed: int
+
+    def __init__(
+        self, store: MemoryStore, batch_size: int = 32, flush_interval: float = 1.0
+    ):
+        """
+        Initialize the MemoryWriter and start its thread.
+
+        Args:
+            store (MemoryStore): The store the memories are written to.
+            batch_size (int): Max number of memories written in one batch.
+            flush_interval (float): Max seconds a memory waits for its batch to fill.
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._closed = False
+
+        # Queued memories of each session not yet written, so a session can wait for its
+        # own writes without waiting for the other sessions'
+        self._pending = {}
+        self._pending_changed = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="memory-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, session_id: str, text: str):
+        """
+        Queue a response to be stored in a session's memory.
+
+        Args:
+            session_id (str): The session the response belongs to.
+            text (str): The response text.
+        """
+        if self._closed:
+            raise RuntimeError("The memory writer is closed.")
+        with self._pending_changed:
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._queue.put((session_id, text))
+
+    def flush(self, session_id: str | None = None):
+        """
+        Write queued memories now and block until they have been written.
+
+        Args:
+            session_id (str | None): The session whose memories to wait for, or None to
+                wait for every session's.
+        """
+        if self._closed:
+            return
+        with self._pending_changed:
+            if session_id is not None and not self._pending.get(session_id):
+                return
+        self._queue.put(_FLUSH)
+
+        if session_id is None:
+            self._queue.join()
+            return
+        with self._pending_changed:
+            self._pending_changed.wait_for(lambda: not self._pending.get(session_id))
+
+    def close(self):
+        """
+        Write the pending memories and stop the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        """
+        Collect queued memories into batches and write them until stopped.
+        """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            taken = 1
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                    taken += 1
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self.store.add_batch(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    # A failed batch is dropped so the writer keeps serving other sessions
+                    self.failed += len(batch)
+                    instrumentation.count("memory_write_failures", len(batch))
+                    logger.warning("Failed to write %d memories: %s", len(batch), e)
+
+                with self._pending_changed:
+                    for session_id, _ in batch:
+                        self._pending[session_id] -= 1
+                        if not self._pending[session_id]:
+                            del self._pending[session_id]
+                    self._pending_changed.notify_all()
+
+            for _ in range(taken):
+                self._queue.task_done()
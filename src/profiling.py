@@ -0,0 +1,188 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Iterator, TextIO
+
+
+def peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the process.
+
+    Returns:
+        float: The peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class StageProfiler:
+    """
+    Records the wall time, CPU time and call count of the stages of a batch job, and
+    optionally a cProfile of each stage, to find where nightly ingest and scraping
+    runs spend their time.
+
+    Times are summed over every occurrence of a stage, so stages that run concurrently,
+    like the fetches of the scraper, can add up to more than the elapsed time. Only one
+    stage is cProfiled at a time; a stage entered while another is being profiled is
+    timed but not profiled.
+    """
+
+    # Class attributes
+    enabled: bool
+    profile_dir: str | None
+
+    def __init__(self, enabled: bool = True, profile_dir: str | None = None):
+        """
+        Initialize the StageProfiler.
+
+        Args:
+            enabled (bool): Whether to record anything; a disabled profiler costs nothing.
+            profile_dir (str | None): Directory the cProfile dump of each stage is written
+                to, or None to only record times.
+        """
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self.wall = defaultdict(float)
+        self.cpu = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.peak_rss = defaultdict(float)
+        self._profiles = {}
+        self._profiling = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def _record(self, name: str, profile: bool) -> Iterator[None]:
+        """
+        Record one occurrence of a stage.
+
+        Args:
+            name (str): The stage name.
+            profile (bool): Whether to cProfile the stage.
+        """
+        profiler = None
+        with self._lock:
+            if profile and self.profile_dir is not None and not self._profiling:
+                profiler = self._profiles.setdefault(name, cProfile.Profile())
+                self._profiling = True
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                if profiler is not None:
+                    self._profiling = False
+                self.wall[name] += wall
+                self.cpu[name] += cpu
+                self.calls[name] += 1
+                self.peak_rss[name] = max(self.peak_rss[name], peak_rss_mb())
+
+    def stage(
+        self, name: str, profile: bool = True
+    ) -> contextlib.AbstractContextManager:
+        """
+        Time a block of code as an occurrence of a stage.
+
+        Args:
+            name (str): The stage name, e.g. "tokenize".
+            profile (bool): Whether to cProfile the stage when a profile directory is
+                set. Stages that await I/O should not be, as the profile would include
+                whatever else the event loop runs meanwhile.
+
+        Returns:
+            contextlib.AbstractContextManager: The context manager timing the block.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._record(name, profile)
+
+    def summary(self) -> dict:
+        """
+        Summarize the recorded stages.
+
+        Returns:
+            dict: The elapsed time and peak RSS of the job, and the calls, wall time, CPU
+                time, share of the elapsed time and peak RSS at the end of each stage.
+        """
+        elapsed = time.perf_counter() - self._started
+        with self._lock:
+            stages = {
+                name: {
+                    "calls": self.calls[name],
+                    "wall_s": self.wall[name],
+                    "cpu_s": self.cpu[name],
+                    "wall_share": self.wall[name] / elapsed if elapsed else 0.0,
+                    "peak_rss_mb": self.peak_rss[name],
+                }
+                for name in self.calls
+            }
+        return {"elapsed_s": elapsed, "peak_rss_mb": peak_rss_mb(), "stages": stages}
+
+    def report(self, stream: TextIO | None = None, top: int = 10):
+        """
+        Print the stage summary, and the top functions of each profiled stage.
+
+        Args:
+            stream (TextIO | None): The stream to print to; defaults to standard error.
+            top (int): Number of functions listed per profiled stage.
+        """
+        stream = stream or sys.stderr
+        summary = self.summary()
+
+        print(
+            f"\n{'stage':<20}{'calls':>8}{'wall s':>10}{'cpu s':>10}"
+            f"{'wall %':>8}{'rss MB':>10}",
+            file=stream,
+        )
+        for name, stage in sorted(
+            summary["stages"].items(), key=lambda item: -item[1]["wall_s"]
+        ):
+            print(
+                f"{name:<20}{stage['calls']:>8}{stage['wall_s']:>10.2f}"
+                f"{stage['cpu_s']:>10.2f}{100 * stage['wall_share']:>7.1f}%"
+                f"{stage['peak_rss_mb']:>10.1f}",
+                file=stream,
+            )
+        print(
+            f"elapsed {summary['elapsed_s']:.2f} s, "
+            f"peak RSS {summary['peak_rss_mb']:.1f} MB",
+            file=stream,
+        )
+
+        for name, profiler in self._profiles.items():
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(
+                top
+            )
+            print(f"\n--- {name} ---\n{output.getvalue().strip()}", file=stream)
+
+    def dump(self):
+        """
+        Write the cProfile of each stage, loadable with pstats or snakeviz, and the
+        summary as JSON to the profile directory.
+        """
+        if self.profile_dir is None:
+            return
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for name, profiler in self._profiles.items():
+            filename = re.sub(r"[^\w.-]", "_", name)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{filename}.prof"))
+        with open(os.path.join(self.profile_dir, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=4)
@@ -0,0 +1,295 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+from typing import Any, Iterator
+import numpy as np
+from src.scraping.dedup import canonicalize_url
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+
+# Default location of the recipe store
+STORE_PATH = os.path.join(project_root, "data", "recipe_store")
+
+# Version of the on-disk layout, checked when a store is opened
+FORMAT_VERSION = 1
+
+
+def recipe_id(url: str) -> str:
+    """
+    Get the ID of a recipe, shared by the recipe store, the vector database and the
+    benchmarks. The URL is canonicalized first, so a recipe scraped under a tracking or
+    http URL keeps its ID.
+
+    Args:
+        url (str): The recipe URL, canonical or as scraped.
+
+    Returns:
+        str: The hex SHA-256 of the canonical URL.
+    """
+    return hashlib.sha256(canonicalize_url(url).encode("utf-8")).hexdigest()
+
+
+class RecipeStore:
+    """
+    A read-only columnar store of scraped recipes, replacing the pretty-printed JSON
+    files as the copy read by ingest, deduplication and analytics. The retrieval path
+    does not read it: query_vectordb returns the metadata stored in ChromaDB.
+
+    Each column is a data file of compact JSON values, each followed by a comma, with
+    an offsets array giving where each row's value starts. Files are memory-mapped, so
+    opening a store reads nothing, loading a column reads only that column, and a
+    recipe is found by ID through a sorted index of the digests of the recipe IDs, the
+    same IDs as in ChromaDB.
+
+    Layout of the store directory:
+        manifest.json: The format version, row count and columns.
+        ids.npy: The 32-byte digest of each row's recipe ID.
+        id_index.npy, id_order.npy: The sorted digests, searched to find a recipe by
+            ID, and the row of each.
+        <column>.data, <column>.offsets.npy: The values of each column.
+    """
+
+    # Class attributes
+    path: str
+    columns: list[str]
+
+    def __init__(self, path: str = STORE_PATH):
+        """
+        Open a recipe store.
+
+        Args:
+            path (str): The store directory.
+
+        Raises:
+            FileNotFoundError: If there is no store at the path.
+            ValueError: If the store was written in another format version.
+        """
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        if manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recipe store version {manifest['version']}.")
+
+        self.path = path
+        self.columns = manifest["columns"]
+        self._rows = manifest["rows"]
+        self._ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self._id_index = np.load(os.path.join(path, "id_index.npy"), mmap_mode="r")
+        self._id_order = np.load(os.path.join(path, "id_order.npy"), mmap_mode="r")
+        self._offsets = {}
+        self._data = {}
+
+    @classmethod
+    def write(cls, path: str, recipes: list[dict]) -> "RecipeStore":
+        """
+        Write recipes to a new store, replacing any store at the path.
+
+        Args:
+            path (str): The store directory.
+            recipes (list[dict]): The recipes, each with a URL. The columns are the union
+                of their fields; a recipe without a field has null in its column.
+
+        Returns:
+            RecipeStore: The written store.
+        """
+        os.makedirs(path, exist_ok=True)
+        columns = list(dict.fromkeys(key for recipe in recipes for key in recipe))
+
+        for column in columns:
+            offsets = np.zeros(len(recipes) + 1, dtype=np.int64)
+            with open(os.path.join(path, f"{column}.data"), "wb") as f:
+                for row, recipe in enumerate(recipes):
+                    # Each value is followed by a comma, so a column is a JSON array
+                    value = json.dumps(
+                        recipe.get(column), ensure_ascii=False, separators=(",", ":")
+                    ).encode("utf-8")
+                    f.write(value + b",")
+                    offsets[row + 1] = offsets[row] + len(value) + 1
+            np.save(os.path.join(path, f"{column}.offsets.npy"), offsets)
+
+        ids = np.array(
+            [bytes.fromhex(recipe_id(recipe["url"])) for recipe in recipes],
+            dtype="S32",
+        )
+        np.save(os.path.join(path, "ids.npy"), ids)
+        order = np.argsort(ids, kind="stable")
+        np.save(os.path.join(path, "id_index.npy"), ids[order])
+        np.save(os.path.join(path, "id_order.npy"), order)
+
+        # The manifest is written last, so a partly written store cannot be opened
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(
+                {"version": FORMAT_VERSION, "rows": len(recipes), "columns": columns},
+                f,
+                indent=4,
+            )
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _column(self, column: str) -> tuple[np.ndarray, mmap.mmap | bytes]:
+        """
+        Map a column's files into memory, once.
+
+        Args:
+            column (str): The column name.
+
+        Returns:
+            tuple[np.ndarray, mmap.mmap | bytes]: The offsets and data of the column.
+        """
+        if column not in self._data:
+            if column not in self.columns:
+                raise KeyError(f"Unknown recipe store column: {column}")
+
+            self._offsets[column] = np.load(
+                os.path.join(self.path, f"{column}.offsets.npy"), mmap_mode="r"
+            )
+            with open(os.path.join(self.path, f"{column}.data"), "rb") as f:
+                # Empty files cannot be mapped
+                self._data[column] = (
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    if os.fstat(f.fileno()).st_size
+                    else b""
+                )
+        return self._offsets[column], self._data[column]
+
+    def row(self, id: str) -> int:
+        """
+        Find the row of a recipe.
+
+        Args:
+            id (str): The recipe ID, see recipe_id.
+
+        Returns:
+            int: The row.
+
+        Raises:
+            KeyError: If the store has no such recipe.
+        """
+        digest = np.array(bytes.fromhex(id), dtype="S32")
+        position = int(np.searchsorted(self._id_index, digest))
+        if position < self._rows and self._id_index[position] == digest:
+            return int(self._id_order[position])
+        raise KeyError(id)
+
+    def value(self, column: str, row: int) -> Any:
+        """
+        Read one value.
+
+        Args:
+            column (str): The column name.
+            row (int): The row.
+
+        Returns:
+            Any: The value.
+        """
+        offsets, data = self._column(column)
+        return json.loads(data[offsets[row] : offsets[row + 1] - 1])
+
+    def get(self, id: str, columns: list[str] | None = None) -> dict:
+        """
+        Read a recipe by ID.
+
+        Args:
+            id (str): The recipe ID, see recipe_id.
+            columns (list[str] | None): The fields to read; all by default.
+
+        Returns:
+            dict: The recipe.
+        """
+        row = self.row(id)
+        return {column: self.value(column, row) for column in columns or self.columns}
+
+    def column(self, column: str) -> list[Any]:
+        """
+        Read every value of a column, without touching the other columns.
+
+        Args:
+            column (str): The column name.
+
+        Returns:
+            list[Any]: The values, in row order.
+        """
+        offsets, data = self._column(column)
+        # Parse the comma-separated values in one go, dropping the last comma
+        return json.loads(b"[" + data[: max(len(data) - 1, 0)] + b"]")
+
+    def read(self, columns: list[str] | None = None) -> list[dict]:
+        """
+        Read every recipe.
+
+        Args:
+            columns (list[str] | None): The fields to read; all by default.
+
+        Returns:
+            list[dict]: The recipes, in row order.
+        """
+        columns = columns or self.columns
+        values = [self.column(column) for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.read())
+
+    def close(self):
+        """
+        Unmap the column files.
+        """
+        for data in self._data.values():
+            if isinstance(data, mmap.mmap):
+                data.close()
+        self._data = {}
+        self._offsets = {}
+
+
+def build_store(source: str, path: str = STORE_PATH) -> RecipeStore:
+    """
+    Convert the scraped recipe JSON files to a recipe store, skipping the pages that
+    failed to scrape and keeping the first recipe scraped under each canonical URL, so
+    each recipe ID has one row.
+
+    Args:
+        source (str): The directory of scraped recipe JSON files.
+        path (str): The store directory.
+
+    Returns:
+        RecipeStore: The written store.
+    """
+    recipes = {}
+    for filename in sorted(os.listdir(source)):
+        with open(os.path.join(source, filename), "r") as f:
+            for recipe in json.load(f):
+                if "error" not in recipe and recipe.get("url"):
+                    recipes.setdefault(recipe_id(recipe["url"]), recipe)
+    return RecipeStore.write(path, list(recipes.values()))
+
+
+# Build the recipe store from the scraped JSON files
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the scraped recipe JSON files to a recipe store."
+    )
+    parser.add_argument(
+        "--source", default=os.path.join(project_root, "data", "scraped_json")
+    )
+    parser.add_argument("--output", default=STORE_PATH)
+    args = parser.parse_args()
+
+    store = build_store(args.source, args.output)
+    size = sum(
+        os.path.getsize(os.path.join(args.output, name))
+        for name in os.listdir(args.output)
+    )
+    print(
+        json.dumps(
+            {
+                "recipes": len(store),
+                "columns": store.columns,
+                "size_mb": size / 1024 / 1024,
+            },
+            indent=4,
+        )
+    )
@@ -1,19 +1,21 @@
+import argparse
 import hashlib
 import json
 import os
-import re
-import string
 from tqdm import tqdm
 from transformers import AutoTokenizer, AutoModel
+import numpy as np
 import torch
-import chromadb
-import os
-
-# Get the project root directory
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+from src.database import get_database
+from src.embeddings import EMBEDDING_CACHE_PATH, CachedEmbeddingFunction
+from src.profiling import StageProfiler
+from src.recipe_store import RecipeStore, recipe_id
+from src.scraping.dedup import canonicalize_url, deduplicate
+from src.scraping.preprocessing import preprocess_texts, recipe_text
+from src.tools.tool_cache import mark_ingest
 
-# Initialize a persistent ChromaDB client to store agent memory
-database = chromadb.PersistentClient(path=f"{project_root}/chromadb")
+# The ChromaDB client, local or shared through a ChromaDB server
+database = get_database()
 
 collection = database.get_or_create_collection(name="recipes")
 
@@ -25,25 +27,85 @@ model = AutoModel.from_pretrained(model_name)
 # Define batch size for processing
 BATCH_SIZE = 32
 
+# Max words of an ingredients or instructions chunk of the recipe_chunks index
+CHUNK_WORDS = 200
+
+# Records the time spent in each ingest stage; enabled by the --profile flag
+profiler = StageProfiler(enabled=False)
 
-def preprocess_text(text):
+
+def chunk_lines(lines, max_words=CHUNK_WORDS):
     """
-    Preprocesses the input text by converting it to lowercase, removing special characters and punctuation,
-    and removing extra whitespace.
+    Groups consecutive lines, such as instruction steps, into chunks of at most max_words
+    words. A line longer than that is a chunk of its own.
 
     Parameters:
-    text (str): The input text to be cleaned.
+    lines (list of str): The lines to be grouped.
+    max_words (int): The max number of words of a chunk.
 
     Returns:
-    str: The preprocessed text.
+    list of str: The chunks.
+    """
+    chunks = []
+    current = []
+    words = 0
+    for line in lines:
+        length = len(line.split())
+        if current and words + length > max_words:
+            chunks.append(" ".join(current))
+            current, words = [], 0
+        current.append(line)
+        words += length
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def recipe_chunks(recipe):
     """
-    # Convert text to lowercase
-    text = text.lower()
-    # Remove special characters and punctuation
-    text = re.sub(f"[{string.punctuation}]", "", text)
-    # Remove extra whitespace
-    text = " ".join(text.split())
-    return text
+    Splits a recipe into the texts embedded by the recipe_chunks index: a summary of its
+    title, description, cuisine and category, and chunks of its ingredients and of its
+    instructions, each prefixed with the title. Unlike the single concatenated text,
+    no part of a long recipe is truncated away, and ingredient queries match a vector of
+    the ingredients alone.
+
+    Parameters:
+    recipe (dict): The recipe to be split.
+
+    Returns:
+    list of tuple: The field, the chunk number within the field, and the text of each
+    chunk.
+    """
+    title = str(recipe.get("title", ""))
+    chunks = [
+        (
+            "summary",
+            0,
+            " ".join(
+                [
+                    title,
+                    str(recipe.get("description", "")),
+                    str(recipe.get("cuisine", "")),
+                    " ".join(recipe.get("category", [])),
+                ]
+            ),
+        )
+    ]
+    for field in ["ingredients", "instructions"]:
+        for number, chunk in enumerate(chunk_lines(recipe.get(field) or [])):
+            chunks.append((field, number, f"{title} {chunk}"))
+    return chunks
+
+
+def get_chunk_collection():
+    """
+    Gets the multi-vector index, holding the chunks of each recipe's fields. It is only
+    created by the ingests that build it, not on import.
+
+    Returns:
+    chromadb.Collection: The recipe_chunks collection.
+    """
+    return database.get_or_create_collection(name="recipe_chunks")
 
 
 def generate_embeddings(batch_texts):
@@ -56,105 +118,302 @@ def generate_embeddings(batch_texts):
     Returns:
     numpy.ndarray: The generated embeddings for the batch of texts.
     """
-    inputs = tokenizer(
-        batch_texts, return_tensors="pt", truncation=True, max_length=512, padding=True
-    )
-    with torch.no_grad():
+    with profiler.stage("tokenize"):
+        inputs = tokenizer(
+            batch_texts,
+            return_tensors="pt",
+            truncation=True,
+            max_length=512,
+            padding=True,
+        )
+    with profiler.stage("forward"), torch.no_grad():
         outputs = model(**inputs)
-    # Perform mean pooling to get a single vector per text
-    return outputs.last_hidden_state.mean(dim=1).numpy()
+        # Perform mean pooling to get a single vector per text
+        return outputs.last_hidden_state.mean(dim=1).numpy()
+
+
+# Caches the embeddings of ingested texts on disk, so a re-ingest only embeds the
+# recipes that changed
+cached_embeddings = CachedEmbeddingFunction(
+    generate_embeddings,
+    model_id=f"{model_name}-mean-pooled",
+    path=EMBEDDING_CACHE_PATH or None,
+)
+
+
+def stale_ids(recipe):
+    """
+    Lists the IDs a recipe may have been ingested under before its URL was canonicalized
+    and its duplicates collapsed: the SHA-256 of each of its scraped URLs, and the ID of
+    each alias.
+
+    Parameters:
+    recipe (dict): The recipe, with the URLs of its duplicates in "aliases".
+
+    Returns:
+    set of str: The IDs, which may include the recipe's current ID.
+    """
+    ids = set()
+    for url in [recipe.get("url", ""), *recipe.get("aliases", [])]:
+        ids.add(hashlib.sha256(url.encode("utf-8")).hexdigest())
+        ids.add(recipe_id(url))
+    return ids
 
 
-def batched_json_loader(file_path, batch_size):
+def unique_recipes(recipes):
     """
-    Reads a JSON file and yields its content in batches.
+    Collapses recipes whose URLs canonicalize to the same ID, which are the same page
+    even when duplicates were not removed. The first recipe is kept, with the scraped
+    URLs of the others added to its aliases, so no recipe is upserted over another.
+
+    Parameters:
+    recipes (list of dict): The recipes.
+
+    Returns:
+    list of dict: The recipes with unique IDs, in the order of their first occurrence.
+    """
+    unique = {}
+    for recipe in recipes:
+        identifier = recipe_id(recipe.get("url", ""))
+        if identifier not in unique:
+            unique[identifier] = recipe
+            continue
+        kept = unique[identifier]
+        urls = [recipe.get("url", ""), *recipe.get("aliases", [])]
+        aliases = set(kept.get("aliases", [])) | set(urls)
+        unique[identifier] = {
+            **kept,
+            "aliases": sorted(aliases - {kept.get("url", "")}),
+        }
+    return list(unique.values())
+
+
+def read_recipes(file_path):
+    """
+    Reads a JSON file of scraped recipes, skipping the pages that failed to scrape.
 
     Parameters:
     file_path (str): The path to the JSON file to be read.
-    batch_size (int): The size of each batch.
 
-    Yields:
-    list of dict: A batch of recipes from the JSON file.
+    Returns:
+    list of dict: The recipes from the JSON file.
+    """
+    with profiler.stage("read"):
+        with open(file_path, "r") as f:
+            recipes = json.load(f)
+
+        # Filter out recipes that have an "error" key
+        return [r for r in recipes if "error" not in r]
+
+
+def deduplicate_recipes(recipes):
     """
-    with open(file_path, "r") as f:
-        recipes = json.load(f)
+    Collapses recipes scraped under several URLs, or syndicated with the same title and
+    ingredients, into one canonical record with the other URLs as aliases.
+
+    Parameters:
+    recipes (list of dict): The scraped recipes.
 
-    # Filter out recipes that have an "error" key
-    recipes = [r for r in recipes if "error" not in r]
+    Returns:
+    list of dict: The canonical recipes.
+    """
+    with profiler.stage("dedup"):
+        recipes, stats = deduplicate(recipes)
 
-    for i in range(0, len(recipes), batch_size):
-        yield recipes[i : i + batch_size]
+    print(
+        f"Deduplicated {stats['records']} recipes into {stats['canonical']} "
+        f"({stats['url_duplicates']} duplicate URLs, "
+        f"{stats['near_duplicates']} near duplicates)."
+    )
+    return recipes
 
 
-def load_file(filename):
+def load_recipes(recipes, description="recipes", chunked=False):
     """
-    Processes and loads data from a JSON file into the ChromaDB collection, generating embeddings and
-    adding the text, metadata, and embeddings to the collection.
+    Loads recipes into the ChromaDB collection, generating embeddings and adding the text,
+    metadata, and embeddings to the collection.
+
+    Recipes are upserted under the ID of their canonical URL, and the records left under
+    their raw URLs or aliases by earlier ingests are deleted, so re-ingesting does not
+    index a recipe twice. Recipes sharing an ID are collapsed first, and the chunks
+    previously ingested for a recipe or its aliases are replaced rather than updated.
 
     Parameters:
-    filename (str): The path to the JSON file to be processed.
+    recipes (list of dict): The recipes to be loaded.
+    description (str): The name of the recipes shown in the progress bar.
+    chunked (bool): Whether to also load the chunks of each recipe into the recipe_chunks
+    collection. Chunks only carry their recipe's ID and field; the recipe itself is
+    read from the recipes collection once its chunks match.
     """
-    for batch in tqdm(
-        batched_json_loader(filename, BATCH_SIZE),
-        desc=f"Processing {filename} batches",
+    recipes = unique_recipes(recipes)
+    chunk_collection = get_chunk_collection() if chunked else None
+    for i in tqdm(
+        range(0, len(recipes), BATCH_SIZE),
+        desc=f"Processing {description} batches",
     ):
-        batch_texts = []
-        batch_metadata = []
-        batch_ids = []
+        batch = recipes[i : i + BATCH_SIZE]
+        with profiler.stage("preprocess"):
+            batch_texts = []
+            batch_metadata = []
+            batch_ids = []
+            batch_stale_ids = set()
+            chunk_texts = []
+            chunk_metadata = []
+            chunk_ids = []
 
-        for recipe in batch:
-            # Concatenate recipe fields to form the full text input
-            text = " ".join(
-                [
-                    str(recipe.get("title", "")),
-                    str(recipe.get("description", "")),
-                    " ".join(recipe.get("ingredients", [])),
-                    " ".join(recipe.get("instructions", [])),
-                    str(recipe.get("cuisine", "")),
-                    " ".join(recipe.get("category", [])),
-                ]
-            )
-            batch_texts.append(preprocess_text(text))
-
-            # Create metadata dictionary for each recipe
-            metadata = {
-                "prep_time": str(recipe.get("prep_time")),
-                "cook_time": str(recipe.get("cook_time")),
-                "total_time": str(recipe.get("total_time")),
-                "title": str(recipe.get("title", "")),
-                "category": ", ".join(recipe.get("category", [])),
-                "cuisine": str(recipe.get("cuisine", "")),
-                "description": str(recipe.get("description", "")),
-                "ingredients": ", ".join(recipe.get("ingredients", [])),
-                "instructions": ", ".join(recipe.get("instructions", [])),
-                "nutrients": json.dumps(recipe.get("nutrients", "")),
-                "yields": str(recipe.get("yields", "")),
-                "url": recipe.get("url", ""),
-            }
-            batch_metadata.append(metadata)
-
-            # Generate a unique ID based on the recipe URL
-            batch_ids.append(
-                hashlib.sha256(recipe.get("url", "").encode("utf-8")).hexdigest()
+            for recipe in batch:
+                # Create metadata dictionary for each recipe
+                metadata = {
+                    "prep_time": str(recipe.get("prep_time")),
+                    "cook_time": str(recipe.get("cook_time")),
+                    "total_time": str(recipe.get("total_time")),
+                    "title": str(recipe.get("title", "")),
+                    "category": ", ".join(recipe.get("category", [])),
+                    "cuisine": str(recipe.get("cuisine", "")),
+                    "description": str(recipe.get("description", "")),
+                    "ingredients": ", ".join(recipe.get("ingredients", [])),
+                    "instructions": ", ".join(recipe.get("instructions", [])),
+                    "nutrients": json.dumps(recipe.get("nutrients", "")),
+                    "yields": str(recipe.get("yields", "")),
+                    "url": recipe.get("url", ""),
+                    "canonical_url": canonicalize_url(recipe.get("url", "")),
+                    "aliases": ", ".join(recipe.get("aliases", [])),
+                }
+
+                # Generate a unique ID based on the canonical recipe URL
+                identifier = recipe_id(recipe.get("url", ""))
+
+                if chunked:
+                    # One vector per chunk, pointing to its recipe
+                    for field, number, text in recipe_chunks(recipe):
+                        chunk_texts.append(text)
+                        chunk_metadata.append({"recipe_id": identifier, "field": field})
+                        chunk_ids.append(f"{identifier}-{field}-{number}")
+
+                # Concatenate recipe fields to form the full text input
+                batch_texts.append(recipe_text(recipe))
+                batch_metadata.append(metadata)
+                batch_ids.append(identifier)
+                batch_stale_ids.update(stale_ids(recipe))
+
+            # Clean the texts of the whole batch at once
+            batch_texts = preprocess_texts(batch_texts)
+            chunk_texts = preprocess_texts(chunk_texts)
+
+        # Generate embeddings for the current batch of recipes and their chunks
+        embeddings = np.asarray(cached_embeddings(batch_texts + chunk_texts))
+        batch_embeddings = embeddings[: len(batch_texts)]
+
+        # Insert batch data into the ChromaDB collection, replacing earlier ingests
+        with profiler.stage("db_add"):
+            batch_stale_ids -= set(batch_ids)
+            if batch_stale_ids:
+                collection.delete(ids=sorted(batch_stale_ids))
+            collection.upsert(
+                embeddings=batch_embeddings.tolist(),
+                documents=batch_texts,  # Store full text of each recipe
+                metadatas=batch_metadata,  # Store detailed metadata of each recipe
+                ids=batch_ids,  # Unique IDs for each recipe
             )
+            if chunked:
+                # Drop the old chunks, which may outnumber the new ones or belong to an
+                # alias's ID
+                chunk_collection.delete(
+                    where={
+                        "recipe_id": {"$in": sorted(batch_stale_ids | set(batch_ids))}
+                    }
+                )
+            if chunk_ids:
+                chunk_collection.upsert(
+                    embeddings=embeddings[len(batch_texts) :].tolist(),
+                    documents=chunk_texts,
+                    metadatas=chunk_metadata,
+                    ids=chunk_ids,
+                )
 
-        # Generate embeddings for the current batch of recipes
-        batch_embeddings = generate_embeddings(batch_texts)
+    # Invalidate memoized tool results that depend on the recipes collection
+    mark_ingest()
 
-        # Insert batch data into the ChromaDB collection
-        collection.add(
-            embeddings=batch_embeddings.tolist(),
-            documents=batch_texts,  # Store full text of each recipe
-            metadatas=batch_metadata,  # Store detailed metadata of each recipe
-            ids=batch_ids,  # Unique IDs for each recipe
-        )
+
+def load_file(filename, dedup=True, chunked=False):
+    """
+    Processes and loads data from a JSON file into the ChromaDB collection.
+
+    Parameters:
+    filename (str): The path to the JSON file to be processed.
+    dedup (bool): Whether to collapse duplicate recipes of the file first.
+    chunked (bool): Whether to also load the chunks of each recipe into the
+    recipe_chunks collection.
+    """
+    recipes = read_recipes(filename)
+    if dedup:
+        recipes = deduplicate_recipes(recipes)
+
+    load_recipes(recipes, filename, chunked)
 
     print(f"All recipes from {filename} inserted into the vector database.")
 
 
 # Main block for loading all JSON files in the specified directory
 if __name__ == "__main__":
-    files = os.listdir("./data/scraped_json/")
+    parser = argparse.ArgumentParser(
+        description="Load the scraped recipes into the vector database."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the wall time, CPU time and peak RSS of each ingest stage.",
+    )
+    parser.add_argument(
+        "--profile-dir", help="Directory for a cProfile dump of each stage."
+    )
+    parser.add_argument(
+        "--chunks",
+        action="store_true",
+        help="Also build the recipe_chunks index, with a vector per field and chunk of "
+        "each recipe pointing to its record in the recipes index. Queried when "
+        "MEALMATCH_RECIPE_INDEX is recipe_chunks.",
+    )
+    parser.add_argument(
+        "--store",
+        help="Read the recipes from a recipe store, built by src.recipe_store, instead "
+        "of the scraped JSON files.",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Load every scraped recipe, without collapsing duplicates.",
+    )
+    args = parser.parse_args()
+
+    profiler = StageProfiler(
+        enabled=args.profile or bool(args.profile_dir), profile_dir=args.profile_dir
+    )
+
+    if args.store:
+        with profiler.stage("read"):
+            recipes = RecipeStore(args.store).read()
+        if not args.no_dedup:
+            recipes = deduplicate_recipes(recipes)
+
+        load_recipes(recipes, args.store, chunked=args.chunks)
+
+        print(f"All recipes from {args.store} inserted into the vector database.")
+    elif args.no_dedup:
+        for file in os.listdir("./data/scraped_json/"):
+            load_file("./data/scraped_json/" + file, dedup=False, chunked=args.chunks)
+    else:
+        # Duplicates are found across the whole corpus, as sites syndicate each other
+        recipes = []
+        for file in os.listdir("./data/scraped_json/"):
+            recipes.extend(read_recipes("./data/scraped_json/" + file))
+
+        load_recipes(deduplicate_recipes(recipes), chunked=args.chunks)
+
+        print("All recipes inserted into the vector database.")
+
+    print(f"Embedding cache: {json.dumps(cached_embeddings.stats())}")
 
-    for file in files:
-        load_file("./data/scraped_json/" + file)
+    if profiler.enabled:
+        profiler.report()
+        profiler.dump()
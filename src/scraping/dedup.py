@@ -0,0 +1,282 @@
+import re
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import numpy as np
+from rapidfuzz import fuzz
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "source", "amp"}
+TRACKING_PREFIXES = ("utm_",)
+
+# Words of ingredient lines that do not identify the ingredient
+INGREDIENT_STOPWORDS = {
+    "a",
+    "and",
+    "or",
+    "of",
+    "to",
+    "for",
+    "the",
+    "cup",
+    "cups",
+    "tablespoon",
+    "tablespoons",
+    "tbsp",
+    "teaspoon",
+    "teaspoons",
+    "tsp",
+    "pound",
+    "pounds",
+    "lb",
+    "lbs",
+    "ounce",
+    "ounces",
+    "oz",
+    "g",
+    "ml",
+    "large",
+    "small",
+    "medium",
+    "chopped",
+    "diced",
+    "minced",
+    "sliced",
+    "fresh",
+    "optional",
+    "taste",
+}
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Largest 32-bit hash, and the Mersenne prime the MinHash permutations are taken modulo
+MAX_HASH = np.uint64((1 << 32) - 1)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a recipe URL so the same page under different URLs gets the same ID.
+
+    The scheme becomes https, the host is lowercased without "www.", tracking query
+    parameters, fragments and trailing slashes are dropped, and the remaining query
+    parameters are sorted.
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def ingredient_shingles(recipe: dict) -> set[str]:
+    """
+    Reduce a recipe's ingredients to the set of words naming them.
+
+    Args:
+        recipe (dict): The scraped recipe.
+
+    Returns:
+        set[str]: The ingredient words, without quantities, units and preparation.
+    """
+    return {
+        word
+        for ingredient in recipe.get("ingredients") or []
+        for word in WORD_PATTERN.findall(str(ingredient).lower())
+        if word not in INGREDIENT_STOPWORDS
+    }
+
+
+class MinHashLSH:
+    """
+    Finds recipes with similar ingredient sets without comparing every pair, by hashing
+    MinHash signatures band by band: sets sharing any band are candidate duplicates.
+    """
+
+    # Class attributes
+    num_perm: int
+    bands: int
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 0):
+        """
+        Initialize the MinHashLSH.
+
+        Args:
+            num_perm (int): The number of MinHash permutations of each signature.
+            bands (int): The number of bands the signatures are split into. More bands
+                find less similar candidates.
+            seed (int): Seed of the permutations.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._buckets = {}
+
+    def signature(self, shingles: set[str]) -> np.ndarray:
+        """
+        Compute the MinHash signature of a set.
+
+        Args:
+            shingles (set[str]): The set.
+
+        Returns:
+            np.ndarray: The minimum of each permutation over the set.
+        """
+        if not shingles:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # The hashes and coefficients are below 2**32, so each product fits in 64 bits,
+        # and reducing it before adding b keeps the sum below 2**62
+        products = np.outer(hashes, self._a) % MERSENNE_PRIME
+        permuted = (products + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+    def insert(self, key: int, shingles: set[str]) -> set[int]:
+        """
+        Index a set, returning the previously indexed sets sharing a band with it.
+
+        Args:
+            key (int): The key of the set.
+            shingles (set[str]): The set.
+
+        Returns:
+            set[int]: The keys of the candidate duplicates.
+        """
+        candidates = set()
+        if not shingles:
+            return candidates
+
+        rows = self.num_perm // self.bands
+        signature = self.signature(shingles)
+        for band in range(self.bands):
+            bucket = (band, signature[band * rows : (band + 1) * rows].tobytes())
+            members = self._buckets.setdefault(bucket, [])
+            candidates.update(members)
+            members.append(key)
+        return candidates
+
+
+def _completeness(recipe: dict) -> tuple[int, int]:
+    """
+    Rank the records of a duplicate group; the most complete one is kept.
+
+    Args:
+        recipe (dict): The scraped recipe.
+
+    Returns:
+        tuple[int, int]: The number of filled fields and the length of the instructions.
+    """
+    return (
+        sum(bool(value) for value in recipe.values()),
+        len(" ".join(map(str, recipe.get("instructions") or []))),
+    )
+
+
+def deduplicate(
+    recipes: list[dict],
+    threshold: float = 0.8,
+    title_threshold: float = 90.0,
+    num_perm: int = 128,
+    bands: int = 32,
+) -> tuple[list[dict], dict]:
+    """
+    Collapse duplicate recipes into one canonical record each.
+
+    Recipes with the same canonical URL are duplicates. So are recipes whose ingredient
+    sets have a Jaccard similarity of at least `threshold` and whose titles are similar,
+    which catches syndicated copies while keeping variations of a dish that share their
+    pantry ingredients. Each group keeps its most complete record, with its scraped URL
+    unchanged, its canonical URL in "canonical_url" and the other scraped URLs of the
+    group listed in "aliases".
+
+    Args:
+        recipes (list[dict]): The scraped recipes.
+        threshold (float): Min Jaccard similarity of the ingredient sets of duplicates.
+        title_threshold (float): Min fuzzy token-sort similarity (0-100) of their titles.
+        num_perm (int): The number of MinHash permutations.
+        bands (int): The number of LSH bands.
+
+    Returns:
+        tuple[list[dict], dict]: The canonical records, in the order of their first
+            occurrence, and the counts of input records, URL duplicates and near
+            duplicates.
+    """
+    parent = list(range(len(recipes)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(first: int, second: int):
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    urls = [canonicalize_url(recipe.get("url", "")) for recipe in recipes]
+    first_by_url = {}
+    url_duplicates = 0
+    for index, url in enumerate(urls):
+        if url in first_by_url:
+            union(first_by_url[url], index)
+            url_duplicates += 1
+        else:
+            first_by_url[url] = index
+
+    lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+    near_duplicates = 0
+    shingles = {}
+    for index in first_by_url.values():
+        shingles[index] = ingredient_shingles(recipes[index])
+        for candidate in lsh.insert(index, shingles[index]):
+            if find(candidate) == find(index):
+                continue
+            overlap = len(shingles[index] & shingles[candidate])
+            jaccard = overlap / len(shingles[index] | shingles[candidate])
+            title_similarity = fuzz.token_sort_ratio(
+                str(recipes[index].get("title", "")).lower(),
+                str(recipes[candidate].get("title", "")).lower(),
+            )
+            if jaccard >= threshold and title_similarity >= title_threshold:
+                union(candidate, index)
+                near_duplicates += 1
+
+    groups = {}
+    for index in range(len(recipes)):
+        groups.setdefault(find(index), []).append(index)
+
+    canonical = []
+    for members in groups.values():
+        kept = max(members, key=lambda index: _completeness(recipes[index]))
+        url = recipes[kept].get("url", "")
+        aliases = sorted({recipes[index].get("url", "") for index in members} - {url})
+        canonical.append(
+            {**recipes[kept], "canonical_url": urls[kept], "aliases": aliases}
+        )
+
+    return canonical, {
+        "records": len(recipes),
+        "canonical": len(canonical),
+        "url_duplicates": url_duplicates,
+        "near_duplicates": near_duplicates,
+    }
@@ -0,0 +1,72 @@
+import string
+
+# Punctuation removed from the embedded text. The regex preprocessing used to build from
+# string.punctuation read its "\]" as an escaped bracket, so backslashes were never
+# removed; they are kept so the ingested text stays identical.
+REMOVED_PUNCTUATION = string.punctuation.replace("\\", "").encode("ascii")
+
+# Lowercases ASCII bytes, and turns the ASCII separators str.split treats as whitespace
+# into spaces, as bytes.split does not
+ASCII_TABLE = bytes.maketrans(
+    string.ascii_uppercase.encode("ascii") + b"\x1c\x1d\x1e\x1f",
+    string.ascii_lowercase.encode("ascii") + b"    ",
+)
+
+
+def preprocess_text(text):
+    """
+    Preprocesses the input text by converting it to lowercase, removing special characters and punctuation,
+    and removing extra whitespace.
+
+    ASCII text is processed as bytes, lowercased and stripped of punctuation by a single
+    translation table. Other text is lowercased as a string, then stripped of punctuation
+    as UTF-8 bytes, which is safe as ASCII bytes never occur inside multi-byte characters.
+
+    Parameters:
+    text (str): The input text to be cleaned.
+
+    Returns:
+    str: The preprocessed text.
+    """
+    if text.isascii():
+        return b" ".join(
+            text.encode("ascii").translate(ASCII_TABLE, REMOVED_PUNCTUATION).split()
+        ).decode("ascii")
+
+    text = text.lower().encode("utf-8").translate(None, REMOVED_PUNCTUATION)
+    return " ".join(text.decode("utf-8").split())
+
+
+def preprocess_texts(texts):
+    """
+    Preprocesses a batch of texts, see preprocess_text.
+
+    Parameters:
+    texts (list of str): The input texts to be cleaned.
+
+    Returns:
+    list of str: The preprocessed texts.
+    """
+    return [preprocess_text(text) for text in texts]
+
+
+def recipe_text(recipe):
+    """
+    Concatenates the fields of a recipe embedded by the recipes index into one text.
+
+    Parameters:
+    recipe (dict): The recipe.
+
+    Returns:
+    str: The title, description, ingredients, instructions, cuisine and category.
+    """
+    return " ".join(
+        [
+            str(recipe.get("title", "")),
+            str(recipe.get("description", "")),
+            *recipe.get("ingredients", []),
+            *recipe.get("instructions", []),
+            str(recipe.get("cuisine", "")),
+            *recipe.get("category", []),
+        ]
+    )
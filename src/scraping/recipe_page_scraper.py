@@ -1,9 +1,15 @@
+import argparse
 import json
 import asyncio
 import os
 from aiohttp import ClientSession
 from recipe_scrapers import scrape_html
 from tqdm.asyncio import tqdm
+from src.instrumentation import instrumentation
+from src.profiling import StageProfiler
+
+# Records the time spent in each scraping stage; enabled by the --profile flag
+profiler = StageProfiler(enabled=False)
 
 
 async def fetch_and_scrape(link, session):
@@ -18,29 +24,34 @@ async def fetch_and_scrape(link, session):
     dict: A dictionary containing the scraped recipe data or an error message.
     """
     try:
-        async with session.get(link, timeout=10) as response:
-            if response.status == 200:
+        # Fetches await the network, so they are timed but not profiled
+        with instrumentation.span("scrape.fetch", url=link), profiler.stage(
+            "fetch", profile=False
+        ):
+            async with session.get(link, timeout=10) as response:
+                if response.status != 200:
+                    print(response)
+                    return {"error": f"HTTP {response.status}", "attempted_url": link}
                 content = await response.read()
-                recipe = scrape_html(content, org_url=link)
-                recipe_dict = recipe.to_json()
-
-                return {
-                    "prep_time": recipe_dict.get("prep_time"),
-                    "cook_time": recipe_dict.get("cook_time"),
-                    "total_time": recipe_dict.get("total_time"),
-                    "title": recipe_dict.get("title", ""),
-                    "category": str(recipe_dict.get("category")).split(","),
-                    "cuisine": recipe_dict.get("cuisine", ""),
-                    "description": recipe_dict.get("description", ""),
-                    "ingredients": recipe_dict.get("ingredients", []),
-                    "instructions": recipe_dict.get("instructions_list", []),
-                    "nutrients": recipe_dict.get("nutrients", ""),
-                    "yields": recipe_dict.get("yields", ""),
-                    "url": link,
-                }
-            else:
-                print(response)
-                return {"error": f"HTTP {response.status}", "attempted_url": link}
+
+        with profiler.stage("parse"):
+            recipe = scrape_html(content, org_url=link)
+            recipe_dict = recipe.to_json()
+
+        return {
+            "prep_time": recipe_dict.get("prep_time"),
+            "cook_time": recipe_dict.get("cook_time"),
+            "total_time": recipe_dict.get("total_time"),
+            "title": recipe_dict.get("title", ""),
+            "category": str(recipe_dict.get("category")).split(","),
+            "cuisine": recipe_dict.get("cuisine", ""),
+            "description": recipe_dict.get("description", ""),
+            "ingredients": recipe_dict.get("ingredients", []),
+            "instructions": recipe_dict.get("instructions_list", []),
+            "nutrients": recipe_dict.get("nutrients", ""),
+            "yields": recipe_dict.get("yields", ""),
+            "url": link,
+        }
     except Exception as e:
         return {"error": str(e), "attempted_url": link}
 
@@ -88,11 +99,28 @@ async def main(link_file, output_file):
     recipe_infos = await scrape_all_links(links, batch_size=batch_size)
 
     # Save results
-    with open("./data/scraped_json/" + output_file, "w") as f:
+    with profiler.stage("write"), open("./data/scraped_json/" + output_file, "w") as f:
         json.dump(recipe_infos, f, indent=4)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scrape the recipes of the link files."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the wall time, CPU time and peak RSS of each scraping stage.",
+    )
+    parser.add_argument(
+        "--profile-dir", help="Directory for a cProfile dump of each stage."
+    )
+    args = parser.parse_args()
+
+    profiler = StageProfiler(
+        enabled=args.profile or bool(args.profile_dir), profile_dir=args.profile_dir
+    )
+
     # Loop through all link files in the directory and run the scraping process for each
     link_files = os.listdir("./data/scraped_links/")
 
@@ -100,3 +128,7 @@ if __name__ == "__main__":
         output_file = f"{link_file.split('.')[0]}.json"
 
         asyncio.run(main("./data/scraped_links/" + link_file, output_file))
+
+    if profiler.enabled:
+        profiler.report()
+        profiler.dump()
@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel
+from src.agent_factory import CONCURRENCY_LIMIT, QUEUE_SIZE, create_recipe_agent
+from src.agents import EvaluationAgent
+from src.datatypes import AgentResponse, StreamingTextResponse, TextResponse
+from src.embeddings import get_embedding_function
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Seconds a client rejected because the queue is full should wait before retrying
+RETRY_AFTER = 1
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request arrives while the request queue is full.
+    """
+
+    pass
+
+
+class RequestLimiter:
+    """
+    Bounds the requests processed concurrently, queueing a limited number of others, so
+    a burst of traffic is rejected early instead of piling up behind the LLM.
+    """
+
+    # Class attributes
+    concurrency: int
+    queue_size: int
+    active: int
+    waiting: int
+    rejected: int
+
+    def __init__(
+        self, concurrency: int = CONCURRENCY_LIMIT, queue_size: int = QUEUE_SIZE
+    ):
+        """
+        Initialize the RequestLimiter.
+
+        Args:
+            concurrency (int): Max requests processed at once.
+            queue_size (int): Max requests waiting for a slot; more are rejected.
+        """
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold a processing slot for the duration of a request.
+
+        Raises:
+            Overloaded: If every slot is taken and the queue is full.
+        """
+        if self.overloaded():
+            self.rejected += 1
+            raise Overloaded()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def overloaded(self) -> bool:
+        """
+        Check whether a new request would be rejected.
+
+        Returns:
+            bool: True if every slot is taken and the queue is full.
+        """
+        return self._semaphore.locked() and self.waiting >= self.queue_size
+
+    def stats(self) -> dict:
+        """
+        Report the limiter's load.
+
+        Returns:
+            dict: The limits, and the active, waiting and rejected requests.
+        """
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class ChatRequest(BaseModel):
+    """
+    A user message for the recipe agent. Without a session ID, a new session is started
+    and its ID returned.
+    """
+
+    message: str
+    session_id: str | None = None
+    add_to_memory: bool = True
+
+
+class QueryRequest(BaseModel):
+    """
+    A query of the recipes vector store.
+    """
+
+    query: str
+    n_results: int = 1
+
+
+class SubstitutionRequest(BaseModel):
+    """
+    Ingredients to find substitutions for.
+    """
+
+    to_replace: list[str]
+
+
+class EvaluationItem(BaseModel):
+    """
+    A recipe with the criteria it must meet.
+    """
+
+    recipe: str
+    criteria: str
+
+
+class EvaluationBatchRequest(BaseModel):
+    """
+    Recipes to evaluate against their criteria.
+    """
+
+    items: list[EvaluationItem]
+
+
+def serialize_step(step: AgentResponse) -> dict:
+    """
+    Convert an agent step to JSON.
+
+    Args:
+        step (AgentResponse): The step.
+
+    Returns:
+        dict: The step's fields, with its class name as "type".
+    """
+    return {"type": type(step).__name__, **dataclasses.asdict(step)}
+
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Format a server-sent event.
+
+    Args:
+        event (str): The event type.
+        data (dict): The event data, sent as JSON.
+
+    Returns:
+        str: The event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Create the agents and request limiter when the server starts.
+
+    Args:
+        app (FastAPI): The application.
+    """
+    app.state.recipe_agent = create_recipe_agent(
+        AsyncOpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY"))
+    )
+    app.state.eval_agent = EvaluationAgent(
+        OpenAI(base_url=os.getenv("URL"), api_key=os.getenv("KEY")),
+        max_workers=int(os.getenv("EVALUATION_WORKERS", "8")),
+    )
+    app.state.limiter = RequestLimiter()
+    yield
+
+
+# The agent backend shared by the GUI workers and other clients
+app = FastAPI(title="MealMatch", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Too many requests are queued; retry shortly."},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER)},
+    )
+
+
+@app.get("/health")
+async def health(request: Request) -> dict:
+    """
+    Report that the backend is up, with its load and embedding cache hit rate.
+    """
+    return {
+        "status": "ok",
+        "requests": request.app.state.limiter.stats(),
+        "embedding_cache": get_embedding_function().stats(),
+    }
+
+
+@app.post("/chat")
+async def chat(body: ChatRequest, request: Request) -> dict:
+    """
+    Answer a user message in a session's conversation.
+    """
+    session_id = body.session_id or uuid.uuid4().hex
+    async with request.app.state.limiter.slot():
+        response, steps = await request.app.state.recipe_agent.say(
+            body.message, add_to_memory=body.add_to_memory, session_id=session_id
+        )
+    return {
+        "session_id": session_id,
+        "response": response.text,
+        "steps": [serialize_step(s) for s in steps],
+    }
+
+
+@app.post("/chat/stream")
+async def chat_stream(body: ChatRequest, request: Request) -> StreamingResponse:
+    """
+    Answer a user message in a session's conversation, streaming server-sent events:
+    "session" with the session ID, "delta" with text appended to the draft, "draft" with
+    the whole draft when it was rewritten, "tool" for each tool step, and "response"
+    with the final response, or "error" if the turn failed.
+    """
+    limiter = request.app.state.limiter
+    recipe_agent = request.app.state.recipe_agent
+    session_id = body.session_id or uuid.uuid4().hex
+
+    # Reject before the stream starts, so overloaded clients get a 503
+    if limiter.overloaded():
+        raise Overloaded()
+
+    async def events() -> AsyncIterator[str]:
+        yield sse_event("session", {"session_id": session_id})
+        draft = ""
+        try:
+            async with limiter.slot():
+                async for step in recipe_agent.say_stream(
+                    body.message,
+                    add_to_memory=body.add_to_memory,
+                    session_id=session_id,
+                ):
+                    if isinstance(step, StreamingTextResponse):
+                        if step.text.startswith(draft):
+                            yield sse_event("delta", {"text": step.text[len(draft) :]})
+                        else:
+                            yield sse_event("draft", {"text": step.text})
+                        draft = step.text
+                    elif isinstance(step, TextResponse):
+                        yield sse_event("response", {"text": step.text})
+                    else:
+                        yield sse_event("tool", serialize_step(step))
+        except Overloaded:
+            yield sse_event("error", {"detail": "Too many requests are queued."})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Session-ID": session_id},
+    )
+
+
+async def call_tool(request: Request, name: str, arguments: dict) -> dict:
+    """
+    Call one of the agent's tools.
+
+    Args:
+        request (Request): The API request.
+        name (str): The name of the tool.
+        arguments (dict): The arguments of the call.
+
+    Returns:
+        dict: The tool's result and the seconds the call took.
+    """
+    async with request.app.state.limiter.slot():
+        step = await request.app.state.recipe_agent.call_tool(name, arguments)
+    if isinstance(step.tool_result, dict) and "error" in step.tool_result:
+        raise HTTPException(status_code=502, detail=step.tool_result["error"])
+    return {"result": step.tool_result, "duration": step.duration}
+
+
+@app.post("/tools/query_vectordb")
+async def query_vectordb(body: QueryRequest, request: Request) -> dict:
+    """
+    Search the recipes vector store.
+    """
+    return await call_tool(request, "query_vectordb", body.model_dump())
+
+
+@app.post("/tools/substitution_filter")
+async def substitution_filter(body: SubstitutionRequest, request: Request) -> dict:
+    """
+    Find substitutions for ingredients.
+    """
+    return await call_tool(request, "substitution_filter", body.model_dump())
+
+
+@app.post("/evaluate/batch")
+async def evaluate_batch(body: EvaluationBatchRequest, request: Request) -> dict:
+    """
+    Evaluate whether each recipe meets its criteria.
+    """
+    async with request.app.state.limiter.slot():
+        results = await asyncio.to_thread(
+            request.app.state.eval_agent.evaluate_batch,
+            [(item.recipe, item.criteria) for item in body.items],
+        )
+    return {"results": [dataclasses.asdict(result) for result in results]}
+
+
+# Serve the agent backend
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the MealMatch agent backend.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WORKERS", "1")),
+        help="Server processes, to scale past one process's GIL. Each loads its own "
+        "embedding model and keeps its own sessions, caches and request limits; "
+        "requires CHROMA_HOST so they share the vector store.",
+    )
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        # One process holds the sessions, caches and vector store clients; it is async,
+        # so it serves many concurrent turns while tools run on its worker pool
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        # Workers share recipes and memories through the ChromaDB server, but not the
+        # conversation in the prompt, so a follow-up turn served by another worker only
+        # recalls the session's earlier answers through access_memory
+        if not os.getenv("CHROMA_HOST"):
+            parser.error("--workers > 1 requires CHROMA_HOST to share the vector store")
+        uvicorn.run(
+            "src.server:app", host=args.host, port=args.port, workers=args.workers
+        )
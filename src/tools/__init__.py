@@ -1,12 +1,16 @@
 # Importing modules to make them accessible from the package
 from src.tools.access_memory import access_memory
+from src.tools.descriptions import TOOL_DESCRIPTIONS
 from src.tools.query_vectordb import query_vectordb
 from src.tools.scrape_web_recipe import scrape_web_recipe
 from src.tools.substitution_filter import substitution_filter
+from src.tools.tool_cache import ToolResultCache
 
 __all__ = [
     "access_memory",
     "query_vectordb",
     "scrape_web_recipe",
     "substitution_filter",
+    "ToolResultCache",
+    "TOOL_DESCRIPTIONS",
 ]
@@ -0,0 +1,46 @@
+from src.datatypes import ToolDescription
+from src.tools.access_memory import access_memory
+from src.tools.query_vectordb import query_vectordb
+from src.tools.scrape_web_recipe import scrape_web_recipe
+from src.tools.substitution_filter import substitution_filter
+
+# Tools available to the RecipeAgent, shared by the GUI and the benchmarks
+TOOL_DESCRIPTIONS = [
+    ToolDescription(
+        name="query_vectordb",
+        signature="query_vectordb(query: str, n_results=1)",
+        description="This function searches a vector database for recipes similar to the query argument.",
+        example_json='Call query_vectordb:\n```json\n{\n"query": "banana bread recipe"\n}\n```',
+        function=query_vectordb,
+        cache_ttl=3600.0,
+        invalidate_on_ingest=True,
+    ),
+    ToolDescription(
+        name="substitution_filter",
+        signature="substitution_filter(to_replace: list[str])",
+        description=(
+            "This function searches for ingredient alternatives based on a list of ingredients to be substituted."
+            " Only the ingredients to substitute should be provided as arguments."
+        ),
+        example_json='Call substitution_filter:\n```json\n{\n"to_replace": ["eggs", "flour"]\n}\n```',
+        function=substitution_filter,
+        cache_ttl=86400.0,
+    ),
+    ToolDescription(
+        name="scrape_web_recipe",
+        signature="scrape_web_recipe(link: str)",
+        description="This function scrapes the recipe at the provided link. Use when a user provides a recipe link.",
+        example_json='Call scrape_web_recipe:\n```json\n{\n"link": "https://www.allrecipes.com/lemon-garlic-butter"\n}\n```',
+        function=scrape_web_recipe,
+        timeout=20.0,
+        cache_ttl=300.0,
+    ),
+    ToolDescription(
+        name="access_memory",
+        signature="access_memory(query: str, n_results=1)",
+        description="This function retrieves the most similar previous agent-user conversation for context.",
+        example_json='Call access_memory:\n```json\n{\n"query": "eggless banana bread recipe"\n}\n```',
+        function=access_memory,
+        session_scoped=True,
+    ),
+]
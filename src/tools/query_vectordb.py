@@ -1,11 +1,85 @@
-import chromadb
 import os
+from typing import Any
+from src.database import get_database
+from src.embeddings import get_embedding_function
+from src.instrumentation import instrumentation
 
-# Get the project root directory
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+# The ChromaDB client, local or shared through a ChromaDB server
+database = get_database()
 
-# Initialize a persistent ChromaDB client to store agent memory
-database = chromadb.PersistentClient(path=f"{project_root}/chromadb")
+# Embeds queries, reusing the embeddings of repeated queries
+embedding_function = get_embedding_function()
+
+# The recipes index queried: "recipes", with one vector per recipe, or "recipe_chunks",
+# with a vector per field and chunk of each recipe (built by create_db --chunks)
+RECIPE_INDEX = os.getenv("MEALMATCH_RECIPE_INDEX", "recipes")
+
+# How the chunk matches of a recipe are scored: "max", the best chunk, or "weighted", a
+# weighted sum of the best chunk of each field
+CHUNK_AGGREGATION = os.getenv("MEALMATCH_CHUNK_AGGREGATION", "max")
+
+# Weight of each field's best chunk in the weighted score
+FIELD_WEIGHTS = {"summary": 0.4, "ingredients": 0.4, "instructions": 0.2}
+
+# Chunks fetched per requested recipe, as several chunks of one recipe often match
+CHUNK_OVERFETCH = 8
+
+
+def aggregate_chunks(
+    metadatas: list[dict],
+    distances: list[float],
+    n_results: int,
+    aggregation: str = CHUNK_AGGREGATION,
+) -> list[str]:
+    """
+    Rank the recipes of the chunks matching a query.
+
+    Args:
+        metadatas (list[dict]): The metadata of the matching chunks, with the ID of
+            their recipe and the field they were cut from.
+        distances (list[float]): The distance of each chunk to the query.
+        n_results (int): The number of recipes to return.
+        aggregation (str): "max" or "weighted", see CHUNK_AGGREGATION.
+
+    Returns:
+        list[str]: The IDs of the best scoring recipes, best first.
+    """
+    if aggregation not in ("max", "weighted"):
+        raise ValueError(f"Unknown chunk aggregation: {aggregation}")
+
+    best = {}
+    for metadata, distance in zip(metadatas, distances):
+        key = (metadata["recipe_id"], metadata["field"])
+        best[key] = max(best.get(key, 0.0), 1 / (1 + distance))
+
+    scores = {}
+    for (recipe_id, field), similarity in best.items():
+        if aggregation == "max":
+            scores[recipe_id] = max(scores.get(recipe_id, 0.0), similarity)
+        else:
+            scores[recipe_id] = (
+                scores.get(recipe_id, 0.0) + FIELD_WEIGHTS.get(field, 0.0) * similarity
+            )
+
+    return sorted(scores, key=lambda recipe_id: -scores[recipe_id])[:n_results]
+
+
+def get_recipes(collection: Any, ids: list[str]) -> list[dict]:
+    """
+    Read the metadata of recipes by ID, keeping the order of the IDs.
+
+    Args:
+        collection (Any): The recipes collection.
+        ids (list[str]): The recipe IDs.
+
+    Returns:
+        list[dict]: The metadata of each recipe found.
+    """
+    if not ids:
+        return []
+    found = collection.get(ids=ids, include=["metadatas"])
+    metadatas = dict(zip(found["ids"], found["metadatas"]))
+    return [metadatas[id] for id in ids if id in metadatas]
 
 
 def query_vectordb(query: str, n_results: int = 1) -> list[dict]:
@@ -19,14 +93,31 @@ def query_vectordb(query: str, n_results: int = 1) -> list[dict]:
     Returns:
         list[dict]: A list of metadata dictionaries for the matching entries.
     """
-    # Get or create a 'recipes' collection in the vector database
-    collection = database.get_or_create_collection(name="recipes")
+    # Get or create the recipes collection in the vector database
+    collection = database.get_or_create_collection(name=RECIPE_INDEX)
+    query_embeddings = embedding_function([query])
+
+    if RECIPE_INDEX == "recipe_chunks":
+        with instrumentation.span("vectordb.query", collection=RECIPE_INDEX):
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results * CHUNK_OVERFETCH,
+                include=["metadatas", "distances"],
+            )
+
+        # Score each recipe from its matching chunks, then read the best recipes
+        recipes = database.get_or_create_collection(name="recipes")
+        return [
+            get_recipes(recipes, aggregate_chunks(metadatas, distances, n_results))
+            for metadatas, distances in zip(results["metadatas"], results["distances"])
+        ]
 
     # Query the collection for the top `n_results` matching the query
-    results = collection.query(
-        query_texts=[query],
-        n_results=n_results,
-    )
+    with instrumentation.span("vectordb.query", collection=RECIPE_INDEX):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+        )
 
     # Return the metadata of the matched entries
     return results["metadatas"]
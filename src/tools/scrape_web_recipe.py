@@ -1,5 +1,9 @@
 from recipe_scrapers import scrape_html
 import requests
+from src.instrumentation import instrumentation
+
+# Seconds to wait for the recipe page before giving up
+REQUEST_TIMEOUT = 15
 
 
 def scrape_web_recipe(link: str) -> dict:
@@ -14,7 +18,9 @@ def scrape_web_recipe(link: str) -> dict:
     """
     try:
         # Send a GET request to the recipe page
-        response = requests.get(link)
+        with instrumentation.span("scrape.fetch", url=link) as span:
+            response = requests.get(link, timeout=REQUEST_TIMEOUT)
+            span.set(status=response.status_code)
 
         # Check if the request was successful
         if response.status_code == 200:
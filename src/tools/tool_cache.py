@@ -0,0 +1,146 @@
+import inspect
+import json
+import os
+from typing import Any
+from src.cache import TTLCache
+from src.datatypes import ToolDescription
+from src.instrumentation import instrumentation
+
+# Get the project root directory
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+# File touched by create_db after each ingest; its modification time versions the data
+INGEST_MARKER_PATH = os.path.join(project_root, "chromadb", "ingest_version")
+
+# Sentinel returned by ToolResultCache.get on a miss
+MISS = object()
+
+
+def mark_ingest():
+    """
+    Record that new data was ingested, invalidating memoized results of tools that
+    depend on it.
+    """
+    os.makedirs(os.path.dirname(INGEST_MARKER_PATH), exist_ok=True)
+    with open(INGEST_MARKER_PATH, "a"):
+        pass
+    os.utime(INGEST_MARKER_PATH)
+
+
+def ingest_version() -> int:
+    """
+    Get the version of the ingested data.
+
+    Returns:
+        int: The modification time of the ingest marker in nanoseconds, or 0 if none.
+    """
+    try:
+        return os.stat(INGEST_MARKER_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+class ToolResultCache:
+    """
+    Memoizes tool results across turns and sessions, keyed on the tool name and its
+    canonicalized arguments. Each tool declares its own policy through
+    ToolDescription.cache_ttl and ToolDescription.invalidate_on_ingest.
+    """
+
+    # Class attributes
+    entries: TTLCache
+
+    def __init__(self, max_size: int = 4096):
+        """
+        Initialize the ToolResultCache.
+
+        Args:
+            max_size (int): Max number of memoized results; the least recently used is evicted first.
+        """
+        self.entries = TTLCache(max_size=max_size)
+
+    @staticmethod
+    def key(tool: ToolDescription, arguments: dict) -> tuple[str, str, int]:
+        """
+        Build the cache key of a tool call.
+
+        Arguments are bound to the function signature with defaults applied, so
+        `{"query": "x"}` and `{"query": "x", "n_results": 1}` share an entry.
+
+        Args:
+            tool (ToolDescription): The tool being called.
+            arguments (dict): The arguments of the call.
+
+        Returns:
+            tuple[str, str, int]: The tool name, canonical JSON arguments and the ingest
+                version the result depends on.
+        """
+        try:
+            bound = inspect.signature(tool.function).bind(**arguments)
+            bound.apply_defaults()
+            arguments = bound.arguments
+        except (TypeError, ValueError):
+            pass
+
+        version = ingest_version() if tool.invalidate_on_ingest else 0
+        return tool.name, json.dumps(arguments, sort_keys=True, default=str), version
+
+    def get(self, tool: ToolDescription, arguments: dict) -> Any:
+        """
+        Get the memoized result of a tool call.
+
+        Args:
+            tool (ToolDescription): The tool being called.
+            arguments (dict): The arguments of the call.
+
+        Returns:
+            Any: The memoized result, or MISS.
+        """
+        if tool.cache_ttl is None:
+            return MISS
+        return self.entries.get(self.key(tool, arguments), MISS)
+
+    def set(self, tool: ToolDescription, arguments: dict, result: Any):
+        """
+        Memoize the result of a tool call, unless the tool is not cacheable or failed.
+
+        Args:
+            tool (ToolDescription): The tool that was called.
+            arguments (dict): The arguments of the call.
+            result (Any): The result of the call.
+        """
+        if tool.cache_ttl is None or (isinstance(result, dict) and "error" in result):
+            return
+        self.entries.set(self.key(tool, arguments), result, ttl=tool.cache_ttl)
+
+    def call(self, tool: ToolDescription, arguments: dict) -> Any:
+        """
+        Call a tool, reusing its memoized result when available.
+
+        Args:
+            tool (ToolDescription): The tool to call.
+            arguments (dict): The arguments of the call.
+
+        Returns:
+            Any: The tool's result.
+        """
+        result = self.get(tool, arguments)
+        if tool.cache_ttl is not None:
+            instrumentation.count(
+                "cache_lookups",
+                cache="tool",
+                result="miss" if result is MISS else "hit",
+            )
+        if result is MISS:
+            result = tool.function(**arguments)
+            self.set(tool, arguments, result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Report the cache's size and hit rate.
+
+        Returns:
+            dict: The number of memoized results, hits, misses, evictions and the hit rate.
+        """
+        return self.entries.stats()
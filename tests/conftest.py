@@ -0,0 +1,7 @@
+import functools
+import chromadb
+import src.database
+
+# Modules open the database on import; tests use an in-memory one instead of the
+# project's chromadb directory
+src.database.get_database = functools.cache(chromadb.EphemeralClient)
@@ -0,0 +1,69 @@
+import zlib
+import pytest
+from src.recipe_store import recipe_id
+from src.scraping.dedup import MERSENNE_PRIME, MinHashLSH, canonicalize_url, deduplicate
+
+
+def recipe(url: str, title: str = "Banana Bread", **fields) -> dict:
+    return {
+        "url": url,
+        "title": title,
+        "ingredients": ["3 bananas", "2 cups flour"],
+        **fields,
+    }
+
+
+def test_tracking_and_www_variants_share_an_id():
+    urls = [
+        "https://www.example.com/banana-bread/",
+        "http://example.com/banana-bread?utm_source=feed",
+        "https://Example.com/banana-bread#comments",
+    ]
+
+    assert len({canonicalize_url(url) for url in urls}) == 1
+    assert len({recipe_id(url) for url in urls}) == 1
+
+
+def test_deduplicate_keeps_one_record_per_id_with_aliases():
+    recipes = [
+        recipe("https://example.com/banana-bread"),
+        recipe("https://www.example.com/banana-bread?ref=home", description="Moist"),
+        recipe("https://example.com/pancakes", title="Pancakes", ingredients=["eggs"]),
+    ]
+
+    canonical, stats = deduplicate(recipes)
+
+    assert len({recipe_id(r["url"]) for r in canonical}) == len(canonical) == 2
+    assert stats["url_duplicates"] == 1
+    kept = next(r for r in canonical if r["title"] == "Banana Bread")
+    assert kept["url"] == recipes[1]["url"]
+    assert kept["aliases"] == [recipes[0]["url"]]
+
+
+def test_minhash_matches_exact_arithmetic():
+    lsh = MinHashLSH(num_perm=8, bands=2)
+    shingles = {"banana", "flour", "walnuts"}
+
+    expected = [
+        min(
+            (zlib.crc32(s.encode("utf-8")) * int(a) + int(b)) % int(MERSENNE_PRIME)
+            & 0xFFFFFFFF
+            for s in shingles
+        )
+        for a, b in zip(lsh._a, lsh._b)
+    ]
+
+    assert lsh.signature(shingles).tolist() == expected
+
+
+def test_unique_recipes_collapses_ids_without_dedup():
+    create_db = pytest.importorskip("src.scraping.create_db", exc_type=ImportError)
+    recipes = [
+        recipe("https://example.com/banana-bread"),
+        recipe("https://www.example.com/banana-bread/"),
+    ]
+
+    unique = create_db.unique_recipes(recipes)
+
+    assert len(unique) == 1
+    assert unique[0]["aliases"] == ["https://www.example.com/banana-bread/"]
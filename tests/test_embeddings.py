@@ -0,0 +1,58 @@
+import hashlib
+import multiprocessing
+import os
+import numpy as np
+from src.embeddings import DiskEmbeddingStore
+
+
+def key(i: int) -> bytes:
+    return hashlib.sha256(str(i).encode("utf-8")).digest()
+
+
+def vector(i: int) -> np.ndarray:
+    return np.full(8, i, dtype=np.float32)
+
+
+def append_embeddings(path: str, seed: int):
+    store = DiskEmbeddingStore(path)
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        ids = rng.choice(200, 5, replace=False)
+        store.put([key(i) for i in ids], np.stack([vector(i) for i in ids]))
+
+
+def test_concurrent_appends_keep_keys_and_vectors_aligned(tmp_path):
+    path = str(tmp_path)
+    reader = DiskEmbeddingStore(path)
+    processes = [
+        multiprocessing.Process(target=append_embeddings, args=(path, seed))
+        for seed in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    found = reader.get([key(i) for i in range(200)])
+
+    assert found
+    for i in range(200):
+        if key(i) in found:
+            np.testing.assert_array_equal(found[key(i)], vector(i))
+    rows = os.path.getsize(tmp_path / "keys.bin") // 32
+    assert rows == len(found)
+    assert os.path.getsize(tmp_path / "vectors.f32") == rows * 8 * 4
+
+
+def test_interrupted_append_is_repaired(tmp_path):
+    store = DiskEmbeddingStore(str(tmp_path))
+    store.put([key(0)], vector(0)[None])
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 20)
+
+    DiskEmbeddingStore(str(tmp_path)).put([key(1)], vector(1)[None])
+    found = DiskEmbeddingStore(str(tmp_path)).get([key(0), key(1)])
+
+    np.testing.assert_array_equal(found[key(0)], vector(0))
+    np.testing.assert_array_equal(found[key(1)], vector(1))
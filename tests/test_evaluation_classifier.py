@@ -0,0 +1,21 @@
+from src.agents.evaluation_classifier import VIOLATING_INGREDIENTS, synthesize_examples
+
+
+def example(request: str) -> dict:
+    return {"request": request, "recipe": "Ingredients: rice, beans", "answer": "Yes"}
+
+
+def test_vegetarian_requests_get_meat_violations():
+    synthetic = synthesize_examples([example("A vegetarian chili")])
+
+    assert len(synthetic) == 1
+    assert synthetic[0]["answer"] == "No"
+    assert any(
+        meat in synthetic[0]["recipe"] for meat in VIOLATING_INGREDIENTS["vegetarian"]
+    )
+
+
+def test_only_negated_restrictions_get_violations():
+    assert synthesize_examples([example("Cookies with extra sugar")]) == []
+    assert len(synthesize_examples([example("Cookies without sugar")])) == 1
+    assert len(synthesize_examples([example("Dairy-free cookies")])) == 1
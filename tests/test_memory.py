@@ -0,0 +1,49 @@
+import time
+from src.memory import MemoryWriter
+
+
+class RecordingStore:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def add_batch(self, batch: list[tuple[str, str]]):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(batch)
+
+
+def test_flush_writes_without_waiting_for_the_interval():
+    store = RecordingStore()
+    writer = MemoryWriter(store, batch_size=32, flush_interval=10.0)
+    writer.put("a", "banana bread")
+
+    start = time.monotonic()
+    writer.flush("a")
+
+    assert time.monotonic() - start < 1.0
+    assert store.batches == [[("a", "banana bread")]]
+    writer.close()
+
+
+def test_flush_all_sessions():
+    store = RecordingStore()
+    writer = MemoryWriter(store, batch_size=32, flush_interval=10.0)
+    writer.put("a", "x")
+    writer.put("b", "y")
+
+    start = time.monotonic()
+    writer.flush()
+
+    assert time.monotonic() - start < 1.0
+    assert writer.written == 2
+    writer.close()
+
+
+def test_failed_batches_are_dropped_and_counted():
+    writer = MemoryWriter(RecordingStore(fail=True), flush_interval=10.0)
+    writer.put("a", "x")
+    writer.flush("a")
+
+    assert writer.failed == 1
+    writer.close()
@@ -0,0 +1,82 @@
+import types
+import numpy as np
+import src.agents.response_cache
+from src.agents import RecipeAgent, SemanticResponseCache
+from src.datatypes import TextResponse
+
+
+def constant_embedding(texts: list[str]) -> list[np.ndarray]:
+    # Every query embeds the same, the worst case for telling queries apart
+    return [np.ones(4) for _ in texts]
+
+
+def store(cache: SemanticResponseCache, query: str, tool_calls: list, text: str):
+    response = TextResponse(text=text)
+    cache.store(query, tool_calls, response, [response])
+
+
+def test_queries_with_different_tool_arguments_do_not_share_answers():
+    cache = SemanticResponseCache(constant_embedding)
+    eggs = [("substitution_filter", {"to_replace": ["eggs"]})]
+    milk = [("substitution_filter", {"to_replace": ["milk"]})]
+    store(cache, "make banana bread without eggs", eggs, "no eggs")
+
+    assert cache.lookup("make banana bread without milk", milk) is None
+    assert cache.lookup("make banana bread with no eggs", eggs)[0].text == "no eggs"
+
+
+def test_summaries_of_different_urls_do_not_share_answers():
+    cache = SemanticResponseCache(constant_embedding)
+    store(cache, "summarize https://a/x", [("scrape", {"url": "https://a/x"})], "x")
+
+    assert (
+        cache.lookup("summarize https://a/y", [("scrape", {"url": "https://a/y"})])
+        is None
+    )
+
+
+def test_answers_are_keyed_on_the_calls_that_ran():
+    cache = SemanticResponseCache(constant_embedding)
+    search = ("query_vectordb", {"query": "banana bread"})
+    store(
+        cache,
+        "banana bread without eggs",
+        [search, ("substitution_filter", {"to_replace": ["eggs"]})],
+        "A",
+    )
+
+    # The router only predicted the search; the substitution was called by the model
+    assert cache.lookup("banana bread without milk", [search]) is None
+
+
+def test_ingest_clears_the_cache(monkeypatch):
+    cache = SemanticResponseCache(constant_embedding)
+    store(cache, "pasta recipe", [], "A")
+    monkeypatch.setattr(src.agents.response_cache, "ingest_version", lambda: 1)
+
+    assert cache.lookup("pasta recipe", []) is None
+
+
+def test_agent_without_router_does_not_cache():
+    completions = []
+
+    def create(messages, **kwargs):
+        completions.append(messages)
+        message = types.SimpleNamespace(content="Recipe", tool_calls=None)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)], usage=None
+        )
+
+    client = types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+    )
+    agent = RecipeAgent(
+        client, [], response_cache=SemanticResponseCache(constant_embedding)
+    )
+    agent._remember = lambda session_id, text: None
+
+    agent.say("make banana bread without eggs", session_id="a")
+    agent.say("make banana bread without milk", session_id="b")
+
+    assert len(completions) == 2
+    assert agent.response_cache.stats()["size"] == 0
@@ -0,0 +1,54 @@
+from src.agents.tool_call_parser import ToolCallStreamParser
+
+TOOL_NAMES = ["query_vectordb", "substitution_filter", "access_memory"]
+
+
+def call(name: str, arguments: str) -> str:
+    return f"Call {name}:\n```json\n{arguments}\n```\n"
+
+
+def feed(parser: ToolCallStreamParser, text: str, chunk_size: int = 7):
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i : i + chunk_size])
+
+
+def test_prose_between_calls_does_not_end_the_calls():
+    parser = ToolCallStreamParser(TOOL_NAMES)
+    feed(parser, call("query_vectordb", '{\n"query": "banana bread"\n}'))
+    feed(parser, "Next, I will find substitutes for the eggs.\n")
+    assert not parser.calls_finished
+
+    feed(parser, call("substitution_filter", '{\n"to_replace": ["eggs"]\n}'))
+    assert [name for name, _ in parser.completed_calls] == [
+        "query_vectordb",
+        "substitution_filter",
+    ]
+
+
+def test_answer_heading_ends_the_calls():
+    parser = ToolCallStreamParser(TOOL_NAMES)
+    feed(parser, call("query_vectordb", '{\n"query": "banana bread"\n}'))
+    assert not parser.calls_finished
+
+    feed(parser, "\n# Banana Bread\n")
+    assert parser.calls_finished
+
+
+def test_calling_every_tool_ends_the_calls():
+    parser = ToolCallStreamParser(TOOL_NAMES)
+    feed(
+        parser,
+        call("query_vectordb", '{\n"query": "cake"\n}')
+        + call("substitution_filter", '{\n"to_replace": ["milk"]\n}')
+        + call("access_memory", '{\n"query": "cake"\n}'),
+    )
+    assert parser.calls_finished
+
+
+def test_draft_hides_text_once_a_call_starts():
+    parser = ToolCallStreamParser(TOOL_NAMES)
+    feed(parser, "Let me look that up. Call query_v")
+    assert "Call" not in parser.draft
+    feed(parser, "ectordb:\n")
+    assert parser.tool_call_detected
+    assert parser.draft == ""
@@ -0,0 +1,56 @@
+import pytest
+from src.agents.tool_router import ToolRouter
+
+
+@pytest.fixture
+def router() -> ToolRouter:
+    return ToolRouter()
+
+
+def routed(router: ToolRouter, prompt: str) -> dict[str, dict]:
+    return dict(router.route(prompt))
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "make that recipe with more sugar",
+        "add more corn to that dish",
+        "make that recipe from earlier with extra butter and cheese",
+    ],
+)
+def test_asking_for_more_of_an_ingredient_does_not_substitute_it(router, prompt):
+    assert "substitution_filter" not in routed(router, prompt)
+
+
+@pytest.mark.parametrize(
+    "prompt, expected",
+    [
+        ("make that recipe without sugar", ["sugar"]),
+        ("make that recipe with no eggs", ["eggs"]),
+        ("avoid corn in that dish from earlier", ["cornstarch", "corn syrup"]),
+        (
+            "make that recipe from earlier dairy-free",
+            ["milk", "butter", "cheese", "cream"],
+        ),
+        ("make that cake from earlier low-carb", ["flour", "sugar"]),
+    ],
+)
+def test_negated_restrictions_are_substituted(router, prompt, expected):
+    assert routed(router, prompt)["substitution_filter"]["to_replace"] == expected
+
+
+def test_diets_rule_out_their_ingredients_without_negation(router):
+    calls = routed(router, "make that cake from earlier vegan")
+    assert calls["substitution_filter"]["to_replace"] == [
+        "eggs",
+        "milk",
+        "butter",
+        "honey",
+    ]
+
+
+def test_urls_route_to_the_scraper(router):
+    calls = routed(router, "https://example.com/recipes/stirfry make it without soy")
+    assert calls["scrape_web_recipe"] == {"link": "https://example.com/recipes/stirfry"}
+    assert calls["substitution_filter"]["to_replace"] == ["soy", "soy sauce"]